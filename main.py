@@ -3,10 +3,10 @@
 Kasperbot - Bot de Trading MT5
 Fichier principal pour l'exécution du bot.
 
-Version: 2.0.4
+Version: 2.2.0
 """
 
-__version__ = "2.0.4"
+__version__ = "2.2.0"
 
 import sys
 import os
@@ -15,17 +15,40 @@ import logging
 import yaml
 import threading
 import re
+import queue
+import multiprocessing
 import pytz
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, time as datetime_time
 
+# --- Sélection du backend MetaTrader5 ---
+# 'mt5.backend: simulator' remplace le package MetaTrader5 (Windows uniquement) par le
+# simulateur in-process. Doit être fait AVANT tout import de MetaTrader5.
+def select_mt5_backend(config_path="config.yaml"):
+    """Installe le simulateur MT5 si la configuration le demande."""
+    try:
+        with open(config_path, 'r') as f:
+            mt5_cfg = (yaml.safe_load(f) or {}).get('mt5', {})
+    except Exception:
+        return # load_config() signalera l'erreur
+    if mt5_cfg.get('backend', 'terminal') == 'simulator':
+        from src.data_ingest import mt5_simulator
+        mt5_simulator.install(mt5_cfg.get('simulator', {}))
+
+select_mt5_backend()
+
 # --- Imports des modules du Bot ---
 import MetaTrader5 as mt5
 from src.data_ingest import mt5_connector
+from src.data_ingest import tick_stream
 from src.execution import mt5_executor
 from src.risk import risk_manager
 from src.journal import professional_journal as journal
 from src.api import server as api_server
 from src import shared_state # Utilise l'état partagé de l'API
+from src.bar_scheduler import BarScheduler, BarChangeTracker, due_jobs
 
 # --- IMPORTS MODIFIÉS POUR LA STRATÉGIE SMC ---
 from src.strategy import smc_entry_logic as smc_strategy
@@ -80,12 +103,22 @@ class Kasperbot:
     Classe principale du bot.
     Gère la boucle d'analyse et la logique de trading.
     """
-    __version__ = "2.0.4" # Version de l'orchestrateur
+    __version__ = "2.2.0" # Version de l'orchestrateur
     
-    def __init__(self, config):
+    def __init__(self, config, symbols=None, signal_sink=None):
+        """
+        Args:
+            symbols (list): Symboles surveillés (défaut: 'mt5.symbols' ; un shard en mode multi-processus).
+            signal_sink (callable): Si fourni (worker d'un shard), les signaux lui sont envoyés
+                                    (symbol, signals) au lieu d'être exécutés localement.
+        """
         self.config = config
         self.running = False
-        self.symbols = config['mt5']['symbols']
+        self.symbols = symbols if symbols is not None else config['mt5']['symbols']
+        self.signal_sink = signal_sink
+        # Mode 'bar_close' : l'analyse suit de peu la clôture, la bougie LTF en formation vient de
+        # s'ouvrir ; le sweep du Modèle 2 se juge aussi sur la bougie clôturée (voir _sweep_range)
+        self.sweep_on_closed_bar = False
         log_to_api(f"Bot v{self.__version__} initialisé.")
 
         # Initialisation du connecteur
@@ -97,11 +130,75 @@ class Kasperbot:
             log_to_api("[CRITICAL] Échec de l'initialisation MT5. Le bot ne peut pas démarrer.")
             raise ConnectionError("Échec de l'initialisation MT5.")
         
+        # Cache de bougies incrémental (par symbole/timeframe)
+        bar_cache_cfg = config['mt5'].get('bar_cache', {})
+        mt5_connector.configure_bar_cache(
+            enabled=bar_cache_cfg.get('enabled', True),
+            refresh_bars=bar_cache_cfg.get('refresh_bars', 3)
+        )
+        
+        # Rééchantillonnage local des timeframes supérieures (une seule base téléchargée)
+        resampling_cfg = config['mt5'].get('resampling', {})
+        mt5_connector.configure_resampling(
+            enabled=resampling_cfg.get('enabled', False),
+            base_timeframe=resampling_cfg.get('base_timeframe', 'M5'),
+            session_offset_minutes=resampling_cfg.get('session_offset_minutes', 0),
+            reuse_ms=resampling_cfg.get('reuse_ms', 1000)
+        )
+        
+        # Bougies en BarFrame (colonnes NumPy) plutôt qu'en DataFrame pour l'analyse
+        self.use_bar_frames = config['strategy'].get('bar_frames', True)
+        
+        # Mémoïsation des analyses (swings, structure, POIs) entre les cycles
+        analysis_cache_cfg = config['strategy'].get('analysis_cache', {})
+        smc_strategy.configure_analysis_cache(
+            enabled=analysis_cache_cfg.get('enabled', True),
+            max_entries=analysis_cache_cfg.get('max_entries', 1024)
+        )
+        
+        # Flux de ticks (bougie LTF en formation, cache bid/ask, réaction aux sweeps)
+        ticks_cfg = config.get('ticks', {})
+        ltf_timeframe = config['strategy']['ltf_timeframe']
+        tick_stream.configure_tick_stream(
+            enabled=ticks_cfg.get('enabled', False),
+            timeframes={ltf_timeframe: mt5_connector.TIMEFRAME_SECONDS[ltf_timeframe]},
+            buffer_size=ticks_cfg.get('buffer_size', 20000),
+            max_ticks_per_poll=ticks_cfg.get('max_ticks_per_poll', 5000),
+            cache_max_age_ms=ticks_cfg.get('cache_max_age_ms', 250)
+        )
+        self.tick_poll_interval = ticks_cfg.get('poll_ms', 250) / 1000.0
+        self.sweep_reaction = ticks_cfg.get('sweep_reaction', True)
+        self.sweep_cooldown = ticks_cfg.get('reaction_cooldown_ms', 5000) / 1000.0
+        self._last_sweep_reaction = {}
+        self._tick_reactions = set() # Symboles relancés par une mèche (ticks) : cycle infra-bougie
+        
+        # Données du dernier cycle d'analyse, par symbole ({timeframe: DataFrame})
+        self.cycle_data = {}
+        
+        # Évaluation concurrente des symboles (pool de workers + file d'exécution unique)
+        concurrency_cfg = config.get('concurrency', {})
+        self.symbol_timeout = concurrency_cfg.get('symbol_timeout', 30)
+        self.worker_pool = None
+        self.execution_lane = None
+        self._busy_symbols = set()
+        self._busy_lock = threading.Lock()
+        workers = concurrency_cfg.get('workers', 1)
+        if concurrency_cfg.get('enabled', False) and workers > 1:
+            self.worker_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kasper-worker")
+            self.execution_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kasper-exec")
+            logger.info(f"Évaluation concurrente : {workers} workers, timeout {self.symbol_timeout}s par symbole.")
+        
         # Initialisation des modules dépendants
         risk_manager.initialize_risk_manager(mt5_connector)
         mt5_executor.initialize_executor(mt5_connector)
         
-        self.journal = journal.ProfessionalJournal(config['journal']['filepath'])
+        # Les trades simulés ne doivent jamais être écrits dans le journal réel
+        journal_cfg = config['journal']
+        if config.get('mt5', {}).get('backend', 'terminal') == 'simulator':
+            journal_path = journal_cfg.get('simulator_filepath', 'logs/kasperbot_journal_simulator.csv')
+        else:
+            journal_path = journal_cfg['filepath']
+        self.journal = journal.ProfessionalJournal(journal_path)
         
         # Configuration des timeframes
         self.setup_timeframes()
@@ -143,6 +240,34 @@ class Kasperbot:
         logger.info(f"Le bot va surveiller les symboles suivants : {self.symbols}")
         shared_state.set_status("RUNNING", f"Surveillance de {len(self.symbols)} symboles.")
         
+        scheduler_cfg = self.config.get('scheduler', {})
+        sharding_cfg = self.config.get('sharding', {})
+        sharded = self.signal_sink is None and sharding_cfg.get('enabled', False) and sharding_cfg.get('processes', 1) > 1
+        if sharded and self.config['mt5'].get('backend') == 'simulator':
+            # Chaque processus aurait son propre marché simulé : les prix des workers et du
+            # coordinateur divergeraient, les signaux seraient exécutés sur d'autres cours
+            log_to_api("[WARNING] Sharding ignoré avec le backend 'simulator' (marché propre à chaque processus).")
+            sharded = False
+        if sharded:
+            self._run_coordinator(sharding_cfg)
+        elif scheduler_cfg.get('mode', 'interval') == 'bar_close':
+            self._run_bar_close_loop(scheduler_cfg)
+        else:
+            self._run_interval_loop()
+
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown(wait=False, cancel_futures=True)
+            self.execution_lane.shutdown(wait=True)
+
+        logger.info("Boucle principale du bot terminée.")
+        shared_state.set_status("STOPPED", "Boucle du bot terminée.")
+        mt5_connector.disconnect()
+
+    def _is_active(self):
+        return self.running and shared_state.is_bot_running()
+
+    def _run_interval_loop(self):
+        """Boucle à intervalle fixe : tous les symboles toutes les 'check_interval' secondes."""
         check_interval = self.config.get('check_interval', 60)
         
         while self.running and shared_state.is_bot_running():
@@ -150,12 +275,8 @@ class Kasperbot:
             
             logger.info(f"--- Nouveau cycle (Intervalle: {check_interval}s) ---")
             
-            for symbol in self.symbols:
-                if not shared_state.is_bot_running():
-                    break
-                
-                # La vérification du symbole est gérée dans mt5_connector.get_data()
-                self.check_symbol_logic(symbol, self.config)
+            # La vérification du symbole est gérée dans mt5_connector.get_data()
+            self._run_symbols({symbol: (True, True) for symbol in self.symbols})
             
             if not shared_state.is_bot_running():
                 break
@@ -170,42 +291,275 @@ class Kasperbot:
                     break
                 time.sleep(1)
 
-        logger.info("Boucle principale du bot terminée.")
-        shared_state.set_status("STOPPED", "Boucle du bot terminée.")
-        mt5_connector.disconnect()
+    def _job_triggers(self):
+        """{job: [timeframes déclencheuses]} — la première timeframe sert à détecter une nouvelle bougie."""
+        job_triggers = {'M1_M2': [self.ltf_tf_str, self.htf_tf_str]}
+        if self.model_3_enabled:
+            job_triggers['M3'] = [self.model_3_entry_tf_str]
+        return job_triggers
+
+    def _run_bar_close_loop(self, scheduler_cfg):
+        """
+        Boucle pilotée par la clôture des bougies : réveil juste après chaque frontière
+        des timeframes utilisées, analyse des seuls couples (symbole, modèle) dont une
+        nouvelle bougie est apparue (nouvel essai si le terminal ne l'a pas encore publiée).
+        """
+        self.sweep_on_closed_bar = True
+        job_triggers = self._job_triggers()
+        watched = {tf: mt5_connector.TIMEFRAME_SECONDS[tf]
+                   for timeframes in job_triggers.values() for tf in timeframes
+                   if tf in mt5_connector.TIMEFRAME_SECONDS}
+        scheduler = BarScheduler(
+            watched,
+            wake_delay=scheduler_cfg.get('wake_delay_ms', 300) / 1000.0,
+            server_offset=scheduler_cfg.get('server_utc_offset_hours', 0) * 3600
+        )
+        tracker = BarChangeTracker()
+        retry_delay = scheduler_cfg.get('retry_ms', 500) / 1000.0
+        max_retries = scheduler_cfg.get('max_retries', 10)
+        logger.info(f"Planification sur clôture de bougies : {sorted(watched)} (délai {scheduler.wake_delay:.1f}s).")
+
+        # Premier passage complet au démarrage
+        pending = {symbol: list(job_triggers) for symbol in self.symbols}
+        while self._is_active():
+            for attempt in range(max_retries + 1):
+                pending = self._run_due_jobs(pending, job_triggers, tracker)
+                if not pending or not self._is_active():
+                    break
+                time.sleep(retry_delay)
+            if pending:
+                logger.debug(f"Pas de nouvelle bougie pour {sorted(pending)} (marché fermé ?).")
+
+            if tick_stream.is_enabled():
+                # Entre deux clôtures : interrogation des ticks (réaction infra-bougie aux sweeps)
+                due = scheduler.wait_next(should_continue=self._is_active, max_step=self.tick_poll_interval,
+                                          on_idle=self._poll_ticks)
+            else:
+                due = scheduler.wait_next(should_continue=self._is_active)
+            if due is None:
+                break
+            logger.info(f"--- Clôture de bougie : {sorted(due)} ---")
+            pending = due_jobs(self.symbols, job_triggers, due)
+
+    def _poll_ticks(self):
+        """
+        Interroge les ticks des symboles. Si 'sweep_reaction' est actif, relance M1/M2 pour
+        les symboles dont la mèche de la bougie LTF en formation vient de se prolonger
+        (sweep de liquidité potentiel), au plus une fois par 'reaction_cooldown_ms'.
+        """
+        tick_stream.poll(self.symbols)
+        if not self.sweep_reaction:
+            return
+        now = time.monotonic()
+        ready_jobs = {}
+        for symbol in tick_stream.extended_symbols(self.symbols, self.ltf_tf_str):
+            if now - self._last_sweep_reaction.get(symbol, float('-inf')) >= self.sweep_cooldown:
+                self._last_sweep_reaction[symbol] = now
+                ready_jobs[symbol] = (True, False)
+        if ready_jobs:
+            logger.debug(f"Nouvelle mèche {self.ltf_tf_str} (ticks) : {sorted(ready_jobs)}")
+            self._tick_reactions.update(ready_jobs)
+            try:
+                self._run_symbols(ready_jobs)
+            finally:
+                self._tick_reactions.difference_update(ready_jobs)
+
+    def _run_due_jobs(self, pending, job_triggers, tracker):
+        """
+        Exécute les jobs dont la bougie déclencheuse a changé.
 
-    def check_symbol_logic(self, symbol, config):
+        Returns:
+            dict: {symbole: [jobs]} encore en attente de leur nouvelle bougie.
+        """
+        still_pending = {}
+        ready_jobs = {}
+        for symbol, jobs in pending.items():
+            if not self._is_active():
+                break
+            ready = []
+            for job in jobs:
+                trigger_tf = mt5_connector.get_mt5_timeframe(job_triggers[job][0])
+                bar_time = mt5_connector.get_last_bar_time(symbol, trigger_tf)
+                if tracker.changed(symbol, job, bar_time):
+                    ready.append(job)
+                else:
+                    still_pending.setdefault(symbol, []).append(job)
+            if ready:
+                ready_jobs[symbol] = ('M1_M2' in ready, 'M3' in ready)
+        self._run_symbols(ready_jobs)
+        return still_pending
+
+    def check_symbol_logic(self, symbol, config, run_models_1_2=True, run_model_3=True):
         """
         Exécute la logique de trading complète pour UN SEUL symbole.
+        ('run_models_1_2' / 'run_model_3' limitent l'analyse aux modèles dont les entrées ont changé.)
         """
+        signals = self.evaluate_symbol(symbol, config, run_models_1_2, run_model_3)
+        self.execute_signals(symbol, signals, config)
+
+    def evaluate_symbol(self, symbol, config, run_models_1_2=True, run_model_3=True):
+        """
+        Analyse un symbole sans rien exécuter (appelable depuis un worker).
+
+        Returns:
+            list: Les signaux trouvés (tuples signal, reason, sl, tp), par ordre de priorité (M3 puis M1/M2).
+        """
+        signals = []
         try:
             # 1. Gérer les trades existants
             open_positions = mt5_connector.check_open_positions(symbol)
             if open_positions > 0:
                 logger.info(f"Position déjà ouverte pour {symbol}, attente...")
                 # TODO: Mettre à jour l'état partagé avec les positions
-                return
+                return signals
+
+            self.cycle_data[symbol] = {}
 
             # 2. Vérifier Modèle 3 (Temporel)
-            signal_m3 = (None, None, None, None)
-            if self.model_3_enabled:
+            if self.model_3_enabled and run_model_3:
                 signal_m3 = self._run_model_3_analysis(symbol, config)
-            
-            if signal_m3[0]:
-                if self._process_signal(symbol, *signal_m3, config):
-                    return # Un trade a été pris
+                if signal_m3[0]:
+                    signals.append(signal_m3)
 
             # 3. Vérifier Modèles 1 & 2 (Continu)
-            signal_m1_m2 = (None, None, None, None)
-            signal_m1_m2 = self._run_models_1_and_2_analysis(symbol, config)
-            
-            if signal_m1_m2[0]:
-                if self._process_signal(symbol, *signal_m1_m2, config):
-                    return
+            if run_models_1_2:
+                signal_m1_m2 = self._run_models_1_and_2_analysis(symbol, config)
+                if signal_m1_m2[0]:
+                    signals.append(signal_m1_m2)
 
         except Exception as e:
             logger.critical(f"Erreur critique lors de l'analyse de {symbol}: {e}", exc_info=True)
             shared_state.add_log(f"ERREUR [{symbol}]: {e}")
+        return signals
+
+    def execute_signals(self, symbol, signals, config):
+        """Traite les signaux d'un symbole dans l'ordre, jusqu'au premier trade exécuté."""
+        if self.signal_sink is not None and signals:
+            self.signal_sink(symbol, signals) # Worker d'un shard : le coordinateur exécute
+            return False
+        try:
+            for signal in signals:
+                if self._process_signal(symbol, *signal, config):
+                    return True # Un trade a été pris
+        except Exception as e:
+            logger.critical(f"Erreur critique lors de l'exécution pour {symbol}: {e}", exc_info=True)
+            shared_state.add_log(f"ERREUR [{symbol}]: {e}")
+        return False
+
+    def _run_symbols(self, jobs):
+        """
+        Analyse un lot de symboles ({symbole: (run_models_1_2, run_model_3)}).
+
+        Mode séquentiel : un symbole après l'autre.
+        Mode concurrent : les analyses (récupération des données + calcul) tournent dans le pool
+        de workers, les ordres passent un par un par la file d'exécution unique. Un symbole
+        qui dépasse 'symbol_timeout' est abandonné pour ce cycle (son résultat sera ignoré).
+        """
+        if self.worker_pool is None:
+            for symbol, (run_models_1_2, run_model_3) in jobs.items():
+                if not self._is_active():
+                    break
+                self.check_symbol_logic(symbol, self.config, run_models_1_2, run_model_3)
+            return
+
+        started = {}
+        def _task(symbol, run_models_1_2, run_model_3):
+            started[symbol] = time.monotonic()
+            try:
+                return self.evaluate_symbol(symbol, self.config, run_models_1_2, run_model_3)
+            finally:
+                with self._busy_lock:
+                    self._busy_symbols.discard(symbol)
+
+        futures = {}
+        for symbol, (run_models_1_2, run_model_3) in jobs.items():
+            with self._busy_lock:
+                if symbol in self._busy_symbols:
+                    logger.warning(f"[{symbol}] Analyse précédente toujours en cours, symbole sauté.")
+                    continue
+                self._busy_symbols.add(symbol)
+            futures[self.worker_pool.submit(_task, symbol, run_models_1_2, run_model_3)] = symbol
+
+        orders = []
+        pending = set(futures)
+        while pending and self._is_active():
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            for future in done:
+                symbol = futures[future]
+                signals = future.result()
+                if signals:
+                    orders.append(self.execution_lane.submit(self.execute_signals, symbol, signals, self.config))
+
+            now = time.monotonic()
+            for future in list(pending):
+                symbol = futures[future]
+                if symbol in started and now - started[symbol] > self.symbol_timeout:
+                    logger.warning(f"[{symbol}] Analyse abandonnée (timeout {self.symbol_timeout}s).")
+                    shared_state.add_log(f"[{symbol}] Timeout d'analyse ({self.symbol_timeout}s).")
+                    pending.discard(future)
+
+        for future in pending: # Arrêt demandé : on annule ce qui n'a pas démarré
+            future.cancel()
+        wait(orders)
+
+    def _run_coordinator(self, sharding_cfg):
+        """
+        Mode multi-processus : N processus workers analysent chacun un shard des symboles
+        et envoient leurs signaux par une file. Ce processus (coordinateur) garde la session
+        MT5 d'exécution, applique les limites de risque globales et agrège les logs.
+        Un worker qui s'arrête pendant que le bot tourne arrête le coordinateur (ses symboles
+        ne seraient plus analysés).
+        """
+        context = multiprocessing.get_context('spawn') # Pas de fork d'un processus multi-threadé
+        shards = shard_symbols(self.symbols, sharding_cfg.get('processes', 2))
+        signal_queue = context.Queue()
+        stop_event = context.Event()
+        processes = [
+            context.Process(target=run_shard_worker, args=(shard_id, self.config, shard, signal_queue, stop_event),
+                            name=f"kasper-shard-{shard_id}", daemon=True)
+            for shard_id, shard in enumerate(shards)
+        ]
+        for process in processes:
+            process.start()
+        log_to_api(f"Coordinateur : {len(processes)} workers ({', '.join(str(len(shard)) for shard in shards)} symboles).")
+
+        max_open_positions = sharding_cfg.get('max_open_positions', 0)
+        try:
+            while self._is_active():
+                try:
+                    kind, shard_id, *payload = signal_queue.get(timeout=1.0)
+                except queue.Empty:
+                    dead = [process for process in processes if not process.is_alive()]
+                    if dead:
+                        message = ("Worker(s) arrêté(s) : "
+                                   + ", ".join(f"{process.name} (code {process.exitcode})" for process in dead)
+                                   + ". Arrêt du coordinateur.")
+                        logger.critical(message)
+                        shared_state.add_log(message)
+                        break
+                    continue
+
+                if kind == 'signals':
+                    symbol, signals = payload
+                    self._coordinate_signals(symbol, signals, max_open_positions)
+                elif kind == 'log':
+                    shared_state.add_log(f"[shard {shard_id}] {payload[0]}")
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+
+    def _coordinate_signals(self, symbol, signals, max_open_positions):
+        """Applique les limites globales puis exécute les signaux reçus d'un worker."""
+        if mt5_connector.check_open_positions(symbol) > 0:
+            logger.info(f"[{symbol}] Signal ignoré : position déjà ouverte.")
+            return
+        if max_open_positions and mt5.positions_total() >= max_open_positions:
+            log_to_api(f"[{symbol}] Signal ignoré : limite globale de {max_open_positions} positions atteinte.")
+            return
+        self.execute_signals(symbol, signals, self.config)
 
     def _run_models_1_and_2_analysis(self, symbol, config):
         """Exécute l'analyse continue M1/M2 pour un symbole."""
@@ -214,8 +568,8 @@ class Kasperbot:
             htf_lookback = config['strategy']['timeframes_config'][self.htf_tf_str]
             ltf_lookback = config['strategy']['timeframes_config'][self.ltf_tf_str]
             
-            htf_data = mt5_connector.get_data(symbol, self.htf_tf, htf_lookback)
-            ltf_data = mt5_connector.get_data(symbol, self.ltf_tf, ltf_lookback)
+            htf_data = mt5_connector.get_data(symbol, self.htf_tf, htf_lookback, as_frame=self.use_bar_frames)
+            ltf_data = mt5_connector.get_data(symbol, self.ltf_tf, ltf_lookback, as_frame=self.use_bar_frames)
 
             if htf_data is None or ltf_data is None or htf_data.empty or ltf_data.empty:
                 logger.warning(f"[{symbol} M1/M2] Données MTF vides, cycle sauté.")
@@ -225,6 +579,7 @@ class Kasperbot:
                 self.htf_tf_str: htf_data,
                 self.ltf_tf_str: ltf_data
             }
+            self.cycle_data.setdefault(symbol, {}).update(mtf_data_dict)
             
             # Récupérer le pip_size (nécessaire pour l'appel de fonction)
             pip_size = config['risk']['pip_sizes'].get(symbol, config['risk']['default_pip_size'])
@@ -233,7 +588,9 @@ class Kasperbot:
             signal, reason, sl_price, tp_price = smc_strategy.check_all_smc_signals(
                 mtf_data_dict, 
                 config,
-                pip_size=pip_size
+                pip_size=pip_size,
+                symbol=symbol,
+                sweep_range=self._sweep_range(symbol, ltf_data)
             )
             
             if not signal:
@@ -246,6 +603,31 @@ class Kasperbot:
             shared_state.add_log(f"ERREUR M1/M2 [{symbol}]: {e}")
             return None, None, None, None
 
+    def _sweep_range(self, symbol, ltf_data):
+        """
+        (plus bas, plus haut) testés pour un sweep de liquidité (Modèle 2), ou None pour
+        la seule bougie LTF en formation (mode 'interval' : la mèche se forme entre deux cycles).
+        En mode 'bar_close', la dernière bougie clôturée est incluse : quelques centaines de ms
+        après la frontière, la bougie en formation se réduit encore à son prix d'ouverture
+        (sauf relance sur mèche, où seule la bougie en formation compte).
+        Avec le flux de ticks, les extrêmes de la bougie en formation agrégée depuis les ticks
+        s'ajoutent à ceux du terminal (la dernière bougie de copy_rates peut être en retard).
+        """
+        if len(ltf_data) == 0:
+            return None
+        closed_bar = self.sweep_on_closed_bar and symbol not in self._tick_reactions and len(ltf_data) >= 2
+        forming = tick_stream.forming_bar(symbol, self.ltf_tf_str) if tick_stream.is_enabled() else None
+        if forming is not None and pd.Timestamp(forming[0], unit='s') != ltf_data.index[-1]:
+            forming = None # Bougie agrégée d'une autre période que la dernière bougie reçue
+        if not closed_bar and forming is None:
+            return None
+        count = 2 if closed_bar else 1
+        low = float(np.asarray(ltf_data['low'])[-count:].min())
+        high = float(np.asarray(ltf_data['high'])[-count:].max())
+        if forming is not None:
+            low, high = min(low, forming[1]), max(high, forming[2])
+        return low, high
+
     def _run_model_3_analysis(self, symbol, config):
         """Vérifie et exécute la stratégie M3 pour un symbole."""
         current_time_utc = datetime.now(pytz.utc)
@@ -264,12 +646,16 @@ class Kasperbot:
                 range_lookback = config['strategy'].get('model_3_range_lookback', 10)
                 entry_lookback = config['strategy'].get('model_3_entry_lookback', 50)
                 
-                range_data = mt5_connector.get_data(symbol, self.model_3_range_tf, range_lookback)
-                entry_data = mt5_connector.get_data(symbol, self.model_3_entry_tf, entry_lookback)
+                range_data = mt5_connector.get_data(symbol, self.model_3_range_tf, range_lookback, as_frame=self.use_bar_frames)
+                entry_data = mt5_connector.get_data(symbol, self.model_3_entry_tf, entry_lookback, as_frame=self.use_bar_frames)
                 
                 if range_data is None or entry_data is None or range_data.empty or entry_data.empty:
                     logger.warning(f"[{symbol} M3] Données vides, cycle M3 sauté.")
                     return None, None, None, None
+                self.cycle_data.setdefault(symbol, {}).update({
+                    self.model_3_range_tf_str: range_data,
+                    self.model_3_entry_tf_str: entry_data
+                })
 
                 # Récupérer le pip_size (nécessaire pour l'appel de fonction)
                 pip_size = config['risk']['pip_sizes'].get(symbol, config['risk']['default_pip_size'])
@@ -312,12 +698,15 @@ class Kasperbot:
         data_tf_str = self.ltf_tf_str
         if model_id == "M3":
             data_tf_str = self.model_3_entry_tf_str
-        data_tf_mt5 = mt5_connector.get_mt5_timeframe(data_tf_str)
-        entry_data = mt5_connector.get_data(symbol, data_tf_mt5, 2)
+        # Réutilise les bougies du cycle en cours (re-téléchargement seulement à défaut)
+        entry_data = self.cycle_data.get(symbol, {}).get(data_tf_str)
+        if entry_data is None:
+            data_tf_mt5 = mt5_connector.get_mt5_timeframe(data_tf_str)
+            entry_data = mt5_connector.get_data(symbol, data_tf_mt5, 2, as_frame=self.use_bar_frames)
         if entry_data is None or entry_data.empty:
             log_to_api(f"[{symbol}] Erreur: Prix d'entrée (pour SL) indisponible.")
             return False
-        entry_price_fallback = entry_data['close'].iloc[-1]
+        entry_price_fallback = float(np.asarray(entry_data['close'])[-1])
             
         # Appel corrigé pour le calcul de risque
         lot_size = risk_manager.calculate_lot_size(
@@ -395,6 +784,39 @@ class Kasperbot:
 
 # --- FIN DE LA CLASSE KASPERBOT ---
 
+# --- MODE MULTI-PROCESSUS (shards) ---
+def shard_symbols(symbols, n_shards):
+    """Répartit les symboles en 'n_shards' groupes (tourniquet), sans groupe vide."""
+    n_shards = max(1, min(n_shards, len(symbols)))
+    return [symbols[i::n_shards] for i in range(n_shards)]
+
+def run_shard_worker(shard_id, config, symbols, signal_queue, stop_event):
+    """
+    Point d'entrée d'un processus worker : analyse son shard avec la boucle habituelle
+    (planificateur, pool de threads...) et envoie signaux et logs au coordinateur.
+    """
+    shared_state.set_config(config)
+    shared_state.set_log_sink(lambda message: signal_queue.put(('log', shard_id, message)))
+
+    def _watch_stop():
+        # Scrutation plutôt que stop_event.wait() : un processus mort pendant un wait() bloquerait
+        # indéfiniment le stop_event.set() du coordinateur
+        while not stop_event.is_set():
+            time.sleep(0.5)
+        shared_state.stop_bot()
+    threading.Thread(target=_watch_stop, daemon=True).start()
+
+    try:
+        bot = Kasperbot(
+            config, symbols=symbols,
+            signal_sink=lambda symbol, signals: signal_queue.put(('signals', shard_id, symbol, signals))
+        )
+        bot.start()
+    except Exception as e:
+        logger.critical(f"Erreur critique dans le worker {shard_id}: {e}", exc_info=True)
+        shared_state.add_log(f"Worker {shard_id} arrêté : {e}")
+        sys.exit(1) # Code non nul : le coordinateur détecte l'arrêt
+
 def run_bot_thread(config):
     """Fonction cible pour le thread du bot."""
     try:
@@ -0,0 +1,113 @@
+# Fichier: src/analysis/array_utils.py
+"""
+Outils vectorisés sur séries de prix (NumPy).
+
+Recherche du premier franchissement d'un niveau à partir d'une position donnée,
+pour de nombreuses requêtes à la fois (mitigation de zones, sorties SL/TP...).
+Une table creuse (sparse table) des min/max par blocs de 2^k bougies permet une
+descente binaire en O(log n) par requête, vectorisée sur toutes les requêtes.
+
+Version: 1.0
+"""
+
+__version__ = "1.0"
+
+import numpy as np
+
+
+class ExtremaTable:
+    """
+    Table creuse des extrema d'une série : min/max sur [i, i + 2^k) pour chaque niveau k.
+
+    Construite une fois (O(n log n)), elle répond ensuite à first_below / first_above
+    pour des tableaux entiers de requêtes.
+    """
+
+    __slots__ = ('n', '_mins', '_maxs')
+
+    def __init__(self, low: np.ndarray, high: np.ndarray = None):
+        low = np.asarray(low, dtype=np.float64)
+        high = low if high is None else np.asarray(high, dtype=np.float64)
+        self.n = len(low)
+        self._mins = [low]
+        self._maxs = [high]
+        width = 1
+        while 2 * width <= self.n:
+            prev_min, prev_max = self._mins[-1], self._maxs[-1]
+            self._mins.append(np.minimum(prev_min[:-width], prev_min[width:]))
+            self._maxs.append(np.maximum(prev_max[:-width], prev_max[width:]))
+            width *= 2
+
+    def _descend(self, levels_table: list, starts, levels, below: bool) -> np.ndarray:
+        pos = np.array(starts, dtype=np.int64, copy=True).reshape(-1)
+        levels = np.broadcast_to(np.asarray(levels, dtype=np.float64), pos.shape)
+        pos = np.clip(pos, 0, self.n)
+
+        # On saute chaque bloc de 2^k bougies qui ne franchit pas le niveau (du plus grand au plus petit)
+        for k in range(len(levels_table) - 1, -1, -1):
+            block = levels_table[k]
+            active = np.flatnonzero(pos < len(block))
+            if not len(active):
+                continue
+            values = block[pos[active]]
+            skip = values > levels[active] if below else values < levels[active]
+            pos[active[skip]] += 1 << k
+
+        found = pos < self.n
+        found[found] = (self._mins[0][pos[found]] <= levels[found]) if below else \
+                       (self._maxs[0][pos[found]] >= levels[found])
+        return np.where(found, pos, -1)
+
+    def first_below(self, starts, levels) -> np.ndarray:
+        """Première position j >= start telle que low[j] <= level (-1 si aucune)."""
+        return self._descend(self._mins, starts, levels, below=True)
+
+    def first_above(self, starts, levels) -> np.ndarray:
+        """Première position j >= start telle que high[j] >= level (-1 si aucune)."""
+        return self._descend(self._maxs, starts, levels, below=False)
+
+
+def suffix_min(values: np.ndarray) -> np.ndarray:
+    """suffix_min[i] = min(values[i:]) (minimum cumulé inversé)."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.minimum.accumulate(values[::-1])[::-1]
+
+
+def suffix_max(values: np.ndarray) -> np.ndarray:
+    """suffix_max[i] = max(values[i:]) (maximum cumulé inversé)."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.maximum.accumulate(values[::-1])[::-1]
+
+
+def first_touch(low: np.ndarray, high: np.ndarray, starts, below_levels=None, above_levels=None, table: ExtremaTable = None):
+    """
+    Pour chaque requête, position du premier low <= below_level et du premier high >= above_level
+    à partir de 'start' (incluse). Les requêtes sans niveau (None / NaN) renvoient -1.
+
+    Returns:
+        tuple: (first_below, first_above) — tableaux int64, -1 si jamais touché.
+    """
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64).reshape(-1)
+    table = table if table is not None else ExtremaTable(low, high)
+
+    def _run(levels, below):
+        result = np.full(len(starts), -1, dtype=np.int64)
+        if levels is None or not len(starts):
+            return result
+        levels = np.broadcast_to(np.asarray(levels, dtype=np.float64), starts.shape)
+        valid = ~np.isnan(levels) & (starts < len(low))
+        if not valid.any():
+            return result
+
+        # Pré-filtre : extremum de toute la suite de la série depuis 'start'
+        extrema = suffix_min(low) if below else suffix_max(high)
+        touched = valid.copy()
+        touched[valid] = extrema[starts[valid]] <= levels[valid] if below else extrema[starts[valid]] >= levels[valid]
+        if touched.any():
+            query = table.first_below if below else table.first_above
+            result[touched] = query(starts[touched], levels[touched])
+        return result
+
+    return _run(below_levels, True), _run(above_levels, False)
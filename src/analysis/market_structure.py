@@ -4,15 +4,75 @@ Module pour l'analyse de la structure de marché (SMC).
 
 Ce module contient les fonctions nécessaires pour identifier les points pivots (swing highs/lows)
 et pour détecter la structure du marché (BOS, CHOCH) basée sur ces points.
+Les bougies peuvent être fournies en DataFrame pandas ou en BarFrame (colonnes NumPy).
 
-Version: 2.0
+Version: 2.5
 """
 
-__version__ = "2.0"
+__version__ = "2.5"
 
 import pandas as pd
 import numpy as np
-from scipy.signal import argrelextrema
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import NamedTuple, Dict, Tuple
+
+
+class SwingPoints(NamedTuple):
+    """Points de swing sous forme de tableaux compacts (positions entières et prix)."""
+    high_idx: np.ndarray
+    high_price: np.ndarray
+    low_idx: np.ndarray
+    low_price: np.ndarray
+
+
+def find_swing_points(high: np.ndarray, low: np.ndarray, order: int = 5) -> SwingPoints:
+    """
+    Noyau vectorisé de détection des swings (numpy, fenêtre glissante).
+
+    La bougie i est un swing high si high[i] >= max(high[i-order : i+order+1])
+    (idem swing low avec min), et seulement si 'order' bougies existent de chaque côté.
+    Résultat identique à argrelextrema(np.greater_equal / np.less_equal) + filtre des bords.
+
+    Args:
+        high (np.ndarray): Les plus hauts.
+        low (np.ndarray): Les plus bas.
+        order (int): Le nombre de bougies de chaque côté (>= 1).
+
+    Returns:
+        SwingPoints: positions (int) et prix des swing highs et swing lows, triés par position.
+    """
+    if order < 1:
+        raise ValueError("'order' doit être un entier >= 1.")
+
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    if n < (2 * order + 1):
+        empty_idx = np.empty(0, dtype=np.intp)
+        empty_price = np.empty(0, dtype=np.float64)
+        return SwingPoints(empty_idx, empty_price, empty_idx, empty_price)
+
+    # --- Commentaire de Validation ---
+    # Seules les bougies ayant 'order' bougies avant ET après sont candidates
+    # (fenêtres complètes) : un swing n'est confirmé qu'après 'order' bougies,
+    # ce qui garantit une stratégie non-repainting.
+    # --- Fin Commentaire ---
+    window = 2 * order + 1
+    rolling_max = sliding_window_view(high, window).max(axis=1)
+    rolling_min = sliding_window_view(low, window).min(axis=1)
+
+    high_idx = np.flatnonzero(high[order:n - order] >= rolling_max) + order
+    low_idx = np.flatnonzero(low[order:n - order] <= rolling_min) + order
+
+    return SwingPoints(high_idx, high[high_idx], low_idx, low[low_idx])
+
+
+def swing_points_to_tuples(index: pd.Index, points: SwingPoints):
+    """Convertit des SwingPoints en listes de tuples (timestamp, prix)."""
+    swing_highs = list(zip(index[points.high_idx], points.high_price))
+    swing_lows = list(zip(index[points.low_idx], points.low_price))
+    return swing_highs, swing_lows
+
 
 def find_swing_highs_lows(data: pd.DataFrame, order: int = 5):
     """
@@ -20,9 +80,10 @@ def find_swing_highs_lows(data: pd.DataFrame, order: int = 5):
     
     Un swing high est un pic plus haut que les 'order' bougies précédentes et suivantes.
     Un swing low est un creux plus bas que les 'order' bougies précédentes et suivantes.
+    (Enveloppe de find_swing_points, qui renvoie des tableaux numpy.)
 
     Args:
-        data (pd.DataFrame): DataFrame contenant les données de marché (doit avoir 'high' et 'low').
+        data (pd.DataFrame | BarFrame): Bougies contenant les données de marché (doit avoir 'high' et 'low').
         order (int): Le nombre de bougies de chaque côté à considérer pour définir un pic/creux.
 
     Returns:
@@ -31,37 +92,198 @@ def find_swing_highs_lows(data: pd.DataFrame, order: int = 5):
     """
     
     # Ajout Robustesse:
-    # Vérifie si les données sont suffisantes pour l'analyse, évite un crash de scipy
+    # Vérifie si les données sont suffisantes pour l'analyse
     if len(data) < (2 * order + 1):
         # Pas assez de données pour trouver des extrema avec l'ordre donné
         return [], []
 
-    # Utilise scipy pour trouver les indices des extrema locaux
-    high_indices = argrelextrema(data['high'].values, np.greater_equal, order=order)[0]
-    low_indices = argrelextrema(data['low'].values, np.less_equal, order=order)[0]
+    points = find_swing_points(np.asarray(data['high']), np.asarray(data['low']), order)
+    return swing_points_to_tuples(data.index, points)
 
-    # --- Commentaire de Validation ---
-    # Le filtre ci-dessous est crucial pour une stratégie non-repainting.
-    # 'i >= order' : Assure qu'on a 'order' bougies *avant* le point.
-    # 'i < len(data) - order' : Assure qu'on a 'order' bougies *après* le point.
-    # Cela signifie qu'un swing n'est confirmé qu'après 'order' bougies,
-    # introduisant un "lag" nécessaire pour garantir que le point est définitif.
-    # --- Fin Commentaire ---
-    
-    # Filtre pour ne garder que les points valides (ignorer les bords si nécessaire)
-    high_indices = [i for i in high_indices if i >= order and i < len(data) - order]
-    low_indices = [i for i in low_indices if i >= order and i < len(data) - order]
+# --- Moteur de structure (tableaux typés) ---
+# Codes des événements et tendances
+EVENT_BOS = 0
+EVENT_CHOCH = 1
+EVENT_NAMES = {EVENT_BOS: "BOS", EVENT_CHOCH: "CHOCH"}
 
-    # Formatte la sortie en (index, prix)
-    swing_highs = [(data.index[i], data['high'].iloc[i]) for i in high_indices]
-    swing_lows = [(data.index[i], data['low'].iloc[i]) for i in low_indices]
+TREND_SIDEWAYS = 0
+TREND_BULLISH = 1
+TREND_BEARISH = -1
+TREND_NAMES = {TREND_SIDEWAYS: "SIDEWAYS", TREND_BULLISH: "BULLISH", TREND_BEARISH: "BEARISH"}
+
+# Swing fusionné : clé temporelle (position de bougie ou rang), prix, étiquette high/low
+SWING_DTYPE = np.dtype([('key', 'i8'), ('price', 'f8'), ('is_high', '?')])
+# Événement : type (BOS/CHOCH), tendance, niveau cassé, clé du swing de cassure, indice du swing
+STRUCTURE_EVENT_DTYPE = np.dtype([('type', 'i1'), ('trend', 'i1'), ('level', 'f8'), ('key', 'i8'), ('swing', 'i8')])
+
+
+def merge_swing_points(points: SwingPoints) -> np.ndarray:
+    """
+    Fusionne les swing highs et lows en un seul tableau étiqueté (SWING_DTYPE),
+    trié par position (à position égale, le high précède le low).
+    """
+    n_high = len(points.high_idx)
+    swings = np.empty(n_high + len(points.low_idx), dtype=SWING_DTYPE)
+    swings['key'][:n_high] = points.high_idx
+    swings['key'][n_high:] = points.low_idx
+    swings['price'][:n_high] = points.high_price
+    swings['price'][n_high:] = points.low_price
+    swings['is_high'][:n_high] = True
+
+    # Compatibilité avec identify_structure : un low identique (même bougie, même prix)
+    # à un swing high est traité comme un high.
+    if n_high:
+        pos = np.clip(np.searchsorted(points.high_idx, points.low_idx), 0, n_high - 1)
+        same = (points.high_idx[pos] == points.low_idx) & (points.high_price[pos] == points.low_price)
+        swings['is_high'][n_high:] = same
+    else:
+        swings['is_high'][n_high:] = False
+
+    return swings[np.argsort(swings['key'], kind='stable')]
+
+
+class StructureMachine:
+    """
+    Machine à états BOS/CHOCH, alimentée swing par swing (ordre chronologique).
+
+    Utilisée à la fois par structure_engine (lot) et par StructureState (flux),
+    ce qui garantit des résultats identiques dans les deux modes.
+    Chaque point mémorisé est un tuple (indice du swing, clé, prix).
+    """
+    __slots__ = ("trend", "count", "last_high", "last_low", "sig_high", "sig_low")
+
+    def __init__(self):
+        self.trend = TREND_SIDEWAYS
+        self.count = 0
+        self.last_high = self.last_low = self.sig_high = self.sig_low = None
+
+    def push(self, key: int, price: float, is_high: bool):
+        """
+        Consomme un swing.
+
+        Returns:
+            tuple | None: L'événement émis (type, trend, level, key, indice du swing), ou None.
+        """
+        i = self.count
+        self.count += 1
+        swing = (i, key, price)
+        event = None
+
+        if i == 0:
+            if is_high:
+                self.last_high = self.sig_high = swing
+            else:
+                self.last_low = self.sig_low = swing
+            return None
+
+        if is_high:
+            self.last_high = swing
+            sig_high = self.sig_high
+            if sig_high is None:
+                self.sig_high = swing
+                return None
+
+            if self.trend == TREND_BULLISH:
+                if price > sig_high[2]:
+                    # Break of Structure (BOS) Haussier
+                    event = (EVENT_BOS, TREND_BULLISH, sig_high[2], key, i)
+                    self.sig_high = swing
+                    # Le dernier plus bas qui a créé ce nouveau plus haut devient le "low" protégé
+                    if self.last_low is not None and self.sig_low is not None and self.last_low[1] > self.sig_low[1]:
+                        self.sig_low = self.last_low
+            elif self.trend == TREND_BEARISH:
+                if price > sig_high[2]:
+                    # Change of Character (CHOCH) Haussier
+                    event = (EVENT_CHOCH, TREND_BULLISH, sig_high[2], key, i)
+                    self.trend = TREND_BULLISH
+                    self.sig_high = swing
+                    if self.last_low is not None: # Le point bas d'où part le CHOCH
+                        self.sig_low = self.last_low
+            elif self.sig_low is not None and price > sig_high[2]:
+                self.trend = TREND_BULLISH # Première tendance établie
+                self.sig_high = swing
+
+        else: # C'est un Swing Low
+            self.last_low = swing
+            sig_low = self.sig_low
+            if sig_low is None:
+                self.sig_low = swing
+                return None
+
+            if self.trend == TREND_BULLISH:
+                if price < sig_low[2]:
+                    # Change of Character (CHOCH) Baissier
+                    event = (EVENT_CHOCH, TREND_BEARISH, sig_low[2], key, i)
+                    self.trend = TREND_BEARISH
+                    self.sig_low = swing
+                    if self.last_high is not None: # Le point haut d'où part le CHOCH
+                        self.sig_high = self.last_high
+            elif self.trend == TREND_BEARISH:
+                if price < sig_low[2]:
+                    # Break of Structure (BOS) Baissier
+                    event = (EVENT_BOS, TREND_BEARISH, sig_low[2], key, i)
+                    self.sig_low = swing
+                    # Le dernier plus haut qui a créé ce nouveau plus bas devient le "high" protégé
+                    if self.last_high is not None and self.sig_high is not None and self.last_high[1] > self.sig_high[1]:
+                        self.sig_high = self.last_high
+            elif self.sig_high is not None and price < sig_low[2]:
+                self.trend = TREND_BEARISH # Première tendance établie
+                self.sig_low = swing
+
+        return event
+
+
+def structure_engine(swings: np.ndarray):
+    """
+    Machine à états BOS/CHOCH en une seule passe sur un tableau de swings fusionné.
+
+    Args:
+        swings (np.ndarray): Tableau SWING_DTYPE trié par 'key'.
+
+    Returns:
+        tuple: (events, trend_code)
+               - events: tableau STRUCTURE_EVENT_DTYPE, dans l'ordre chronologique.
+               - trend_code: TREND_BULLISH, TREND_BEARISH ou TREND_SIDEWAYS.
+    """
+    machine = StructureMachine()
+    push = machine.push
+    events = []
+    for key, price, is_high in zip(swings['key'].tolist(), swings['price'].tolist(), swings['is_high'].tolist()):
+        event = push(key, price, is_high)
+        if event is not None:
+            events.append(event)
+
+    return np.array(events, dtype=STRUCTURE_EVENT_DTYPE), machine.trend
+
+
+def identify_structure_arrays(points: SwingPoints):
+    """
+    Identifie la structure (BOS/CHOCH) directement à partir des SwingPoints.
+
+    Returns:
+        tuple: (events, str_current_trend) — events est un tableau STRUCTURE_EVENT_DTYPE
+               dont le champ 'key' est la position de la bougie de cassure.
+    """
+    events, trend = structure_engine(merge_swing_points(points))
+    return events, TREND_NAMES[trend]
+
+
+def structure_events_to_dicts(events: np.ndarray, index: pd.Index) -> list:
+    """Convertit des événements (positions de bougies) en dictionnaires (type, trend, level, timestamp)."""
+    return [{
+        "type": EVENT_NAMES[event_type],
+        "trend": TREND_NAMES[trend],
+        "level": level,
+        "timestamp": index[key]
+    } for event_type, trend, level, key in zip(events['type'].tolist(), events['trend'].tolist(),
+                                                events['level'].tolist(), events['key'].tolist())]
 
-    return swing_highs, swing_lows
 
 def identify_structure(swing_highs: list, swing_lows: list):
     """
     Analyse la séquence de swing highs et lows pour identifier la tendance
     et les événements de structure de marché (BOS et CHOCH).
+    (Enveloppe de structure_engine pour les listes de tuples.)
 
     Args:
         swing_highs (list): Liste de tuples (index, prix) des swing highs.
@@ -75,117 +297,165 @@ def identify_structure(swing_highs: list, swing_lows: list):
     
     # Combine et trie tous les points de swing par date (index)
     all_swings = sorted(swing_highs + swing_lows, key=lambda x: x[0])
-
-    structure_events = []
-    current_trend = "SIDEWAYS"
-    
-    last_high = None
-    last_low = None
-    last_significant_high = None
-    last_significant_low = None
-
     if not all_swings:
         return [], "SIDEWAYS"
 
-    # Initialisation
-    first_swing = all_swings[0]
-    if first_swing in swing_highs:
-        last_high = first_swing
-        last_significant_high = first_swing
-    else:
-        last_low = first_swing
-        last_significant_low = first_swing
+    # Étiquetage en une passe (appartenance par hachage, plus de recherche linéaire)
+    high_set = set(swing_highs)
+    swings = np.empty(len(all_swings), dtype=SWING_DTYPE)
+    swings['price'] = [swing[1] for swing in all_swings]
+    swings['is_high'] = [swing in high_set for swing in all_swings]
+    # Clé = rang dense de la date (deux swings de même date ont la même clé)
+    new_time = [True] + [all_swings[k][0] != all_swings[k - 1][0] for k in range(1, len(all_swings))]
+    swings['key'] = np.cumsum(new_time)
 
-    for i in range(1, len(all_swings)):
-        current_swing = all_swings[i]
-        is_high = current_swing in swing_highs
+    events, trend = structure_engine(swings)
 
-        if is_high:
-            last_high = current_swing
-            if last_significant_high is None:
-                last_significant_high = current_swing
-                continue
+    structure_events = [{
+        "type": EVENT_NAMES[event_type],
+        "trend": TREND_NAMES[event_trend],
+        "level": level,
+        "timestamp": all_swings[swing][0]
+    } for event_type, event_trend, level, swing in zip(events['type'].tolist(), events['trend'].tolist(),
+                                                        events['level'].tolist(), events['swing'].tolist())]
 
-            # Scénario Haussier
-            if current_trend == "BULLISH":
-                if current_swing[1] > last_significant_high[1]:
-                    # Break of Structure (BOS) Haussier
-                    structure_events.append({
-                        "type": "BOS",
-                        "trend": "BULLISH",
-                        "level": last_significant_high[1],
-                        "timestamp": current_swing[0]
-                    })
-                    last_significant_high = current_swing
-                    # Le dernier plus bas qui a créé ce nouveau plus haut devient le "low" protégé
-                    if last_low and last_significant_low and last_low[0] > last_significant_low[0]:
-                         last_significant_low = last_low
+    return structure_events, TREND_NAMES[trend]
 
-            # Scénario Baissier
-            elif current_trend == "BEARISH":
-                if current_swing[1] > last_significant_high[1]:
-                    # Change of Character (CHOCH) Haussier
-                    structure_events.append({
-                        "type": "CHOCH",
-                        "trend": "BULLISH",
-                        "level": last_significant_high[1],
-                        "timestamp": current_swing[0]
-                    })
-                    current_trend = "BULLISH"
-                    last_significant_high = current_swing
-                    if last_low: # Le point bas d'où part le CHOCH
-                        last_significant_low = last_low
-            
-            # Initialisation Tendance
-            elif current_trend == "SIDEWAYS" and last_significant_low:
-                if last_significant_high is None: # Cas où on n'a que des lows
-                   last_significant_high = current_swing
-                elif current_swing[1] > last_significant_high[1]:
-                    current_trend = "BULLISH" # Première tendance établie
-                    last_significant_high = current_swing
 
-        else: # C'est un Swing Low
-            last_low = current_swing
-            if last_significant_low is None:
-                last_significant_low = current_swing
+# --- Structure incrémentale (flux de bougies clôturées) ---
+
+class StructureState:
+    """
+    État persistant des swings et de la structure pour un (symbole, timeframe).
+
+    Ne consomme que les bougies nouvelles : un swing est confirmé dès que 'order'
+    bougies l'ont suivi (même règle non-repainting que find_swing_points). La détection
+    des swings, seule opération proportionnelle au nombre de bougies, ne porte donc que
+    sur les nouvelles bougies.
+
+    update() ne conserve que les swings que l'analyse par lot de la fenêtre reçue
+    trouverait (les 'order' premières bougies n'ont pas de voisinage complet), puis
+    rejoue la StructureMachine sur ces seuls swings (quelques dizaines). Les résultats
+    sont ainsi identiques à find_swing_highs_lows + identify_structure appliqués à la
+    fenêtre reçue (sans sa dernière bougie avec 'closed_only'), et l'historique reste borné.
+    """
+
+    def __init__(self, order: int):
+        if order < 1:
+            raise ValueError("'order' doit être un entier >= 1.")
+        self.order = order
+        self.n_bars = 0 # Nombre de bougies consommées
+        self.last_time = None # Timestamp de la dernière bougie consommée
+        # Queue des 2*order dernières bougies (fenêtres des prochains candidats)
+        self._tail_high = np.empty(0, dtype=np.float64)
+        self._tail_low = np.empty(0, dtype=np.float64)
+        self.swing_highs = [] # [(timestamp, prix)]
+        self.swing_lows = []
+        self._swings = [] # [(timestamp, position absolue, prix, is_high)] fusionnés (merge_swing_points)
+        self.events = [] # [dict(type, trend, level, timestamp)]
+        self._trend = TREND_SIDEWAYS
+        self._times = [] # Timestamps des bougies encore référencées par la queue
+
+    @property
+    def trend(self) -> str:
+        return TREND_NAMES[self._trend]
+
+    def update(self, data: pd.DataFrame, closed_only: bool = True) -> int:
+        """
+        Consomme les bougies de 'data' postérieures à la dernière bougie consommée, oublie
+        les swings que l'analyse par lot de 'data' ne verrait pas, puis recalcule les événements.
+
+        Args:
+            data (pd.DataFrame | BarFrame): Données de marché (index temporel, colonnes 'high'/'low').
+            closed_only (bool): Ignore la dernière ligne (bougie en formation).
+
+        Returns:
+            int: Le nombre de nouvelles bougies consommées.
+        """
+        index = data.index
+        stop = len(index) - 1 if closed_only else len(index)
+        start = 0 if self.last_time is None else int(index.searchsorted(self.last_time, side='right'))
+        consumed = 0
+        if start < stop:
+            self.push_bars(index[start:stop], np.asarray(data['high'])[start:stop], np.asarray(data['low'])[start:stop])
+            consumed = stop - start
+        if stop > self.order:
+            self.trim(index[self.order])
+        else:
+            self.trim(None)
+        self.replay()
+        return consumed
+
+    def trim(self, before):
+        """Oublie les swings dont le timestamp est antérieur à 'before' (tous si None)."""
+        for history in (self.swing_highs, self.swing_lows, self._swings):
+            if before is None:
+                history.clear()
                 continue
+            k = 0
+            while k < len(history) and history[k][0] < before:
+                k += 1
+            del history[:k]
 
-            # Scénario Haussier
-            if current_trend == "BULLISH":
-                if current_swing[1] < last_significant_low[1]:
-                    # Change of Character (CHOCH) Baissier
-                    structure_events.append({
-                        "type": "CHOCH",
-                        "trend": "BEARISH",
-                        "level": last_significant_low[1],
-                        "timestamp": current_swing[0]
-                    })
-                    current_trend = "BEARISH"
-                    last_significant_low = current_swing
-                    if last_high: # Le point haut d'où part le CHOCH
-                        last_significant_high = last_high
-
-            # Scénario Baissier
-            elif current_trend == "BEARISH":
-                if current_swing[1] < last_significant_low[1]:
-                    # Break of Structure (BOS) Baissier
-                    structure_events.append({
-                        "type": "BOS",
-                        "trend": "BEARISH",
-                        "level": last_significant_low[1],
-                        "timestamp": current_swing[0]
-                    })
-                    last_significant_low = current_swing
-                    # Le dernier plus haut qui a créé ce nouveau plus bas devient le "high" protégé
-                    if last_high and last_significant_high and last_high[0] > last_significant_high[0]:
-                        last_significant_high = last_high
-            
-            # Initialisation Tendance
-            elif current_trend == "SIDEWAYS" and last_significant_high:
-                if last_significant_low is None: # Cas où on n'a que des highs
-                    last_significant_low = current_swing
-                elif current_swing[1] < last_significant_low[1]:
-                    current_trend = "BEARISH" # Première tendance établie
-                    last_significant_low = current_swing
-
-    return structure_events, current_trend
\ No newline at end of file
+    def replay(self):
+        """Recalcule événements et tendance en rejouant la StructureMachine sur les swings conservés."""
+        machine = StructureMachine()
+        events = []
+        for timestamp, key, price, is_high in self._swings:
+            event = machine.push(key, price, is_high)
+            if event is not None:
+                event_type, trend, level, _key, _swing = event
+                events.append({
+                    "type": EVENT_NAMES[event_type],
+                    "trend": TREND_NAMES[trend],
+                    "level": level,
+                    "timestamp": timestamp
+                })
+        self.events = events
+        self._trend = machine.trend
+
+    def push_bars(self, times, high: np.ndarray, low: np.ndarray):
+        """Consomme des bougies clôturées (dans l'ordre chronologique) : confirme les nouveaux swings."""
+        order = self.order
+        tail_len = len(self._tail_high)
+        buffer_high = np.concatenate((self._tail_high, np.asarray(high, dtype=np.float64)))
+        buffer_low = np.concatenate((self._tail_low, np.asarray(low, dtype=np.float64)))
+        buffer_times = self._times + list(times)
+        offset = self.n_bars - tail_len # Position absolue du début du tampon
+
+        # Seuls les candidats dont la fenêtre vient d'être complétée sont confirmés
+        points = find_swing_points(buffer_high, buffer_low, order)
+        self.swing_highs.extend(zip([buffer_times[k] for k in points.high_idx.tolist()], points.high_price))
+        self.swing_lows.extend(zip([buffer_times[k] for k in points.low_idx.tolist()], points.low_price))
+        swings = merge_swing_points(points)
+        self._swings.extend((buffer_times[key], offset + key, price, is_high) for key, price, is_high
+                            in zip(swings['key'].tolist(), swings['price'].tolist(), swings['is_high'].tolist()))
+
+        self.n_bars += len(buffer_high) - tail_len
+        keep = min(len(buffer_high), 2 * order)
+        self._tail_high = buffer_high[len(buffer_high) - keep:]
+        self._tail_low = buffer_low[len(buffer_low) - keep:]
+        self._times = buffer_times[len(buffer_times) - keep:]
+        if len(buffer_times):
+            self.last_time = buffer_times[-1]
+
+
+# Registre des états persistants par (symbole, timeframe)
+_structure_states: Dict[Tuple[str, str], StructureState] = {}
+
+def get_structure_state(symbol: str, timeframe: str, order: int) -> StructureState:
+    """Renvoie l'état de structure persistant d'un (symbole, timeframe), recréé si 'order' change."""
+    key = (symbol, timeframe)
+    state = _structure_states.get(key)
+    if state is None or state.order != order:
+        state = _structure_states[key] = StructureState(order)
+    return state
+
+def drop_structure_states(symbol: str):
+    """Oublie les états de structure persistants d'un symbole (toutes timeframes)."""
+    for key in [key for key in _structure_states if key[0] == symbol]:
+        del _structure_states[key]
+
+def reset_structure_states():
+    """Oublie tous les états de structure persistants."""
+    _structure_states.clear()
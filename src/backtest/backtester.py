@@ -1,65 +1,70 @@
 # Fichier: src/backtest/backtester.py
-# Version: 2.2.0 (TopDown Adapt - Strict No Interface Params)
-# Dépendances: pandas, MetaTrader5, logging, datetime, pytz
-# DESCRIPTION: Adapte backtester pour Top-Down, lit TFs depuis config (pas d'override API).
-
+# Version: 3.5.1 (Structure incrémentale identique à l'analyse par lot)
+# Dépendances: numpy, pandas, MetaTrader5, logging, datetime, pytz
+# DESCRIPTION: Backtest Top-Down (HTF/LTF lus depuis config['strategy']) sur BarFrame.
+#              Les bougies sont chargées une fois (BarStore local, complété depuis MT5 si connecté),
+#              puis parcourues par un curseur entier : la position HTF alignée de chaque bougie LTF
+#              est précalculée (np.searchsorted) et la stratégie reçoit des fenêtres de taille fixe
+#              (vues sans copie), comme les 'timeframes_config' bougies du bot en direct.
+#              La bougie de sortie SL/TP de chaque trade est déterminée dès l'entrée (exit_resolver).
+
+import re
+import time
+import logging
+import numpy as np
 import pandas as pd
 import MetaTrader5 as mt5
-import logging
 from datetime import datetime, timedelta
 import pytz
-import math
-import time
+from typing import Dict, Optional, Tuple
 
-# Importer les composants nécessaires (ajuster les chemins si nécessaire)
-# Assurez-vous que ces imports correspondent à la structure de votre projet
-try:
-    from src.patterns.pattern_detector import PatternDetector
-    from src.risk.risk_manager import RiskManager
-    from src.constants import BUY, SELL
-except ImportError:
-    # Fallback si lancé depuis un autre répertoire (ex: racine du projet)
-    import sys
-    import os
-    sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..')) # Ajoute la racine
-    from src.patterns.pattern_detector import PatternDetector
-    from src.risk.risk_manager import RiskManager
-    from src.constants import BUY, SELL
-
-
-# Classe MockConnector (pour simuler les appels de données MT5)
-class MockConnector:
-    def __init__(self, htf_data: pd.DataFrame, ltf_data: pd.DataFrame, htf_tf: str, ltf_tf: str):
-        self._htf_data = htf_data
-        self._ltf_data = ltf_data
-        self._htf_tf = htf_tf
-        self._ltf_tf = ltf_tf
-        self.log = logging.getLogger(self.__class__.__name__)
+from src.constants import BUY, SELL
+from src.data_ingest.bar_store import BarStore
+from src.data_ingest.bar_frame import BarFrame
+from src.data_ingest import mt5_connector
+from src.backtest.exit_resolver import ExitResolver
+from src.strategy import smc_entry_logic
+
+_MODEL_PATTERN = re.compile(r'\[(M\d)\]')
+
+# Caractéristiques utilisées hors-ligne (FX standard, PNL déjà en devise du compte)
+DEFAULT_SYMBOL_SPECS = {'trade_contract_size': 100000, 'volume_min': 0.01, 'volume_max': 100.0, 'volume_step': 0.01, 'conversion_rate': 1.0}
+
+
+def align_htf_positions(ltf_times: np.ndarray, htf_times: np.ndarray, ltf_seconds: int, htf_seconds: int) -> np.ndarray:
+    """
+    Pour chaque bougie LTF, nombre de bougies HTF clôturées à sa clôture
+    (= position de fin exclusive de la fenêtre HTF, sans information future).
+
+    Une bougie HTF ouverte à t est clôturée à t + htf_seconds ; elle est visible
+    depuis la bougie LTF ouverte à u si t + htf_seconds <= u + ltf_seconds.
+    """
+    ltf_close = np.asarray(ltf_times, dtype=np.int64) + ltf_seconds
+    return np.searchsorted(np.asarray(htf_times, dtype=np.int64), ltf_close - htf_seconds, side='right')
+
+
+def _floor_to_step(value: float, step: float) -> float:
+    """ Arrondit 'value' au multiple inférieur de 'step' (tolérance flottante). """
+    if step <= 0: return value
+    return round(float(np.floor(value / step + 1e-9)) * step, 8)
+
+
+def signal_model(reason: Optional[str]) -> str:
+    """ Modèle ('M1', 'M2'...) indiqué dans la raison d'un signal, 'SMC' à défaut. """
+    match = _MODEL_PATTERN.search(reason or '')
+    return match.group(1) if match else 'SMC'
+
+
+def lot_size(balance: float, risk_percent: float, entry_price: float, sl_price: float, specs: dict) -> float:
+    """ Taille de lot pour risquer 'risk_percent' de 'balance' (arrondie au pas de volume ; 0 si sous le minimum). """
+    sl_distance = abs(entry_price - sl_price)
+    if sl_distance <= 0: return 0.0
+    risk_amount = balance * (risk_percent / 100.0)
+    raw_volume = risk_amount / (sl_distance * specs['trade_contract_size'] * specs['conversion_rate'])
+    volume = _floor_to_step(raw_volume, specs['volume_step'])
+    if volume < specs['volume_min']: return 0.0
+    return min(volume, specs['volume_max'])
 
-    def get_ohlc(self, symbol: str, timeframe: str, count: int, current_time=None):
-        """ Simule get_ohlc en retournant une slice des données préchargées. """
-        if not current_time:
-             self.log.error("MockConnector.get_ohlc needs current_time for backtest.")
-             return pd.DataFrame() # Retourner DF vide en cas d'erreur
-
-        # Utiliser current_time pour slicer les données historiques
-        if timeframe == self._htf_tf:
-            # S'assurer que l'index est trié (peut éviter des erreurs de slicing)
-            if not self._htf_data.index.is_monotonic_increasing:
-                self._htf_data.sort_index(inplace=True)
-            data = self._htf_data[self._htf_data.index <= current_time].tail(count)
-            return data.copy() # Retourner une copie
-        elif timeframe == self._ltf_tf:
-            if not self._ltf_data.index.is_monotonic_increasing:
-                self._ltf_data.sort_index(inplace=True)
-            data = self._ltf_data[self._ltf_data.index <= current_time].tail(count)
-            return data.copy()
-        else:
-            self.log.warning(f"MockConnector: Timeframe {timeframe} not handled (expects {self._htf_tf} or {self._ltf_tf})")
-            return pd.DataFrame()
-
-    # Ajouter d'autres méthodes mockées si PatternDetector ou RiskManager les utilisent
-    # def get_tick(self, symbol): ... (pourrait retourner la clôture LTF)
 
 class Backtester:
     """ Effectue un backtest de la stratégie Top-Down en utilisant la config fournie. """
@@ -72,335 +77,356 @@ class Backtester:
         self.initial_capital = initial_capital
         self.state = state # Pour reporter la progression via API
 
-        # Lit les timeframes directement depuis la config fournie
-        self.htf_timeframe = config.get('trend_filter', {}).get('higher_timeframe', 'H4')
-        self.ltf_timeframe = config.get('trading_settings', {}).get('timeframe', 'M15')
-
-        self.tf_mapping = { # Mapping string vers constantes MT5
-             'M1': mt5.TIMEFRAME_M1, 'M5': mt5.TIMEFRAME_M5, 'M15': mt5.TIMEFRAME_M15,
-             'M30': mt5.TIMEFRAME_M30, 'H1': mt5.TIMEFRAME_H1, 'H4': mt5.TIMEFRAME_H4,
-             'D1': mt5.TIMEFRAME_D1, 'W1': mt5.TIMEFRAME_W1, 'MN1': mt5.TIMEFRAME_MN1
-        }
-        self.htf = self.tf_mapping.get(self.htf_timeframe)
-        self.ltf = self.tf_mapping.get(self.ltf_timeframe)
-        if not self.htf or not self.ltf:
+        # Timeframes et tailles de fenêtre identiques au bot en direct
+        strategy_params = config['strategy']
+        self.htf_timeframe = strategy_params.get('htf_timeframe', 'H4')
+        self.ltf_timeframe = strategy_params.get('ltf_timeframe', 'M15')
+        windows = strategy_params.get('timeframes_config', {})
+        self.htf_window = int(windows.get(self.htf_timeframe, 200))
+        self.ltf_window = int(windows.get(self.ltf_timeframe, 300))
+        # Clé de l'état de la stratégie (structure incrémentale, mémoïsation), distincte du symbole en direct
+        self.strategy_key = f"backtest:{symbol}"
+
+        self.htf_seconds = mt5_connector.TIMEFRAME_SECONDS.get(self.htf_timeframe)
+        self.ltf_seconds = mt5_connector.TIMEFRAME_SECONDS.get(self.ltf_timeframe)
+        if not self.htf_seconds or not self.ltf_seconds:
              raise ValueError(f"Timeframes '{self.htf_timeframe}' ou '{self.ltf_timeframe}' invalides dans config.")
 
-        # Initialise les composants de la stratégie avec la config fournie
-        self.detector = PatternDetector(config)
-        self.mock_executor = self._create_mock_executor() # Crée un executor simplifié
-
-        self.htf_data = None # Données HTF chargées
-        self.ltf_data = None # Données LTF chargées
+        risk_params = config.get('risk', {})
+        self.risk_percent = risk_params.get('risk_percent', 1.0)
+        self.pip_size = risk_params.get('pip_sizes', {}).get(symbol, risk_params.get('default_pip_size', 0.0001))
+
+        bt_settings = config.get('backtest_settings', {})
+        self.max_concurrent_trades = bt_settings.get('max_concurrent_trades', 1)
+        self.commission_per_lot = bt_settings.get('commission_per_lot', 0.0)
+        # Sortie retenue quand le SL et le TP sont touchés dans la même bougie (voir exit_resolver)
+        self.exit_tie_break = bt_settings.get('exit_tie_break', 'sl_first')
+
+        # Stockage local de l'historique (None = téléchargement MT5 à chaque run)
+        bar_store_dir = bt_settings.get('bar_store_dir', 'data/bars')
+        self.bar_store = BarStore(bar_store_dir) if bar_store_dir else None
+        self.mt5_online = False # True si le terminal MT5 est connecté pendant le run
+
+        self.htf_data = None # BarFrame HTF chargée
+        self.ltf_data = None # BarFrame LTF chargée
+        self.specs = None # Caractéristiques du symbole (contrat, volumes, conversion PNL)
+        self._exit_resolver = None # ExitResolver de ltf_data (construit à la première simulation)
+        self._signal_exits = {} # Sorties résolues des signaux précalculés {position LTF: (exit_bar, prix, raison)}
         self.results = [] # Liste pour stocker les trades fermés
         self.equity = initial_capital # Équité flottante
         self.balance = initial_capital # Solde après clôture des trades
         self.open_trades = [] # Liste des trades ouverts simulés
 
-    def _create_mock_executor(self):
-        """ Crée un executor simplifié pour simuler les infos compte/symbole. """
-        class MockExecutor:
-             # Classes internes pour simuler les objets retournés par MT5
-             class MockSymbolInfo:
-                  def __init__(self, point, digits, trade_stops_level, volume_min, volume_max, volume_step, trade_contract_size, currency_profit):
-                      self.point, self.digits, self.trade_stops_level = point, digits, trade_stops_level
-                      self.volume_min, self.volume_max, self.volume_step = volume_min, volume_max, volume_step
-                      self.trade_contract_size, self.currency_profit = trade_contract_size, currency_profit
-             class MockAccountInfo:
-                   def __init__(self, equity, balance, currency): self.equity, self.balance, self.currency = equity, balance, currency
-
-             def __init__(self_exec, symbol, backtester_instance):
-                  self_exec.bt = backtester_instance # Référence au backtester pour equity/balance
-                  self_exec.log = logging.getLogger("MockExecutor")
-                  # Tente de récupérer les infos réelles au démarrage si MT5 est connecté
-                  try:
-                      if not mt5.terminal_info(): # Vérifier si MT5 est connecté
-                          raise ConnectionError("MT5 non connecté pour récupérer infos réelles.")
-                      info = mt5.symbol_info(symbol)
-                      acc_info = mt5.account_info()
-                      if not info or not acc_info: raise ValueError("Infos MT5 non récupérées.")
-                      self_exec.symbol_info_real = MockExecutor.MockSymbolInfo(info.point, info.digits, info.trade_stops_level, info.volume_min, info.volume_max, info.volume_step, info.trade_contract_size, info.currency_profit)
-                      self_exec.account_currency = acc_info.currency
-                      self_exec.log.info(f"Infos réelles MT5 chargées pour {symbol} / Compte {acc_info.login}")
-                  except (Exception, ConnectionError, ValueError) as e:
-                       self_exec.log.warning(f"Infos MT5 réelles indisponibles ({e}). Utilisation valeurs par défaut pour MockExecutor.")
-                       # Valeurs par défaut génériques (peuvent nécessiter ajustement)
-                       point = 0.00001 if "JPY" not in symbol else 0.001
-                       digits = 5 if "JPY" not in symbol else 3
-                       self_exec.symbol_info_real = MockExecutor.MockSymbolInfo(point, digits, 10, 0.01, 100.0, 0.01, 100000, symbol[3:] if len(symbol)>=6 else "USD")
-                       self_exec.account_currency = "EUR" # Supposer EUR par défaut
-
-             def symbol_info(self_exec, symbol_arg): return self_exec.symbol_info_real # Retourne toujours les infos stockées
-             def account_info(self_exec): return MockExecutor.MockAccountInfo(self_exec.bt.equity, self_exec.bt.balance, self_exec.account_currency) # Retourne état actuel BT
-             @property
-             def _mt5(self_exec): # Propriété pour que RiskManager accède via self._executor._mt5
-                  class MockMT5: # Simule l'objet mt5 pour RiskManager
-                       def symbol_info(self, s): return self_exec.symbol_info(s)
-                       def account_info(self): return self_exec.account_info()
-                       def symbol_info_tick(self, pair): # Simulation très basique pour conversion
-                           # Taux 1:1 par défaut si conversion nécessaire
-                           self_exec.log.debug(f"Mock MT5: symbol_info_tick({pair}) appelé, retourne Ask=1.0, Bid=1.0")
-                           return type('obj', (), {'ask': 1.0, 'bid': 1.0})
-                  return MockMT5()
-        return MockExecutor(self.symbol, self)
+    def _load_symbol_specs(self) -> dict:
+        """ Caractéristiques du symbole : réelles si MT5 est connecté, sinon valeurs par défaut. """
+        specs = dict(DEFAULT_SYMBOL_SPECS)
+        if not self.mt5_online:
+            self.log.warning("Infos MT5 réelles indisponibles. Utilisation des valeurs par défaut (contrat 100000, PNL en devise du compte).")
+            return specs
+        info = mt5.symbol_info(self.symbol)
+        account = mt5.account_info()
+        if info is None or account is None:
+            self.log.warning("Infos MT5 non récupérées. Utilisation des valeurs par défaut.")
+            return specs
+        specs.update(trade_contract_size=info.trade_contract_size, volume_min=info.volume_min,
+                     volume_max=info.volume_max, volume_step=info.volume_step)
+
+        # Taux de conversion devise de profit -> devise du compte (figé au début du run)
+        if info.currency_profit != account.currency:
+            tick = mt5.symbol_info_tick(f"{info.currency_profit}{account.currency}")
+            if tick is not None and tick.bid > 0:
+                specs['conversion_rate'] = tick.bid
+            else:
+                tick_inv = mt5.symbol_info_tick(f"{account.currency}{info.currency_profit}")
+                if tick_inv is not None and tick_inv.ask > 0:
+                    specs['conversion_rate'] = 1.0 / tick_inv.ask
+                else:
+                    self.log.warning(f"Taux de conversion {info.currency_profit}/{account.currency} introuvable. Utilise 1.0.")
+        return specs
+
+    def _load_timeframe(self, tf_str, start_dt, end_dt) -> BarFrame:
+        """ Charge une timeframe : BarStore local (complété depuis MT5 si connecté), sinon MT5 directement. """
+        if self.bar_store is not None:
+            if self.mt5_online:
+                mt5_connector.sync_history(self.bar_store, self.symbol, tf_str, start_dt, end_dt)
+            data = self.bar_store.read_frame(self.symbol, tf_str, start_dt, end_dt)
+            if not data.empty:
+                return data
+            if not self.mt5_online: raise ValueError(f"Aucune donnée {tf_str} dans le stockage local (mode hors-ligne).")
+
+        rates = mt5.copy_rates_range(self.symbol, mt5_connector.get_mt5_timeframe(tf_str), start_dt, end_dt)
+        if rates is None or len(rates) == 0: raise ValueError(f"Aucune donnée {tf_str}.")
+        # Colonnes contiguës : elles sont parcourues des dizaines de milliers de fois
+        return BarFrame.from_rates(rates, contiguous=True)
 
     def _load_data(self):
-        """ Charge les données HTF et LTF depuis MT5 pour la période. """
+        """ Charge les données HTF et LTF pour la période (stockage local en priorité). """
         self.log.info(f"Chargement données {self.symbol} [{self.htf_timeframe}/{self.ltf_timeframe}] de {self.start_date} à {self.end_date}...")
         try:
             start_dt = pytz.utc.localize(datetime.strptime(self.start_date, '%Y-%m-%d'))
             # Ajouter 1 jour et retirer 1 seconde pour inclure toute la journée de fin
             end_dt = pytz.utc.localize(datetime.strptime(self.end_date, '%Y-%m-%d')) + timedelta(days=1) - timedelta(seconds=1)
 
-            # Charger HTF
-            htf_rates = mt5.copy_rates_range(self.symbol, self.htf, start_dt, end_dt)
-            if htf_rates is None or len(htf_rates) == 0: raise ValueError(f"Aucune donnée HTF ({self.htf_timeframe}).")
-            self.htf_data = pd.DataFrame(htf_rates); self.htf_data['time'] = pd.to_datetime(self.htf_data['time'], unit='s', utc=True); self.htf_data.set_index('time', inplace=True)
-            self.htf_data = self.htf_data[['open', 'high', 'low', 'close', 'tick_volume']].rename(columns=str.lower).rename(columns={'tick_volume':'volume'})
-
-            # Charger LTF
-            ltf_rates = mt5.copy_rates_range(self.symbol, self.ltf, start_dt, end_dt)
-            if ltf_rates is None or len(ltf_rates) == 0: raise ValueError(f"Aucune donnée LTF ({self.ltf_timeframe}).")
-            self.ltf_data = pd.DataFrame(ltf_rates); self.ltf_data['time'] = pd.to_datetime(self.ltf_data['time'], unit='s', utc=True); self.ltf_data.set_index('time', inplace=True)
-            self.ltf_data = self.ltf_data[['open', 'high', 'low', 'close', 'tick_volume']].rename(columns=str.lower).rename(columns={'tick_volume':'volume'})
+            self.htf_data = self._load_timeframe(self.htf_timeframe, start_dt, end_dt)
+            self.ltf_data = self._load_timeframe(self.ltf_timeframe, start_dt, end_dt)
 
             self.log.info(f"Données chargées: {len(self.htf_data)} HTF, {len(self.ltf_data)} LTF.")
             if self.ltf_data.empty: raise ValueError("Données LTF vides.")
 
         except Exception as e:
-            self.log.error(f"Erreur chargement données MT5: {e}", exc_info=True); return False
+            self.log.error(f"Erreur chargement données: {e}", exc_info=True); return False
         return True
 
-    def run(self):
-        """ Exécute la boucle principale du backtest. """
-        start_time_bt = time.time()
-        # Initialiser MT5 (nécessaire pour _load_data et _create_mock_executor)
-        mt5_initialized = mt5.initialize()
-        if not mt5_initialized:
-            self.log.error("Échec initialisation MT5 pour backtest.")
-            if self.state: self.state.update_backtest_status("Erreur MT5 Init", 100)
-            return None # Impossible de continuer sans MT5 pour les données/infos
-
-        # Vérifier si le symbole existe dans MT5
-        symbol_info_check = mt5.symbol_info(self.symbol)
-        if not symbol_info_check:
-             self.log.error(f"Symbole {self.symbol} non trouvé sur la plateforme MT5.")
-             mt5.shutdown()
-             if self.state: self.state.update_backtest_status(f"Erreur Symbole {self.symbol}", 100)
-             return None
-        # Sélectionner le symbole (bonne pratique)
-        if not mt5.symbol_select(self.symbol, True):
-            self.log.warning(f"Impossible de sélectionner {self.symbol} dans MarketWatch (déjà présent?).")
-            # Ne pas arrêter, mais logguer
+    def load(self) -> bool:
+        """
+        Initialise MT5 (si disponible), charge les données HTF/LTF et les caractéristiques du symbole.
+        Séparé de run() pour charger l'historique une seule fois (ex: balayage de paramètres).
+        """
+        # Initialiser MT5 (nécessaire pour _load_data et _load_symbol_specs)
+        self.mt5_online = mt5.initialize()
+        if not self.mt5_online:
+            if self.bar_store is None:
+                self.log.error("Échec initialisation MT5 pour backtest.")
+                if self.state: self.state.update_backtest_status("Erreur MT5 Init", 100)
+                return False # Impossible de continuer sans MT5 pour les données/infos
+            self.log.warning("MT5 indisponible. Backtest hors-ligne sur le stockage local.")
+
+        if self.mt5_online:
+            # Vérifier si le symbole existe dans MT5
+            symbol_info_check = mt5.symbol_info(self.symbol)
+            if not symbol_info_check:
+                 self.log.error(f"Symbole {self.symbol} non trouvé sur la plateforme MT5.")
+                 mt5.shutdown()
+                 if self.state: self.state.update_backtest_status(f"Erreur Symbole {self.symbol}", 100)
+                 return False
+            # Sélectionner le symbole (bonne pratique)
+            if not mt5.symbol_select(self.symbol, True):
+                self.log.warning(f"Impossible de sélectionner {self.symbol} dans MarketWatch (déjà présent?).")
+                # Ne pas arrêter, mais logguer
 
         # Charger les données historiques
         if not self._load_data():
-            mt5.shutdown()
+            if self.mt5_online: mt5.shutdown()
             if self.state: self.state.update_backtest_status("Erreur chargement données", 100)
-            return None # Arrêter si les données ne peuvent être chargées
-
-        # Initialiser le MockConnector avec les données chargées
-        mock_connector = MockConnector(self.htf_data, self.ltf_data, self.htf_timeframe, self.ltf_timeframe)
+            return False # Arrêter si les données ne peuvent être chargées
 
-        # Initialiser RiskManager avec le MockExecutor (utilise self.config)
-        try:
-             risk_manager = RiskManager(self.config, self.mock_executor, self.symbol)
-        except ValueError as e:
-             self.log.error(f"Erreur initialisation RiskManager: {e}")
-             mt5.shutdown() # Fermer MT5 si RM échoue
-             return None
-
-        total_candles = len(self.ltf_data); processed_candles = 0
-        self.log.info(f"Début de la simulation sur {total_candles} bougies LTF...")
-
-        # --- Boucle Principale du Backtest ---
-        for timestamp, ltf_candle in self.ltf_data.iterrows():
-            processed_candles += 1
-            current_time_utc = timestamp # Timestamp de la bougie LTF actuelle
-
-            # Préparer les slices de données pour cette itération
-            ltf_slice = self.ltf_data[self.ltf_data.index <= current_time_utc]
-            # Assurer que l'index HTF est correct pour le slicing
-            htf_slice = self.htf_data[self.htf_data.index <= current_time_utc]
-
-            # Vérifier si assez de données pour l'analyse
-            # TODO: Ajuster ces nombres si PatternDetector ou RiskManager changent leurs exigences
-            min_ltf_bars = 50
-            min_htf_bars = max(210, self.config.get('trend_filter',{}).get('ema_slow_period', 200) + 10) # Assez pour EMA lente
-            if len(ltf_slice) < min_ltf_bars or len(htf_slice) < min_htf_bars:
-                # Pas assez de données historiques au début, on saute
-                continue
-
-            # 1. Gérer les trades ouverts (SL/TP) sur la bougie LTF actuelle
-            self._manage_open_trades(ltf_candle, risk_manager)
-
-            # 2. Vérifier nouveau signal avec la stratégie Top-Down
-            try:
-                # PatternDetector utilise maintenant le MockConnector
-                trade_signal = self.detector.detect_patterns(htf_slice, ltf_slice, mock_connector, self.symbol)
-            except Exception as e_detect:
-                 # Capturer les erreurs potentielles dans detect_patterns
-                 self.log.error(f"Erreur dans detect_patterns @ {current_time_utc}: {e_detect}", exc_info=True)
-                 trade_signal = None # Pas de signal si erreur
-
-            # 3. Exécuter nouveau trade si signal valide et limite non atteinte
-            if trade_signal and len(self.open_trades) < self.config.get('risk_management', {}).get('max_concurrent_trades', 5):
-                self._process_signal(trade_signal, risk_manager, ltf_slice, ltf_candle)
+        self.specs = self._load_symbol_specs()
+        # Les données sont en mémoire : MT5 n'est plus nécessaire pendant la simulation
+        if self.mt5_online: mt5.shutdown()
+        return True
 
-            # Mettre à jour la progression pour l'interface utilisateur
-            if processed_candles % 200 == 0 and self.state: # Maj moins fréquente
-                progress = int((processed_candles / total_candles) * 100)
-                # Limiter le message pour éviter surcharge UI
-                status_msg = f"Traitement {processed_candles}/{total_candles}"
-                if len(status_msg) > 50: status_msg = f"Prog. {progress}%"
-                self.state.update_backtest_status(status_msg, progress)
+    def run(self, htf_data: Optional[BarFrame] = None, ltf_data: Optional[BarFrame] = None, specs: Optional[dict] = None,
+            cursor_range: Optional[Tuple[int, int]] = None, signals: Optional[Dict[int, tuple]] = None):
+        """
+        Exécute le backtest.
+
+        Args:
+            htf_data, ltf_data (BarFrame): Données déjà chargées (ex: mémoire partagée d'un balayage).
+                                           Si absentes, elles sont chargées par load().
+            specs (dict): Caractéristiques du symbole associées (défaut: DEFAULT_SYMBOL_SPECS).
+            cursor_range (tuple): (début, fin exclusive) en positions LTF ; les bougies antérieures
+                                  ne servent que d'historique (ex: fenêtre d'un walk-forward).
+            signals (dict): Signaux précalculés par scan_signals() (la stratégie n'est pas rappelée).
+        """
+        start_time_bt = time.time()
+        if htf_data is not None and ltf_data is not None:
+            self.attach(htf_data, ltf_data, specs)
+        elif not self.load():
+            return None
 
-            # Mettre à jour l'équité flottante à chaque bougie
-            self._update_equity(ltf_candle['close'])
-        # --- Fin Boucle Principale ---
+        self._simulate(*(cursor_range or (0, None)), signals=signals)
 
-        # Fermer les trades restants à la fin
-        if not self.ltf_data.empty:
-             self._close_remaining_trades(self.ltf_data.iloc[-1])
-        
-        # Fermer la connexion MT5 utilisée pour les données
-        mt5.shutdown()
-        
         duration = time.time() - start_time_bt
         self.log.info(f"Backtest terminé en {duration:.2f} secondes. {len(self.results)} trades exécutés.")
         if self.state: self.state.update_backtest_status(f"Terminé ({len(self.results)} trades)", 100)
 
-        return self._generate_report()
+        return self.generate_report()
+
+    def attach(self, htf_data: BarFrame, ltf_data: BarFrame, specs: Optional[dict] = None):
+        """ Utilise des données déjà chargées (au lieu de load()). """
+        self.htf_data, self.ltf_data = htf_data, ltf_data
+        self.specs = dict(specs or DEFAULT_SYMBOL_SPECS)
+
+    def exit_resolver(self) -> ExitResolver:
+        """ Résolveur des sorties SL/TP sur les bougies LTF chargées (reconstruit si elles changent). """
+        if self._exit_resolver is None or self._exit_resolver.bars is not self.ltf_data:
+            self._exit_resolver = ExitResolver(self.ltf_data, self.exit_tie_break)
+        return self._exit_resolver
+
+    def tradable_range(self) -> Tuple[int, int]:
+        """ Positions LTF [début, fin) simulables (fenêtres HTF/LTF complètes). """
+        _, first, end = self._cursors()
+        return first, end
+
+    def _cursors(self, start_index: int = 0, end_index: Optional[int] = None) -> Tuple[np.ndarray, int, int]:
+        """
+        Position HTF alignée de chaque bougie LTF, et bornes [first, end) des curseurs
+        (first = premier curseur disposant de fenêtres complètes).
+        """
+        htf_end = align_htf_positions(self.ltf_data.time, self.htf_data.time, self.ltf_seconds, self.htf_seconds)
+        first = max(self.ltf_window - 1, int(np.searchsorted(htf_end, self.htf_window, side='left')), start_index)
+        end = len(self.ltf_data) if end_index is None else min(end_index, len(self.ltf_data))
+        return htf_end, first, end
+
+    def _signal_at(self, i: int, h: int) -> tuple:
+        """
+        Signal de la stratégie à la clôture de la bougie LTF i (fenêtres de taille fixe, vues sans copie).
+        Clé distincte du symbole en direct : la fenêtre HTF ne change qu'à chaque clôture HTF,
+        ses analyses (structure, POIs) sont mémoïsées entre les curseurs.
+        Les curseurs doivent être parcourus dans l'ordre, après _reset_strategy_state().
+        Toutes les bougies des fenêtres sont clôturées (closed_only=False).
+        """
+        mtf_data = {self.htf_timeframe: self.htf_data[h - self.htf_window:h],
+                    self.ltf_timeframe: self.ltf_data[i - self.ltf_window + 1:i + 1]}
+        return smc_entry_logic.check_all_smc_signals(mtf_data, self.config, self.pip_size, symbol=self.strategy_key,
+                                                     closed_only=False)
+
+    def _reset_strategy_state(self):
+        """
+        Repart d'un état de stratégie propre avant de parcourir les curseurs.
+
+        L'état conservé sous strategy_key (mémoïsation, structure incrémentale) est partagé par
+        tout le processus : sans réinitialisation, un second run (autre Backtester, jeu de paramètres
+        suivant d'un worker...) reprendrait la structure là où le précédent l'a laissée.
+        La structure incrémentale ne dépend que des fenêtres reçues (voir StructureState) :
+        aucun amorçage n'est nécessaire pour démarrer à un curseur quelconque.
+        """
+        smc_entry_logic.reset_symbol_state(self.strategy_key)
+
+    def scan_signals(self, start_index: int = 0, end_index: Optional[int] = None) -> Dict[int, tuple]:
+        """
+        Signaux de la stratégie pour tous les curseurs de [start_index, end_index), indépendamment
+        des trades ouverts. Un signal ne dépend que des fenêtres et des paramètres (la structure
+        incrémentale donne les mêmes résultats que l'analyse par lot) ; jamais de l'état du compte
+        ni d'un run précédent : le résultat peut être rejoué par run(signals=...) sur n'importe
+        quelle sous-période.
+
+        Returns:
+            dict: {position LTF: (direction, raison, sl, tp)} (curseurs avec signal uniquement).
+        """
+        htf_end, first, end = self._cursors(start_index, end_index)
+        self._reset_strategy_state()
+        signals = {}
+        for i in range(first, end):
+            signal = self._signal_at(i, int(htf_end[i]))
+            if signal[0]:
+                signals[i] = signal
+        return signals
+
+    def _simulate(self, start_index: int = 0, end_index: Optional[int] = None, signals: Optional[Dict[int, tuple]] = None):
+        """
+        Boucle à curseur : pour chaque bougie LTF i (considérée clôturée), clôture des trades
+        dont la sortie SL/TP tombe sur i, puis recherche de signal sur les fenêtres
+        ltf[i - ltf_window + 1 : i + 1] et htf[h - htf_window : h] (h = bougies HTF clôturées).
+        Avec des signaux précalculés, toutes leurs sorties sont résolues en une fois.
+        """
+        htf_end, first, end = self._cursors(start_index, end_index)
+        if end <= first:
+            self.log.warning("Aucune bougie LTF à simuler (historique insuffisant pour les fenêtres).")
+            return
+        if signals is None:
+            self._reset_strategy_state()
+        progress_step = max(200, (end - first) // 100)
+        self.log.info(f"Début de la simulation sur {end - first}/{len(self.ltf_data)} bougies LTF...")
+
+        resolver = self.exit_resolver()
+        self._signal_exits = resolver.label_signals(signals) if signals else {}
+        closes = self.ltf_data.close
+        for i in range(first, end):
+            # 1. Clôturer les trades dont la sortie SL/TP est sur la bougie LTF actuelle
+            if self.open_trades:
+                self._manage_open_trades(i)
+
+            # 2. Vérifier nouveau signal
+            if len(self.open_trades) < self.max_concurrent_trades:
+                if signals is None:
+                    signal = self._signal_at(i, int(htf_end[i]))
+                else:
+                    signal = signals.get(i, (None, None, None, None))
+                if signal[0]:
+                    self._process_signal(i, *signal)
 
-    def _process_signal(self, trade_signal, risk_manager, ltf_data_slice, current_ltf_candle):
-        """ Tente d'ouvrir un trade basé sur le signal, calcule params. """
-        entry_price = current_ltf_candle['close'] # Simule entrée à la clôture LTF
-        direction = trade_signal['direction']
-        mock_account_info = self.mock_executor.account_info() # Récupère équité/solde simulés
-        try:
-             volume, sl, tp = risk_manager.calculate_trade_parameters(
-                 mock_account_info.equity, entry_price,
-                 ltf_data_slice, # RM utilise LTF pour SL/ATR
-                 trade_signal # Contient target_price HTF
-             )
-        except Exception as e_calc:
-             self.log.error(f"Erreur calculate_trade_parameters @ {current_ltf_candle.name}: {e_calc}", exc_info=True)
-             volume = 0.0; sl = 0.0; tp = 0.0
-
-        if volume > 0 and sl != 0 and tp != 0: # Vérifier validité SL/TP aussi
-             self._open_trade(trade_signal, entry_price, volume, sl, tp, current_ltf_candle.name)
-        elif volume <= 0:
-             # Log déjà présent dans calculate_trade_parameters si RR faible ou vol < min etc.
-             pass
-
-    def _open_trade(self, signal, entry_price, volume, sl, tp, open_time):
+            # Mettre à jour la progression pour l'interface utilisateur
+            if self.state and (i - first + 1) % progress_step == 0:
+                self.state.update_backtest_status(f"Traitement {i + 1}/{end}", int((i - first + 1) / (end - first) * 100))
+
+            # Mettre à jour l'équité flottante à chaque bougie
+            if self.open_trades:
+                self._update_equity(closes[i])
+
+        # Fermer les trades restants à la fin
+        self._close_remaining_trades(end - 1)
+
+    def _lot_size(self, entry_price, sl_price):
+        """ Taille de lot pour risquer 'risk_percent' du solde (arrondie au pas de volume). """
+        return lot_size(self.balance, self.risk_percent, entry_price, sl_price, self.specs)
+
+    def _process_signal(self, i, direction, reason, sl_price, tp_price):
+        """ Tente d'ouvrir un trade basé sur le signal (entrée à la clôture LTF). """
+        entry_price = float(self.ltf_data.close[i])
+        # SL/TP incohérents avec l'entrée simulée : le trade serait clôturé immédiatement
+        if direction == BUY and not (sl_price < entry_price < tp_price): return
+        if direction == SELL and not (tp_price < entry_price < sl_price): return
+        volume = self._lot_size(entry_price, sl_price)
+        if volume > 0:
+            self._open_trade(direction, signal_model(reason), entry_price, volume, sl_price, tp_price, i)
+
+    def _open_trade(self, direction, pattern, entry_price, volume, sl, tp, i):
         """ Simule l'ouverture d'un trade et l'ajoute à self.open_trades. """
-        trade_id = f"BT-{len(self.results)+1}-{int(open_time.timestamp())}"
+        open_time = int(self.ltf_data.time[i])
+        trade_id = f"BT-{len(self.results)+1}-{open_time}"
         new_trade = {
-            'trade_id': trade_id, 'symbol': self.symbol, 'direction': signal['direction'],
-            'pattern': signal['pattern'], 'volume': volume, 'entry_price': entry_price,
-            'sl': sl, 'tp': tp, 'open_time': open_time,
-            'close_time': None, 'close_price': None, 'pnl': 0.0, 'status': 'open', 'reason': ''
+            'trade_id': trade_id, 'symbol': self.symbol, 'direction': direction,
+            'pattern': pattern, 'volume': volume, 'entry_price': entry_price,
+            'sl': float(sl), 'tp': float(tp), 'open_bar': i, 'open_time': open_time,
+            'close_bar': None, 'close_time': None, 'close_price': None, 'pnl': 0.0, 'status': 'open', 'reason': ''
         }
+        # Sortie SL/TP (exit_bar, prix, raison) : déjà résolue pour les signaux précalculés
+        new_trade['exit'] = self._signal_exits.get(i) or self.exit_resolver().resolve_trade(new_trade)
         self.open_trades.append(new_trade)
-        # Log plus concis
-        self.log.info(f"OUVERT ({trade_id}): {signal['direction']} {volume:.2f} @{entry_price:.5f} SL={sl:.5f} TP={tp:.5f} | {open_time.strftime('%Y-%m-%d %H:%M')}")
+        self.log.debug(f"OUVERT ({trade_id}): {direction} {volume:.2f} @{entry_price:.5f} SL={sl:.5f} TP={tp:.5f}")
 
-    def _manage_open_trades(self, current_ltf_candle, risk_manager):
-        """ Vérifie SL/TP sur la bougie LTF actuelle pour les trades ouverts. """
-        candle_high = current_ltf_candle['high']; candle_low = current_ltf_candle['low']
-        current_time = current_ltf_candle.name
-        trades_to_close = []
+    def _manage_open_trades(self, i):
+        """ Clôture les trades dont la sortie SL/TP (résolue à l'ouverture) est la bougie LTF i. """
+        for trade in list(self.open_trades):
+            exit_bar, exit_price, exit_reason = trade['exit']
+            if exit_bar == i:
+                self._close_trade(trade, exit_price, i, exit_reason)
 
-        for trade in self.open_trades:
-            close_reason = None; close_price = None
-            # Logique SL/TP (inchangée)
-            if trade['direction'] == BUY:
-                if candle_low <= trade['sl']: close_price = trade['sl']; close_reason = "SL"
-                elif candle_high >= trade['tp']: close_price = trade['tp']; close_reason = "TP"
-            elif trade['direction'] == SELL:
-                if candle_high >= trade['sl']: close_price = trade['sl']; close_reason = "SL"
-                elif candle_low <= trade['tp']: close_price = trade['tp']; close_reason = "TP"
-
-            if close_reason:
-                trades_to_close.append((trade, close_price, current_time, close_reason))
-            # else:
-                # TODO: Implémenter simulation BE/Trailing si nécessaire
-                # mock_tick = {'bid': current_ltf_candle['close'], 'ask': current_ltf_candle['close']} # Approximation
-                # risk_manager.manage_open_positions([trade_obj_mt5_like], mock_tick, ltf_data_slice_for_rm)
-                # Analyser les actions retournées (modif SL/TP) et les appliquer à `trade` dict.
-
-        # Clôturer les trades marqués
-        for trade, price, time, reason in trades_to_close:
-            self._close_trade(trade, price, time, reason)
-
-    def _close_trade(self, trade, close_price, close_time, reason=""):
+    def _close_trade(self, trade, close_price, i, reason=""):
         """ Simule clôture, calcule PNL, met à jour balance, ajoute aux résultats. """
         if trade['status'] != 'open': return # Évite double clôture
 
-        contract_size = self.mock_executor.symbol_info_real.trade_contract_size
-        volume = trade['volume']; entry_price = trade['entry_price']
-        profit_currency = self.mock_executor.symbol_info_real.currency_profit
-        account_currency = self.mock_executor.account_currency
-        point = self.mock_executor.symbol_info_real.point
-
-        pnl_points = (close_price - entry_price) if trade['direction'] == BUY else (entry_price - close_price)
-        # Convertir points en prix (division par 'point') n'est PAS nécessaire ici
-        # pnl_profit_currency = (pnl_points / point) * ... -> Incorrect
-        pnl_profit_currency = pnl_points * contract_size * volume
-
-        # Convertir en devise du compte
-        pnl_account_currency = pnl_profit_currency
-        if profit_currency != account_currency:
-             try:
-                 # Utiliser une instance RM temporaire juste pour la conversion
-                 # Ceci suppose que RiskManager peut être instancié sans erreur ici
-                 temp_rm = RiskManager(self.config, self.mock_executor, self.symbol)
-                 rate = temp_rm.get_conversion_rate(profit_currency, account_currency)
-                 if rate and rate > 0: pnl_account_currency *= rate
-                 else: self.log.warning(f"Taux conversion PNL invalide {trade['trade_id']}. Utilise 1.0.")
-             except Exception as e_conv: # Capture erreur init RM ou conversion
-                 self.log.error(f"Erreur conversion PNL {trade['trade_id']}: {e_conv}. Utilise 1.0.")
-                 # pnl_account_currency reste pnl_profit_currency (taux 1.0 implicite)
-
-        # Simuler commission
-        commission = self.config.get('backtest_settings', {}).get('commission_per_lot', 0) * volume
-        # Simuler spread (optionnel, plus complexe)
-        # spread_cost = self.config.get('backtest_settings',{}).get('simulated_spread_pips',0) * point * contract_size * volume * rate_spread
-
-        final_pnl = pnl_account_currency - commission
-
-        trade.update({'close_price': close_price, 'close_time': close_time, 'pnl': final_pnl, 'status': 'closed', 'reason': reason})
+        pnl_points = (close_price - trade['entry_price']) if trade['direction'] == BUY else (trade['entry_price'] - close_price)
+        pnl_account_currency = pnl_points * self.specs['trade_contract_size'] * trade['volume'] * self.specs['conversion_rate']
+        final_pnl = pnl_account_currency - self.commission_per_lot * trade['volume']
+
+        trade.update({'close_price': float(close_price), 'close_bar': i, 'close_time': int(self.ltf_data.time[i]),
+                      'pnl': final_pnl, 'status': 'closed', 'reason': reason})
         self.balance += final_pnl # Mettre à jour solde
+        self.open_trades.remove(trade) # Retirer de la liste des ouverts
         self._update_equity(close_price) # Recalculer équité après clôture
 
-        self.results.append(trade.copy()) # Sauvegarder copie du trade fermé
-        self.open_trades.remove(trade) # Retirer de la liste des ouverts
-        # Log plus concis
-        self.log.info(f"CLOS ({trade['trade_id']}): {reason} @ {close_price:.5f} PNL={final_pnl:.2f} | Bal={self.balance:.2f} | {close_time.strftime('%Y-%m-%d %H:%M')}")
+        self.results.append(trade) # Le trade fermé n'est plus modifié
+        self.log.debug(f"CLOS ({trade['trade_id']}): {reason} @ {close_price:.5f} PNL={final_pnl:.2f} | Bal={self.balance:.2f}")
 
-    def _close_remaining_trades(self, last_candle):
+    def _close_remaining_trades(self, i):
         """ Ferme trades ouverts à la fin du backtest au dernier prix close. """
-        close_price = last_candle['close']; close_time = last_candle.name
         if self.open_trades:
+             close_price = float(self.ltf_data.close[i])
              self.log.info(f"Fermeture des {len(self.open_trades)} trade(s) restant(s) à la fin du backtest @ {close_price:.5f}")
-             for trade in list(self.open_trades): self._close_trade(trade, close_price, close_time, "Fin Backtest")
+             for trade in list(self.open_trades): self._close_trade(trade, close_price, i, "Fin Backtest")
 
     def _update_equity(self, current_price):
         """ Met à jour l'équité flottante basée sur les trades ouverts. """
+        factor = self.specs['trade_contract_size'] * self.specs['conversion_rate']
         current_pnl_floating = 0.0
-        contract_size = self.mock_executor.symbol_info_real.trade_contract_size
-        profit_currency = self.mock_executor.symbol_info_real.currency_profit
-        account_currency = self.mock_executor.account_currency; rate = 1.0
-        if profit_currency != account_currency:
-             try: temp_rm = RiskManager(self.config, self.mock_executor, self.symbol); rate = temp_rm.get_conversion_rate(profit_currency, account_currency) or 1.0
-             except ValueError: rate = 1.0 # Fallback si init RM échoue
         for trade in self.open_trades:
              pnl_points = (current_price - trade['entry_price']) if trade['direction'] == BUY else (trade['entry_price'] - current_price)
-             current_pnl_floating += (pnl_points * contract_size * trade['volume']) * rate
+             current_pnl_floating += pnl_points * factor * trade['volume']
         self.equity = self.balance + current_pnl_floating
 
-    def _generate_report(self):
+    def generate_report(self):
         """ Génère un dictionnaire résumé et la liste des trades pour l'API. """
         if not self.results: return {"summary": "Aucun trade exécuté.", "trades": []}
         df_results = pd.DataFrame(self.results)
@@ -414,8 +440,8 @@ class Backtester:
         max_drawdown_pct=(max_drawdown/df_results['peak'].max())*100 if df_results['peak'].max() > 0 else 0
         # Résumé
         summary = {"Period": f"{self.start_date} to {self.end_date}", "Symbol": self.symbol, "Strategy": f"TopDown {self.htf_timeframe}/{self.ltf_timeframe}", "Initial Capital": f"{self.initial_capital:.2f}", "Final Balance": f"{self.balance:.2f}", "Total Net PNL": f"{total_pnl:.2f}", "Total Trades": total_trades, "Win Rate (%)": f"{win_rate:.2f}", "Avg Win": f"{avg_win:.2f}", "Avg Loss": f"{avg_loss:.2f}", "Avg RR Ratio": f"{rr_ratio:.2f}", "Profit Factor": f"{profit_factor:.2f}", "Max Drawdown": f"{max_drawdown:.2f}", "Max Drawdown (%)": f"{max_drawdown_pct:.2f}"}
-        # Formater les trades pour JSON
-        df_results['open_time'] = df_results['open_time'].dt.strftime('%Y-%m-%d %H:%M:%S')
-        df_results['close_time'] = df_results['close_time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        # Formater les trades pour JSON (horodatages epoch -> texte, une seule conversion)
+        df_results['open_time'] = pd.to_datetime(df_results['open_time'], unit='s').dt.strftime('%Y-%m-%d %H:%M:%S')
+        df_results['close_time'] = pd.to_datetime(df_results['close_time'], unit='s').dt.strftime('%Y-%m-%d %H:%M:%S')
         report_trades = df_results[['trade_id', 'open_time', 'close_time', 'symbol', 'direction', 'pattern', 'volume', 'entry_price', 'sl', 'tp', 'close_price', 'pnl', 'reason', 'balance_after_close']].rename(columns={'reason': 'close_reason'})
-        return {"summary": summary, "trades": report_trades.to_dict('records')}
\ No newline at end of file
+        return {"summary": summary, "trades": report_trades.to_dict('records')}
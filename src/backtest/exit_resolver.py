@@ -0,0 +1,123 @@
+# Fichier: src/backtest/exit_resolver.py
+"""
+Résolution vectorisée des sorties SL/TP du backtest.
+
+Pour un trade ouvert à la clôture de la bougie 'open_bar', la sortie est la première
+bougie j > open_bar où le SL ou le TP est touché (BUY : low <= SL / high >= TP ;
+SELL : high >= SL / low <= TP). Au lieu de tester chaque trade ouvert sur chaque
+bougie, toutes les sorties sont cherchées en une fois par descente dans une table
+des extrema (array_utils.ExtremaTable), construite une fois par série LTF.
+
+Quand le SL et le TP sont touchés dans la même bougie, l'ordre réel est inconnu :
+    'sl_first'      — le SL est retenu (hypothèse prudente, comportement historique)
+    'tp_first'      — le TP est retenu
+    'open_distance' — le niveau le plus proche de l'ouverture de la bougie est retenu
+                      (SL en cas d'égalité ; couvre aussi les gaps au-delà d'un niveau)
+
+La sortie est exécutée au niveau touché (pas de glissement), comme auparavant.
+
+Version: 1.0
+"""
+
+__version__ = "1.0"
+
+import numpy as np
+from typing import Dict, Tuple
+
+from src.constants import BUY
+from src.analysis.array_utils import ExtremaTable
+from src.data_ingest.bar_frame import BarFrame
+
+TIE_BREAKS = ('sl_first', 'tp_first', 'open_distance')
+
+# Raison de sortie par code (0 = non touché dans l'historique)
+EXIT_REASONS = ('', 'SL', 'TP')
+_NONE, _SL, _TP = 0, 1, 2
+
+
+def resolve_exits(open_: np.ndarray, high: np.ndarray, low: np.ndarray, open_bars, directions, sl, tp,
+                  tie_break: str = 'sl_first', table: ExtremaTable = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Première sortie SL/TP de chaque trade (recherche à partir de la bougie open_bar + 1).
+
+    Args:
+        open_, high, low (np.ndarray): Série LTF.
+        open_bars (array): Position de la bougie d'entrée de chaque trade.
+        directions (array): BUY / SELL.
+        sl, tp (array): Niveaux de chaque trade.
+        tie_break (str): Règle appliquée si SL et TP sont touchés dans la même bougie (voir TIE_BREAKS).
+        table (ExtremaTable): Table déjà construite sur (low, high), sinon construite ici.
+
+    Returns:
+        tuple: (exit_bars, exit_prices, reason_codes) — -1 / NaN / 0 si aucun niveau n'est touché
+               (index de EXIT_REASONS pour les codes).
+    """
+    if tie_break not in TIE_BREAKS:
+        raise ValueError(f"tie_break '{tie_break}' invalide (attendu: {', '.join(TIE_BREAKS)}).")
+    starts = np.asarray(open_bars, dtype=np.int64).reshape(-1) + 1
+    is_buy = np.asarray(directions).reshape(-1) == BUY
+    sl = np.broadcast_to(np.asarray(sl, dtype=np.float64), starts.shape)
+    tp = np.broadcast_to(np.asarray(tp, dtype=np.float64), starts.shape)
+    table = table if table is not None else ExtremaTable(low, high)
+
+    # BUY : SL sous le prix (low), TP au-dessus (high) ; SELL : l'inverse
+    first_below = table.first_below(starts, np.where(is_buy, sl, tp))
+    first_above = table.first_above(starts, np.where(is_buy, tp, sl))
+    sl_bar = np.where(is_buy, first_below, first_above)
+    tp_bar = np.where(is_buy, first_above, first_below)
+
+    never = np.iinfo(np.int64).max
+    sl_key = np.where(sl_bar >= 0, sl_bar, never)
+    tp_key = np.where(tp_bar >= 0, tp_bar, never)
+    take_tp = tp_key < sl_key
+    both = (sl_key == tp_key) & (sl_bar >= 0)
+    if both.any():
+        if tie_break == 'tp_first':
+            take_tp |= both
+        elif tie_break == 'open_distance':
+            bar_open = np.asarray(open_, dtype=np.float64)[sl_bar[both]]
+            take_tp[both] = np.abs(tp[both] - bar_open) < np.abs(sl[both] - bar_open)
+
+    exit_bars = np.where(take_tp, tp_bar, sl_bar)
+    hit = exit_bars >= 0
+    exit_prices = np.where(hit, np.where(take_tp, tp, sl), np.nan)
+    reason_codes = np.where(hit, np.where(take_tp, _TP, _SL), _NONE).astype(np.int8)
+    return exit_bars, exit_prices, reason_codes
+
+
+class ExitResolver:
+    """ Sorties SL/TP sur une série LTF (table des extrema construite une fois). """
+
+    __slots__ = ('bars', 'tie_break', '_table')
+
+    def __init__(self, bars: BarFrame, tie_break: str = 'sl_first'):
+        if tie_break not in TIE_BREAKS:
+            raise ValueError(f"tie_break '{tie_break}' invalide (attendu: {', '.join(TIE_BREAKS)}).")
+        self.bars = bars
+        self.tie_break = tie_break
+        self._table = ExtremaTable(bars.low, bars.high)
+
+    def resolve(self, open_bars, directions, sl, tp) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Voir resolve_exits. """
+        return resolve_exits(self.bars.open, self.bars.high, self.bars.low, open_bars, directions, sl, tp,
+                             self.tie_break, self._table)
+
+    def label_signals(self, signals: Dict[int, tuple]) -> Dict[int, tuple]:
+        """
+        Sortie de chaque signal de Backtester.scan_signals s'il était exécuté (entrée à la clôture de sa bougie).
+
+        Returns:
+            dict: {position LTF: (exit_bar, prix, "SL"|"TP")} — exit_bar = -1 si jamais touché.
+        """
+        if not signals:
+            return {}
+        positions = np.fromiter(signals, dtype=np.int64, count=len(signals))
+        directions, _, sl, tp = zip(*signals.values())
+        exit_bars, exit_prices, codes = self.resolve(positions, directions, sl, tp)
+        return {int(i): (int(bar), float(price), EXIT_REASONS[code])
+                for i, bar, price, code in zip(positions, exit_bars, exit_prices, codes)}
+
+    def resolve_trade(self, trade: dict) -> tuple:
+        """ (exit_bar, prix, "SL"|"TP") d'un trade ouvert (exit_bar = -1 si jamais touché). """
+        exit_bars, exit_prices, codes = self.resolve([trade['open_bar']], [trade['direction']], trade['sl'], trade['tp'])
+        return int(exit_bars[0]), float(exit_prices[0]), EXIT_REASONS[codes[0]]
@@ -0,0 +1,328 @@
+# Fichier: src/backtest/param_sweep.py
+"""
+Balayage de paramètres du backtester (grille ou tirage aléatoire), en parallèle.
+
+L'historique HTF/LTF est chargé une seule fois par le processus principal
+(Backtester.load), publié en mémoire partagée (SharedBarRegistry) puis lu sans
+copie par chaque worker d'un pool de processus. Chaque run applique un jeu de
+paramètres à une copie de la configuration ; son résumé est ajouté au tableau
+de résultats (et au CSV) dès qu'il se termine.
+
+Espace de recherche (section 'param_sweep.space' de config.yaml) :
+    clé pointée ('strategy.htf_swing_order' ; sans point = section 'strategy')
+    -> liste de valeurs, ou {min, max, step} (grille) / {min, max} (tirage uniforme).
+
+    python -m src.backtest.param_sweep EURUSD 2024-01-01 2024-12-31 --mode random --runs 40
+
+Les timeframes (strategy.htf_timeframe / ltf_timeframe) ne font pas partie de l'espace :
+l'historique partagé est celui de la configuration de base.
+
+Un worker enchaîne plusieurs runs : chaque run repart d'un état de stratégie propre
+(Backtester.run réinitialise la structure incrémentale et la mémoïsation).
+
+Version: 1.3
+"""
+
+__version__ = "1.3"
+
+import os
+import csv
+import copy
+import time
+import random
+import logging
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Résumé du backtester -> colonnes numériques du tableau de résultats
+SUMMARY_FIELDS = {
+    "Total Trades": "total_trades",
+    "Win Rate (%)": "win_rate",
+    "Total Net PNL": "net_pnl",
+    "Final Balance": "final_balance",
+    "Profit Factor": "profit_factor",
+    "Avg RR Ratio": "avg_rr",
+    "Max Drawdown": "max_drawdown",
+    "Max Drawdown (%)": "max_drawdown_pct",
+}
+
+
+# --- Espace de recherche ---
+
+def _grid_values(values) -> list:
+    if isinstance(values, dict):
+        low, high, step = values['min'], values['max'], values.get('step', 1)
+        grid = np.arange(low, high + step / 2, step)
+        return [int(v) for v in grid] if all(isinstance(v, int) for v in (low, high, step)) else [round(float(v), 10) for v in grid]
+    return list(values) if isinstance(values, (list, tuple)) else [values]
+
+def grid_space(space: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Toutes les combinaisons de l'espace (produit cartésien)."""
+    keys = list(space)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(_grid_values(space[key]) for key in keys))]
+
+def random_space(space: Dict[str, Any], n_runs: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    'n_runs' jeux tirés au hasard (sans doublon si possible) : choix dans une liste,
+    tirage uniforme dans {min, max} (entier si les bornes sont entières, arrondi à 'step' si fourni).
+    """
+    rng = random.Random(seed)
+
+    def _draw(values):
+        if isinstance(values, dict):
+            low, high, step = values['min'], values['max'], values.get('step')
+            if isinstance(low, int) and isinstance(high, int) and (step is None or isinstance(step, int)):
+                return rng.randrange(low, high + 1, step or 1)
+            value = rng.uniform(low, high)
+            return round(low + round((value - low) / step) * step, 10) if step else value
+        return rng.choice(_grid_values(values))
+
+    param_sets, seen = [], set()
+    for _ in range(n_runs * 20): # Tentatives bornées (espace discret plus petit que n_runs)
+        params = {key: _draw(values) for key, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            param_sets.append(params)
+            if len(param_sets) >= n_runs:
+                break
+    return param_sets
+
+def apply_params(config: dict, params: Dict[str, Any]) -> dict:
+    """Copie de la configuration avec les paramètres appliqués (clés pointées, défaut: section 'strategy')."""
+    config = copy.deepcopy(config)
+    for key, value in params.items():
+        path = key.split('.') if '.' in key else ['strategy', key]
+        section = config
+        for part in path[:-1]:
+            section = section.setdefault(part, {})
+        section[path[-1]] = value
+    return config
+
+
+# --- Processus workers ---
+
+def install_backend(config: dict):
+    """Installe le simulateur MT5 si la configuration le demande (avant tout import de MetaTrader5)."""
+    mt5_cfg = config.get('mt5', {})
+    if mt5_cfg.get('backend', 'terminal') == 'simulator':
+        from src.data_ingest import mt5_simulator
+        mt5_simulator.install(mt5_cfg.get('simulator', {}))
+
+_worker: Dict[str, Any] = {}
+
+def _init_worker(config: dict, jobs: Dict[str, dict], registry_prefix: str, log_level: str):
+    """Initialise un worker : backend MT5, puis vues sur l'historique partagé de chaque symbole."""
+    logging.basicConfig(level=getattr(logging, str(log_level).upper(), logging.ERROR),
+                        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+    install_backend(config)
+    from src.data_ingest.shared_bars import SharedBarRegistry
+
+    registry = SharedBarRegistry(registry_prefix)
+    strategy_params = config['strategy']
+    frames = {symbol: (registry.read_frame(symbol, strategy_params['htf_timeframe']),
+                       registry.read_frame(symbol, strategy_params['ltf_timeframe'])) for symbol in jobs}
+    # Garder le registre : les vues en dépendent
+    _worker.update(config=config, jobs=jobs, registry=registry, frames=frames)
+
+def worker_backtester(params: Dict[str, Any], initial_capital: Optional[float] = None, symbol: Optional[str] = None):
+    """
+    (Dans un worker de history_pool) Backtester paramétré, sur l'historique partagé
+    ('symbol' : obligatoire si le pool partage plusieurs symboles).
+    Returns: (backtester, htf_data, ltf_data, specs) à passer à backtester.run().
+    """
+    from src.backtest.backtester import Backtester
+
+    symbol = symbol or next(iter(_worker['jobs']))
+    job = _worker['jobs'][symbol]
+    htf_data, ltf_data = _worker['frames'][symbol]
+    backtester = Backtester(apply_params(_worker['config'], params), symbol, job['start_date'], job['end_date'],
+                            job['initial_capital'] if initial_capital is None else initial_capital)
+    return backtester, htf_data, ltf_data, job['specs']
+
+def summary_metrics(summary) -> Dict[str, Optional[float]]:
+    """Résumé de Backtester.generate_report -> métriques numériques (SUMMARY_FIELDS)."""
+    if not isinstance(summary, dict): # "Aucun trade exécuté."
+        summary = {"Total Trades": 0, "Total Net PNL": 0.0} if summary is not None else {}
+    return {column: (float(summary[label]) if summary.get(label) is not None else None)
+            for label, column in SUMMARY_FIELDS.items()}
+
+def _run_one(run_id: int, params: Dict[str, Any]):
+    """Un run de backtest (dans un worker). Returns: (run_id, params, métriques, durée, erreur|None)."""
+    start = time.time()
+    try:
+        backtester, htf_data, ltf_data, specs = worker_backtester(params)
+        report = backtester.run(htf_data, ltf_data, specs)
+        metrics = summary_metrics(report['summary'] if report else None)
+        if metrics['final_balance'] is None:
+            metrics['final_balance'] = backtester.balance
+        return run_id, params, metrics, time.time() - start, None
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Run {run_id} ({params}) en échec: {e}", exc_info=True)
+        return run_id, params, summary_metrics(None), time.time() - start, str(e)
+
+
+# --- Coordinateur ---
+
+@contextmanager
+def history_pool(loaders, processes: int, log_level: str = "ERROR"):
+    """
+    Publie l'historique chargé par 'loaders' (Backtester après load(), un ou plusieurs symboles)
+    en mémoire partagée et ouvre un pool de processus dont les workers y accèdent
+    (voir worker_backtester).
+    """
+    from src.data_ingest.shared_bars import SharedBarRegistry
+
+    loaders = loaders if isinstance(loaders, (list, tuple)) else [loaders]
+    registry = SharedBarRegistry(f"kaspersweep{os.getpid()}", create=True)
+    try:
+        jobs = {}
+        for loader in loaders:
+            registry.publish(loader.symbol, loader.htf_timeframe, loader.htf_data.to_rates())
+            registry.publish(loader.symbol, loader.ltf_timeframe, loader.ltf_data.to_rates())
+            jobs[loader.symbol] = {'start_date': loader.start_date, 'end_date': loader.end_date,
+                                   'initial_capital': loader.initial_capital, 'specs': loader.specs}
+        context = multiprocessing.get_context('spawn') # Même démarrage que les shards du bot
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker,
+                                 initargs=(loaders[0].config, jobs, registry.prefix, log_level)) as pool:
+            yield pool
+    finally:
+        registry.close()
+
+def load_history(config: dict, symbol: str, start_date: str, end_date: str, initial_capital: float):
+    """Charge l'historique une seule fois (Backtester.load) ; lève RuntimeError en cas d'échec."""
+    from src.backtest.backtester import Backtester
+
+    loader = Backtester(config, symbol, start_date, end_date, initial_capital)
+    if not loader.load():
+        raise RuntimeError(f"{symbol}: chargement de l'historique impossible.")
+    return loader
+
+
+class ParameterSweep:
+    """
+    Lance des runs de Backtester sur un pool de processus, l'historique étant partagé.
+    """
+
+    def __init__(self, config: dict, symbol: str, start_date: str, end_date: str, initial_capital: float = 10000.0,
+                 processes: Optional[int] = None, results_path: Optional[str] = None, log_level: str = "ERROR"):
+        """
+        Args:
+            processes (int): Taille du pool (None/0 = tous les cœurs).
+            results_path (str): CSV alimenté au fil des runs (None = pas de fichier).
+            log_level (str): Niveau de log des workers (la stratégie journalise chaque signal).
+        """
+        self.config = config
+        self.symbol = symbol
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.processes = processes or os.cpu_count() or 1
+        self.results_path = results_path
+        self.log_level = log_level
+        self.results: List[Dict[str, Any]] = []
+
+    def _row(self, run_id, params, metrics, duration, error) -> Dict[str, Any]:
+        return {'run_id': run_id, **params, **metrics, 'duration_s': round(duration, 2), 'error': error}
+
+    def run(self, param_sets: List[Dict[str, Any]],
+            on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> pd.DataFrame:
+        """
+        Exécute tous les jeux de paramètres.
+
+        Args:
+            on_result (callable): Appelé avec chaque ligne de résultat dès que le run se termine.
+
+        Returns:
+            pd.DataFrame: Une ligne par run (paramètres + métriques), dans l'ordre des run_id.
+        """
+        self.results = []
+        loader = load_history(self.config, self.symbol, self.start_date, self.end_date, self.initial_capital)
+
+        param_keys = list(dict.fromkeys(key for params in param_sets for key in params))
+        columns = ['run_id'] + param_keys + list(SUMMARY_FIELDS.values()) + ['duration_s', 'error']
+        processes = max(1, min(self.processes, len(param_sets)))
+        logger.info(f"Balayage {self.symbol}: {len(param_sets)} runs sur {processes} processus "
+                    f"({len(loader.ltf_data)} bougies {loader.ltf_timeframe}).")
+
+        results_file = None
+        try:
+            writer = None
+            if self.results_path:
+                os.makedirs(os.path.dirname(self.results_path) or '.', exist_ok=True)
+                results_file = open(self.results_path, 'w', newline='')
+                writer = csv.DictWriter(results_file, fieldnames=columns)
+                writer.writeheader()
+
+            with history_pool(loader, processes, self.log_level) as pool:
+                futures = [pool.submit(_run_one, run_id, params) for run_id, params in enumerate(param_sets)]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    row = self._row(*future.result())
+                    self.results.append(row)
+                    if writer is not None:
+                        writer.writerow(row)
+                        results_file.flush()
+                    if on_result is not None:
+                        on_result(row)
+                    logger.info(f"Run {row['run_id']} terminé ({done}/{len(param_sets)}): "
+                                f"PNL={row['net_pnl']} trades={row['total_trades']} en {row['duration_s']}s")
+        finally:
+            if results_file is not None:
+                results_file.close()
+
+        return pd.DataFrame(self.results, columns=columns).sort_values('run_id').reset_index(drop=True)
+
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande (espace et options lus dans 'param_sweep' de config.yaml)."""
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Balayage de paramètres du backtester Kasperbot.")
+    parser.add_argument('symbol')
+    parser.add_argument('start_date', help="AAAA-MM-JJ")
+    parser.add_argument('end_date', help="AAAA-MM-JJ")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--capital', type=float, default=10000.0)
+    parser.add_argument('--mode', choices=['grid', 'random'], default=None)
+    parser.add_argument('--runs', type=int, default=None, help="Nombre de runs (mode random)")
+    parser.add_argument('--processes', type=int, default=None, help="0 = tous les cœurs")
+    parser.add_argument('--output', default=None, help="Fichier CSV des résultats")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    sweep_cfg = config.get('param_sweep', {})
+    install_backend(config)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    space = sweep_cfg.get('space', {})
+    mode = args.mode or sweep_cfg.get('mode', 'grid')
+    if mode == 'random':
+        param_sets = random_space(space, args.runs or sweep_cfg.get('n_runs', 50), sweep_cfg.get('seed'))
+    else:
+        param_sets = grid_space(space)
+    if not param_sets:
+        logger.error("Espace de recherche vide ('param_sweep.space').")
+        return None
+
+    sweep = ParameterSweep(
+        config, args.symbol, args.start_date, args.end_date, args.capital,
+        processes=args.processes if args.processes is not None else sweep_cfg.get('processes', 0),
+        results_path=args.output or sweep_cfg.get('results_file'),
+        log_level=sweep_cfg.get('worker_log_level', 'ERROR'),
+    )
+    results = sweep.run(param_sets)
+    print(results.sort_values('net_pnl', ascending=False).head(10).to_string(index=False))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+# Fichier: src/backtest/portfolio_backtester.py
+"""
+Backtest de portefeuille : tous les symboles sur un seul compte simulé.
+
+Les bougies LTF de chaque symbole sont fusionnées sur un axe temporel commun ;
+à chaque instant, les trades dont la sortie SL/TP (résolue en bloc par segment, voir
+exit_resolver) tombe sur la bougie de leur symbole sont clôturés, puis les nouveaux signaux sont exécutés sur le solde partagé, dans la
+limite globale 'portfolio.max_concurrent_trades', de la limite par symbole
+('backtest_settings.max_concurrent_trades') et de la marge libre (levier simulé).
+
+Parallélisme : un signal ne dépend pas de l'état du compte, ni de l'ordre dans lequel les
+segments sont analysés : Backtester.scan_signals réinitialise l'état de la stratégie du
+worker et, en structure incrémentale, l'amorce avec l'historique précédant le segment
+(mêmes signaux qu'une analyse continue). La période est découpée en
+segments de 'sync_days' jours ; l'analyse de chaque (symbole, segment) est confiée
+au pool de processus (historique partagé, voir param_sweep.history_pool) et la
+simulation du compte avance segment par segment (point de synchronisation), pendant
+que les segments suivants sont analysés.
+
+    python -m src.backtest.portfolio_backtester 2024-01-01 2024-12-31
+
+Version: 1.2
+"""
+
+__version__ = "1.2"
+
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from src.constants import BUY
+from src.backtest import param_sweep
+
+logger = logging.getLogger(__name__)
+
+
+def _scan_segment(symbol: str, start_index: int, end_index: int) -> Dict[int, tuple]:
+    """
+    (Worker) Signaux d'un symbole sur les positions LTF [start_index, end_index).
+    Indépendant des segments analysés auparavant par ce worker (voir Backtester._reset_strategy_state).
+    """
+    scanner, htf_data, ltf_data, specs = param_sweep.worker_backtester({}, symbol=symbol)
+    scanner.attach(htf_data, ltf_data, specs)
+    return scanner.scan_signals(start_index, end_index)
+
+
+class PortfolioBacktester:
+    """ Backtest multi-symboles sur un solde, une équité et une marge partagés. """
+
+    def __init__(self, config: dict, start_date: str, end_date: str, initial_capital: float,
+                 symbols: Optional[List[str]] = None, processes: Optional[int] = None, state=None):
+        """
+        Args:
+            symbols (list): Symboles du portefeuille (défaut: 'portfolio.symbols', sinon 'mt5.symbols').
+            processes (int): Taille du pool d'analyse (None/0 = 'portfolio.processes', sinon tous les cœurs).
+        """
+        self.config = config
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.state = state # Pour reporter la progression via API
+
+        pf_settings = config.get('portfolio', {})
+        self.symbols = list(symbols or pf_settings.get('symbols') or config['mt5']['symbols'])
+        self.processes = processes or pf_settings.get('processes') or os.cpu_count() or 1
+        self.max_concurrent_trades = pf_settings.get('max_concurrent_trades', 5)
+        self.max_trades_per_symbol = config.get('backtest_settings', {}).get('max_concurrent_trades', 1)
+        self.leverage = pf_settings.get('leverage', 100)
+        self.sync_days = pf_settings.get('sync_days', 7)
+        self.log_level = pf_settings.get('worker_log_level', 'ERROR')
+        self.risk_percent = config.get('risk', {}).get('risk_percent', 1.0)
+        self.commission_per_lot = config.get('backtest_settings', {}).get('commission_per_lot', 0.0)
+
+        self.books: Dict[str, Any] = {} # {symbole: Backtester chargé (données + caractéristiques)}
+        self.balance = initial_capital
+        self.equity = initial_capital
+        self.used_margin = 0.0
+        self.open_trades: List[dict] = []
+        self.results: List[dict] = []
+        self.equity_curve: List[dict] = []
+        self.peak_concurrent = 0
+        self.rejected = {'limit': 0, 'margin': 0, 'volume': 0}
+        self._last_close: Dict[str, float] = {}
+
+    # --- Chargement ---
+
+    def _load(self):
+        """Charge chaque symbole (un Backtester par symbole) ; les symboles sans données sont ignorés."""
+        for symbol in self.symbols:
+            try:
+                self.books[symbol] = param_sweep.load_history(self.config, symbol, self.start_date, self.end_date, self.initial_capital)
+            except RuntimeError as e:
+                logger.warning(f"Portefeuille : {e} Symbole ignoré.")
+        return bool(self.books)
+
+    def _timeline(self):
+        """
+        Axe temporel commun (bougies LTF simulables de tous les symboles) et, pour chaque
+        symbole, sa position LTF à chaque instant (-1 si le symbole n'a pas de bougie).
+        """
+        ranges = {symbol: book.tradable_range() for symbol, book in self.books.items()}
+        times = np.unique(np.concatenate([np.asarray(book.ltf_data.time[ranges[symbol][0]:ranges[symbol][1]], dtype=np.int64)
+                                          for symbol, book in self.books.items()]))
+        positions = {}
+        for symbol, book in self.books.items():
+            first, end = ranges[symbol]
+            symbol_times = np.asarray(book.ltf_data.time, dtype=np.int64)
+            pos = np.searchsorted(symbol_times, times)
+            present = (pos >= first) & (pos < end)
+            present[present] = symbol_times[pos[present]] == times[present]
+            positions[symbol] = np.where(present, pos, -1)
+        return times, positions
+
+    def _segments(self, times: np.ndarray) -> List[tuple]:
+        """Bornes [g0, g1) des segments de 'sync_days' jours sur l'axe commun."""
+        seconds = max(1, int(self.sync_days * 86400))
+        buckets = (times - times[0]) // seconds
+        starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+        ends = np.append(starts[1:], len(times))
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    # --- Compte partagé ---
+
+    def _margin(self, symbol: str, volume: float, price: float) -> float:
+        """Marge requise en devise du compte (nominal converti / levier)."""
+        specs = self.books[symbol].specs
+        return volume * specs['trade_contract_size'] * price * specs['conversion_rate'] / self.leverage
+
+    def _open_trade(self, symbol: str, i: int, direction: str, reason: str, sl_price: float, tp_price: float,
+                    exit_hit: tuple) -> bool:
+        from src.backtest.backtester import lot_size, signal_model
+
+        book = self.books[symbol]
+        entry_price = float(book.ltf_data.close[i])
+        # SL/TP incohérents avec l'entrée simulée : le trade serait clôturé immédiatement
+        if direction == BUY and not (sl_price < entry_price < tp_price): return False
+        if direction != BUY and not (tp_price < entry_price < sl_price): return False
+
+        if len(self.open_trades) >= self.max_concurrent_trades:
+            self.rejected['limit'] += 1
+            return False
+        volume = lot_size(self.balance, self.risk_percent, entry_price, sl_price, book.specs)
+        if volume <= 0:
+            self.rejected['volume'] += 1
+            return False
+        margin = self._margin(symbol, volume, entry_price)
+        if margin > self.equity - self.used_margin:
+            self.rejected['margin'] += 1
+            return False
+
+        open_time = int(book.ltf_data.time[i])
+        self.open_trades.append({
+            'trade_id': f"PF-{len(self.results) + len(self.open_trades) + 1}-{symbol}-{open_time}", 'symbol': symbol,
+            'direction': direction, 'pattern': signal_model(reason), 'volume': volume,
+            'entry_price': entry_price, 'sl': float(sl_price), 'tp': float(tp_price), 'margin': margin,
+            'open_bar': i, 'open_time': open_time, 'exit': exit_hit,
+            'close_bar': None, 'close_time': None, 'close_price': None, 'pnl': 0.0, 'status': 'open', 'reason': ''
+        })
+        self.used_margin += margin
+        self.peak_concurrent = max(self.peak_concurrent, len(self.open_trades))
+        return True
+
+    def _close_trade(self, trade: dict, close_price: float, i: int, reason: str):
+        book = self.books[trade['symbol']]
+        specs = book.specs
+        pnl_points = (close_price - trade['entry_price']) if trade['direction'] == BUY else (trade['entry_price'] - close_price)
+        pnl = pnl_points * specs['trade_contract_size'] * trade['volume'] * specs['conversion_rate'] - self.commission_per_lot * trade['volume']
+        trade.update({'close_price': float(close_price), 'close_bar': i, 'close_time': int(book.ltf_data.time[i]),
+                      'pnl': pnl, 'status': 'closed', 'reason': reason})
+        self.balance += pnl
+        self.used_margin -= trade['margin']
+        self.open_trades.remove(trade)
+        self.results.append(trade)
+
+    def _update_equity(self):
+        floating = 0.0
+        for trade in self.open_trades:
+            specs = self.books[trade['symbol']].specs
+            price = self._last_close[trade['symbol']]
+            pnl_points = (price - trade['entry_price']) if trade['direction'] == BUY else (trade['entry_price'] - price)
+            floating += pnl_points * specs['trade_contract_size'] * trade['volume'] * specs['conversion_rate']
+        self.equity = self.balance + floating
+
+    # --- Simulation ---
+
+    def run(self) -> Optional[Dict[str, Any]]:
+        """
+        Exécute le backtest de portefeuille.
+
+        Returns:
+            dict: {'summary', 'trades'} (format Backtester.generate_report, tous symboles),
+                  'per_symbol' (trades / PNL / taux de réussite par symbole) et 'equity'
+                  (solde et équité à chaque point de synchronisation). None si aucune donnée.
+        """
+        start_time_bt = time.time()
+        if not self._load():
+            logger.error("Portefeuille : aucun symbole chargé.")
+            if self.state: self.state.update_backtest_status("Erreur chargement données", 100)
+            return None
+
+        times, positions = self._timeline()
+        if len(times) == 0:
+            logger.error("Portefeuille : historique insuffisant pour les fenêtres de la stratégie.")
+            return None
+        segments = self._segments(times)
+        symbols = list(self.books)
+        processes = max(1, min(self.processes, len(symbols) * len(segments)))
+        logger.info(f"Portefeuille : {len(symbols)} symboles, {len(times)} instants, {len(segments)} segments "
+                    f"de {self.sync_days}j, analyse sur {processes} processus.")
+
+        with param_sweep.history_pool(list(self.books.values()), processes, self.log_level) as pool:
+            # Analyse de tous les (symbole, segment), consommée dans l'ordre des segments
+            futures = []
+            for g0, g1 in segments:
+                segment_futures = {}
+                for symbol in symbols:
+                    present = positions[symbol][g0:g1]
+                    present = present[present >= 0]
+                    if len(present):
+                        segment_futures[symbol] = pool.submit(_scan_segment, symbol, int(present[0]), int(present[-1]) + 1)
+                futures.append(segment_futures)
+
+            peak_equity, max_equity_drawdown = self.initial_capital, 0.0
+            for k, (g0, g1) in enumerate(segments):
+                signals = {symbol: future.result() for symbol, future in futures[k].items()} # Point de synchronisation
+                exits = {symbol: self.books[symbol].exit_resolver().label_signals(symbol_signals)
+                         for symbol, symbol_signals in signals.items()}
+                for g in range(g0, g1):
+                    bars = [(symbol, int(positions[symbol][g])) for symbol in symbols if positions[symbol][g] >= 0]
+
+                    # 1. Sorties SL/TP tombant sur la bougie du symbole
+                    for symbol, i in bars:
+                        self._last_close[symbol] = float(self.books[symbol].ltf_data.close[i])
+                        for trade in [t for t in self.open_trades if t['symbol'] == symbol and t['exit'][0] == i]:
+                            self._close_trade(trade, trade['exit'][1], i, trade['exit'][2])
+                    self._update_equity()
+
+                    # 2. Nouveaux signaux (ordre des symboles de la configuration)
+                    for symbol, i in bars:
+                        signal = signals.get(symbol, {}).get(i)
+                        if signal is None:
+                            continue
+                        if sum(1 for t in self.open_trades if t['symbol'] == symbol) >= self.max_trades_per_symbol:
+                            continue
+                        self._open_trade(symbol, i, *signal, exits[symbol][i])
+
+                    peak_equity = max(peak_equity, self.equity)
+                    max_equity_drawdown = max(max_equity_drawdown, peak_equity - self.equity)
+
+                self.equity_curve.append({'time': str(np.datetime64(int(times[g1 - 1]), 's')),
+                                          'balance': round(self.balance, 2), 'equity': round(self.equity, 2),
+                                          'open_trades': len(self.open_trades)})
+                if self.state:
+                    self.state.update_backtest_status(f"Segment {k + 1}/{len(segments)}", int((k + 1) / len(segments) * 100))
+
+        # Fermer les trades restants au dernier prix de leur symbole
+        for trade in list(self.open_trades):
+            book = self.books[trade['symbol']]
+            last = book.tradable_range()[1] - 1
+            self._close_trade(trade, float(book.ltf_data.close[last]), last, "Fin Backtest")
+
+        duration = time.time() - start_time_bt
+        logger.info(f"Backtest portefeuille terminé en {duration:.2f} secondes. {len(self.results)} trades exécutés.")
+        if self.state: self.state.update_backtest_status(f"Terminé ({len(self.results)} trades)", 100)
+        return self._report(max_equity_drawdown, peak_equity)
+
+    def _report(self, max_equity_drawdown: float, peak_equity: float) -> Dict[str, Any]:
+        from src.backtest.backtester import Backtester
+
+        self.results.sort(key=lambda trade: (trade['close_time'], trade['trade_id']))
+        reporter = Backtester(self.config, "PORTFOLIO", self.start_date, self.end_date, self.initial_capital)
+        reporter.results, reporter.balance = self.results, self.balance
+        report = reporter.generate_report()
+
+        if isinstance(report['summary'], dict):
+            strategy_params = self.config['strategy']
+            report['summary'].update({
+                "Symbol": ", ".join(self.books),
+                "Strategy": f"Portfolio TopDown {strategy_params.get('htf_timeframe', 'H4')}/{strategy_params.get('ltf_timeframe', 'M15')}",
+                "Max Concurrent Trades": self.peak_concurrent,
+                "Max Equity Drawdown (%)": f"{(max_equity_drawdown / peak_equity) * 100 if peak_equity > 0 else 0:.2f}",
+                "Rejected (limit)": self.rejected['limit'],
+                "Rejected (margin)": self.rejected['margin'],
+                "Rejected (volume)": self.rejected['volume'],
+            })
+        per_symbol = []
+        if self.results:
+            df_results = pd.DataFrame(self.results)
+            grouped = df_results.groupby('symbol', sort=False)['pnl']
+            per_symbol = [{'symbol': symbol, 'trades': int(pnl.count()), 'net_pnl': round(float(pnl.sum()), 2),
+                           'win_rate': round(float((pnl > 0).mean() * 100), 2)} for symbol, pnl in grouped]
+        report['per_symbol'] = per_symbol
+        report['equity'] = self.equity_curve
+        return report
+
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande (section 'portfolio' de config.yaml)."""
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Backtest de portefeuille Kasperbot (tous les symboles, un compte).")
+    parser.add_argument('start_date', help="AAAA-MM-JJ")
+    parser.add_argument('end_date', help="AAAA-MM-JJ")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--capital', type=float, default=10000.0)
+    parser.add_argument('--symbols', nargs='*', default=None)
+    parser.add_argument('--processes', type=int, default=None, help="0 = tous les cœurs")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    param_sweep.install_backend(config)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    report = PortfolioBacktester(config, args.start_date, args.end_date, args.capital,
+                                 symbols=args.symbols, processes=args.processes).run()
+    if report:
+        print(report['summary'])
+        for row in report['per_symbol']:
+            print(row)
+    return report
+
+
+if __name__ == "__main__":
+    main()
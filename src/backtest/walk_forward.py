@@ -0,0 +1,271 @@
+# Fichier: src/backtest/walk_forward.py
+"""
+Optimisation walk-forward du backtester.
+
+La période est découpée en fenêtres glissantes (ou ancrées) in-sample / out-of-sample.
+Pour chaque fenêtre, le meilleur jeu de paramètres in-sample (selon 'objective') est
+évalué sur la fenêtre out-of-sample suivante ; les trades out-of-sample de toutes les
+fenêtres sont enchaînés (le solde de fin d'une fenêtre est le capital de la suivante)
+dans un rapport unique.
+
+Coût : l'historique est chargé une fois (partagé entre processus, voir param_sweep).
+Chaque worker calcule les signaux d'un jeu de paramètres une seule fois sur toute la
+période (Backtester.scan_signals, qui repart d'un état de stratégie propre : les
+signaux ne dépendent ni des jeux analysés avant par le même worker, ni de l'état du
+compte), puis rejoue chaque fenêtre in-sample sur ces signaux. Le nombre de
+fenêtres ne multiplie donc que la simulation des trades, pas l'analyse de la stratégie.
+
+    python -m src.backtest.walk_forward EURUSD 2023-01-01 2024-12-31
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import os
+import time
+import logging
+import argparse
+import numpy as np
+from concurrent.futures import as_completed
+from typing import Any, Dict, List, Optional
+
+from src.backtest import param_sweep
+
+logger = logging.getLogger(__name__)
+
+# Métriques à minimiser (les autres sont maximisées)
+_MINIMIZED = {'max_drawdown', 'max_drawdown_pct'}
+
+
+def make_folds(times: np.ndarray, first: int, end: int, in_sample_days: float, out_of_sample_days: float,
+               anchored: bool = False) -> List[Dict[str, int]]:
+    """
+    Fenêtres walk-forward en positions LTF, sur les bougies simulables [first, end).
+    La fenêtre out-of-sample suit immédiatement la fenêtre in-sample ; les fenêtres avancent
+    de la durée out-of-sample (in-sample glissante, ou ancrée au début si 'anchored').
+
+    Returns:
+        list: [{'is_start', 'is_end', 'oos_start', 'oos_end'}] (fins exclusives).
+    """
+    times = np.asarray(times, dtype=np.int64)
+    if end <= first:
+        return []
+    t0 = int(times[first])
+    is_seconds, oos_seconds = int(in_sample_days * 86400), int(out_of_sample_days * 86400)
+    if is_seconds <= 0 or oos_seconds <= 0:
+        raise ValueError("walk_forward: 'in_sample_days' et 'out_of_sample_days' doivent être positifs.")
+
+    def position(t):
+        return min(max(int(np.searchsorted(times, t, side='left')), first), end)
+
+    folds = []
+    k = 0
+    while True:
+        is_end = position(t0 + is_seconds + k * oos_seconds)
+        if is_end >= end:
+            break
+        folds.append({
+            'is_start': first if anchored else position(t0 + k * oos_seconds),
+            'is_end': is_end,
+            'oos_start': is_end,
+            'oos_end': position(t0 + is_seconds + (k + 1) * oos_seconds),
+        })
+        k += 1
+    return folds
+
+
+def _scan_and_score(param_id: int, params: Dict[str, Any], folds: List[Dict[str, int]]):
+    """
+    (Worker) Signaux d'un jeu de paramètres sur toute la période, puis métriques de chaque fenêtre in-sample.
+    Returns: (param_id, [métriques par fenêtre], signaux, durée, erreur|None)
+    """
+    start = time.time()
+    try:
+        scanner, htf_data, ltf_data, specs = param_sweep.worker_backtester(params)
+        scanner.attach(htf_data, ltf_data, specs)
+        # Réinitialise (et amorce en structure incrémentale) l'état laissé par le jeu précédent du worker
+        signals = scanner.scan_signals(folds[0]['is_start'], folds[-1]['oos_end'])
+
+        fold_metrics = []
+        for fold in folds:
+            backtester, _, _, _ = param_sweep.worker_backtester(params)
+            report = backtester.run(htf_data, ltf_data, specs, cursor_range=(fold['is_start'], fold['is_end']), signals=signals)
+            fold_metrics.append(param_sweep.summary_metrics(report['summary'] if report else None))
+        return param_id, fold_metrics, signals, time.time() - start, None
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Walk-forward: jeu {param_id} ({params}) en échec: {e}", exc_info=True)
+        return param_id, None, None, time.time() - start, str(e)
+
+
+class WalkForward:
+    """
+    Optimisation in-sample en parallèle (un processus par jeu de paramètres) et évaluation out-of-sample.
+    """
+
+    def __init__(self, config: dict, symbol: str, start_date: str, end_date: str, initial_capital: float = 10000.0,
+                 in_sample_days: float = 90, out_of_sample_days: float = 30, anchored: bool = False,
+                 objective: str = 'net_pnl', min_trades: int = 5, processes: Optional[int] = None,
+                 log_level: str = "ERROR"):
+        """
+        Args:
+            objective (str): Métrique de sélection (colonne de param_sweep.SUMMARY_FIELDS).
+            min_trades (int): Trades in-sample minimum pour qu'un jeu soit éligible
+                              (à défaut d'éligible, tous les jeux sont considérés).
+        """
+        if objective not in param_sweep.SUMMARY_FIELDS.values():
+            raise ValueError(f"walk_forward: objectif '{objective}' inconnu ({', '.join(param_sweep.SUMMARY_FIELDS.values())}).")
+        self.config = config
+        self.symbol = symbol
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.in_sample_days = in_sample_days
+        self.out_of_sample_days = out_of_sample_days
+        self.anchored = anchored
+        self.objective = objective
+        self.min_trades = min_trades
+        self.processes = processes or os.cpu_count() or 1
+        self.log_level = log_level
+
+    def _select(self, scores: Dict[int, List[dict]], fold_index: int) -> Optional[int]:
+        """Meilleur jeu in-sample pour une fenêtre (None si aucun jeu n'a été évalué)."""
+        candidates = {pid: fold_scores[fold_index] for pid, fold_scores in scores.items()}
+        eligible = {pid: m for pid, m in candidates.items() if (m['total_trades'] or 0) >= self.min_trades} or candidates
+        if not eligible:
+            return None
+        sign = -1.0 if self.objective in _MINIMIZED else 1.0
+
+        def key(pid):
+            value = eligible[pid][self.objective]
+            return (sign * value if value is not None else -np.inf, -pid) # À égalité : le premier jeu
+
+        return max(eligible, key=key)
+
+    def run(self, param_sets: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Exécute le walk-forward.
+
+        Returns:
+            dict: {'summary', 'trades'} (format Backtester.generate_report, trades out-of-sample enchaînés)
+                  + 'folds' (une ligne par fenêtre : dates, paramètres retenus, métriques IS/OOS).
+                  None si la période est trop courte pour une fenêtre.
+        """
+        from src.backtest.backtester import Backtester
+
+        if not param_sets:
+            raise ValueError("walk_forward: aucun jeu de paramètres.")
+        loader = param_sweep.load_history(self.config, self.symbol, self.start_date, self.end_date, self.initial_capital)
+        first, end = loader.tradable_range()
+        times = loader.ltf_data.time
+        folds = make_folds(times, first, end, self.in_sample_days, self.out_of_sample_days, self.anchored)
+        if not folds:
+            logger.error(f"Walk-forward {self.symbol}: période trop courte pour {self.in_sample_days}j IS + {self.out_of_sample_days}j OOS.")
+            return None
+
+        processes = max(1, min(self.processes, len(param_sets)))
+        logger.info(f"Walk-forward {self.symbol}: {len(folds)} fenêtres x {len(param_sets)} jeux sur {processes} processus.")
+
+        # 1. Signaux + métriques in-sample de chaque jeu (en parallèle)
+        scores: Dict[int, List[dict]] = {}
+        signals: Dict[int, Dict[int, tuple]] = {}
+        with param_sweep.history_pool(loader, processes, self.log_level) as pool:
+            futures = [pool.submit(_scan_and_score, pid, params, folds) for pid, params in enumerate(param_sets)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                pid, fold_metrics, param_signals, duration, error = future.result()
+                if error is None:
+                    scores[pid], signals[pid] = fold_metrics, param_signals
+                logger.info(f"Jeu {pid} évalué ({done}/{len(param_sets)}) en {duration:.1f}s" + (f" : ERREUR {error}" if error else ""))
+        if not scores:
+            logger.error(f"Walk-forward {self.symbol}: aucun jeu de paramètres n'a pu être évalué.")
+            return None
+
+        # 2. Meilleur jeu in-sample -> fenêtre out-of-sample (signaux déjà calculés, capital enchaîné)
+        def day(position):
+            return str(np.datetime64(int(times[min(position, len(times) - 1)]), 's').astype('datetime64[D]'))
+
+        balance = self.initial_capital
+        oos_trades, fold_rows = [], []
+        for k, fold in enumerate(folds):
+            pid = self._select(scores, k)
+            params = param_sets[pid]
+            backtester = Backtester(param_sweep.apply_params(self.config, params), self.symbol,
+                                    day(fold['oos_start']), day(fold['oos_end'] - 1), balance)
+            report = backtester.run(loader.htf_data, loader.ltf_data, loader.specs,
+                                    cursor_range=(fold['oos_start'], fold['oos_end']), signals=signals[pid])
+            oos_metrics = param_sweep.summary_metrics(report['summary'] if report else None)
+            for trade in backtester.results:
+                trade['trade_id'] = f"WF{k + 1}-{trade['trade_id']}"
+            oos_trades.extend(backtester.results)
+
+            fold_rows.append({
+                'fold': k + 1,
+                'is_start': day(fold['is_start']), 'is_end': day(fold['is_end'] - 1),
+                'oos_start': day(fold['oos_start']), 'oos_end': day(fold['oos_end'] - 1),
+                'params': params,
+                f'is_{self.objective}': scores[pid][k][self.objective],
+                'is_trades': scores[pid][k]['total_trades'],
+                'oos_net_pnl': round(backtester.balance - balance, 2),
+                'oos_trades': oos_metrics['total_trades'],
+                'oos_start_balance': round(balance, 2),
+            })
+            logger.info(f"Fenêtre {k + 1}/{len(folds)}: {params} -> OOS PNL={backtester.balance - balance:.2f}")
+            balance = backtester.balance
+
+        # 3. Rapport unique sur les trades out-of-sample enchaînés
+        reporter = Backtester(self.config, self.symbol, fold_rows[0]['oos_start'], fold_rows[-1]['oos_end'], self.initial_capital)
+        reporter.results, reporter.balance = oos_trades, balance
+        report = reporter.generate_report()
+        if isinstance(report['summary'], dict):
+            report['summary']['Strategy'] = (f"WalkForward {loader.htf_timeframe}/{loader.ltf_timeframe} "
+                                              f"({len(folds)} x {self.in_sample_days}j IS / {self.out_of_sample_days}j OOS, {self.objective})")
+        report['folds'] = fold_rows
+        return report
+
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande (sections 'walk_forward' et 'param_sweep' de config.yaml)."""
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Optimisation walk-forward du backtester Kasperbot.")
+    parser.add_argument('symbol')
+    parser.add_argument('start_date', help="AAAA-MM-JJ")
+    parser.add_argument('end_date', help="AAAA-MM-JJ")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--capital', type=float, default=10000.0)
+    parser.add_argument('--processes', type=int, default=None, help="0 = tous les cœurs")
+    args = parser.parse_args(argv)
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    wf_cfg = config.get('walk_forward', {})
+    sweep_cfg = config.get('param_sweep', {})
+    param_sweep.install_backend(config)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    space = sweep_cfg.get('space', {})
+    if sweep_cfg.get('mode', 'grid') == 'random':
+        param_sets = param_sweep.random_space(space, sweep_cfg.get('n_runs', 50), sweep_cfg.get('seed'))
+    else:
+        param_sets = param_sweep.grid_space(space)
+
+    walk_forward = WalkForward(
+        config, args.symbol, args.start_date, args.end_date, args.capital,
+        in_sample_days=wf_cfg.get('in_sample_days', 90),
+        out_of_sample_days=wf_cfg.get('out_of_sample_days', 30),
+        anchored=wf_cfg.get('anchored', False),
+        objective=wf_cfg.get('objective', 'net_pnl'),
+        min_trades=wf_cfg.get('min_trades', 5),
+        processes=args.processes if args.processes is not None else sweep_cfg.get('processes', 0),
+        log_level=sweep_cfg.get('worker_log_level', 'ERROR'),
+    )
+    report = walk_forward.run(param_sets)
+    if report:
+        for row in report['folds']:
+            print(row)
+        print(report['summary'])
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Fichier: src/bar_scheduler.py
+"""
+Planificateur piloté par la clôture des bougies.
+
+Au lieu d'analyser tous les symboles toutes les 'check_interval' secondes, le bot
+se réveille quelques centaines de millisecondes après chaque frontière de bougie
+des timeframes qui déclenchent ses modèles (ex: M15 pour M1/M2, M5 pour M3), puis
+n'exécute que les couples (symbole, modèle) dont une nouvelle bougie est apparue.
+
+Les frontières sont calculées sur l'horloge UTC décalée de l'offset du serveur
+(les bougies MT5 sont horodatées en heure serveur).
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BarScheduler:
+    """
+    Calcule les prochains réveils (frontière de bougie + délai) pour un ensemble de timeframes.
+    """
+
+    def __init__(self, timeframe_seconds: Dict[str, int], wake_delay: float = 0.3, server_offset: float = 0.0,
+                 now_fn: Callable[[], float] = time.time, sleep_fn: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            timeframe_seconds (dict): {timeframe_str: durée d'une bougie en secondes}.
+            wake_delay (float): Délai (secondes) après la frontière avant le réveil.
+            server_offset (float): Décalage (secondes) de l'heure serveur par rapport à UTC.
+        """
+        if not timeframe_seconds:
+            raise ValueError("BarScheduler: aucune timeframe à surveiller.")
+        self.timeframe_seconds = dict(timeframe_seconds)
+        self.wake_delay = wake_delay
+        self.server_offset = server_offset
+        self.now_fn = now_fn
+        self.sleep_fn = sleep_fn
+
+    def next_wake(self, now: Optional[float] = None) -> Tuple[float, Set[str]]:
+        """
+        Prochaine frontière de bougie (strictement après 'now - wake_delay').
+
+        Returns:
+            tuple: (heure de réveil UTC, ensemble des timeframes dont une bougie se clôture à cette frontière)
+        """
+        now = self.now_fn() if now is None else now
+        reference = now - self.wake_delay + self.server_offset # Horloge serveur
+        boundaries = {tf: (int(reference // seconds) + 1) * seconds for tf, seconds in self.timeframe_seconds.items()}
+        boundary = min(boundaries.values())
+        due = {tf for tf, value in boundaries.items() if value == boundary}
+        return boundary - self.server_offset + self.wake_delay, due
+
+    def wait_next(self, should_continue: Callable[[], bool] = lambda: True, max_step: float = 1.0,
+                  on_idle: Optional[Callable[[], None]] = None) -> Optional[Set[str]]:
+        """
+        Attend le prochain réveil (sommeil interruptible par pas de 'max_step' secondes).
+        'on_idle' est appelé après chaque pas de sommeil (ex: interrogation des ticks).
+
+        Returns:
+            set: Les timeframes dont une bougie vient de se clôturer, ou None si interrompu.
+        """
+        wake_at, due = self.next_wake()
+        while True:
+            if not should_continue():
+                return None
+            remaining = wake_at - self.now_fn()
+            if remaining <= 0:
+                return due
+            self.sleep_fn(min(remaining, max_step))
+            if on_idle is not None and should_continue():
+                on_idle()
+
+
+class BarChangeTracker:
+    """
+    Mémorise la dernière bougie vue par (symbole, job) pour ne relancer
+    que les analyses dont les entrées ont changé.
+    """
+
+    def __init__(self):
+        self._last_seen: Dict[Tuple[str, str], int] = {}
+
+    def changed(self, symbol: str, job: str, bar_time: Optional[int]) -> bool:
+        """True (et mémorise) si 'bar_time' diffère de la dernière bougie vue pour ce job."""
+        if bar_time is None:
+            return False
+        key = (symbol, job)
+        if self._last_seen.get(key) == bar_time:
+            return False
+        self._last_seen[key] = bar_time
+        return True
+
+    def forget(self, symbol: Optional[str] = None):
+        """Oublie les bougies vues (toutes, ou pour un symbole)."""
+        if symbol is None:
+            self._last_seen.clear()
+        else:
+            for key in [key for key in self._last_seen if key[0] == symbol]:
+                del self._last_seen[key]
+
+
+def due_jobs(symbols: Iterable[str], job_triggers: Dict[str, List[str]], due_timeframes: Set[str]) -> Dict[str, List[str]]:
+    """
+    Couples (symbole, job) à examiner pour un réveil donné.
+
+    Args:
+        job_triggers (dict): {job: [timeframes déclencheurs]}.
+
+    Returns:
+        dict: {symbole: [jobs dont une timeframe déclencheuse vient de se clôturer]}.
+    """
+    jobs = [job for job, timeframes in job_triggers.items() if due_timeframes.intersection(timeframes)]
+    return {symbol: list(jobs) for symbol in symbols} if jobs else {}
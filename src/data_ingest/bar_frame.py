@@ -0,0 +1,141 @@
+# Fichier: src/data_ingest/bar_frame.py
+"""
+BarFrame : bougies OHLC en colonnes NumPy, pour le chemin critique de la stratégie.
+
+Alternative légère au DataFrame pandas renvoyé par mt5_connector.get_data :
+- construite sans copie depuis le tableau structuré 'rates' de MT5 (vues sur les champs),
+  depuis des colonnes (BarStore, mémoire partagée) ou depuis un DataFrame ;
+- frame['high'] renvoie directement le np.ndarray, frame.high aussi ;
+- frame[a:b] et frame.tail(n) renvoient des vues (aucune copie) ;
+- frame.index est un DatetimeIndex construit à la demande (vue sur 'time', unité seconde),
+  pour les résultats horodatés (swings, zones) ;
+- to_pandas() ne sert qu'au reporting, to_rates() à la publication (BarStore, mémoire partagée).
+
+Les fonctions de market_structure, pattern_detector et smc_entry_logic acceptent
+indifféremment un DataFrame ou une BarFrame (mêmes noms de colonnes, len, empty,
+index, tail).
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+from src.data_ingest.bar_store import BAR_COLUMNS, BAR_DTYPE
+
+COLUMN_NAMES = tuple(column for column, _ in BAR_COLUMNS)
+_COLUMN_DTYPES = dict(BAR_COLUMNS)
+
+
+class BarFrame:
+    """
+    Bougies en colonnes NumPy (time en secondes epoch int64, prix en float64).
+    """
+
+    __slots__ = COLUMN_NAMES + ('_index',)
+
+    def __init__(self, time: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 tick_volume: Optional[np.ndarray] = None, spread: Optional[np.ndarray] = None,
+                 real_volume: Optional[np.ndarray] = None):
+        n = len(time)
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.tick_volume = tick_volume if tick_volume is not None else np.zeros(n, dtype=_COLUMN_DTYPES['tick_volume'])
+        self.spread = spread if spread is not None else np.zeros(n, dtype=_COLUMN_DTYPES['spread'])
+        self.real_volume = real_volume if real_volume is not None else np.zeros(n, dtype=_COLUMN_DTYPES['real_volume'])
+        self._index = None
+
+    # --- Construction ---
+
+    @classmethod
+    def from_rates(cls, rates: np.ndarray, contiguous: bool = False) -> "BarFrame":
+        """
+        Depuis le tableau structuré de MT5 (copy_rates_*) ou de BarStore.
+
+        Args:
+            contiguous (bool): False = vues sur les champs (aucune copie, colonnes à pas non unitaire).
+                               True = une copie contiguë par colonne (parcours répétés, ex: backtest).
+        """
+        names = rates.dtype.names
+        columns = {}
+        for column in COLUMN_NAMES:
+            if column in names:
+                values = rates[column]
+                columns[column] = np.ascontiguousarray(values) if contiguous else values
+        return cls(**columns)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "BarFrame":
+        """Depuis un dict {colonne: np.ndarray} (BarStore.read_range, SharedBarBuffer.read)."""
+        return cls(**{column: values for column, values in columns.items() if column in COLUMN_NAMES})
+
+    @classmethod
+    def from_pandas(cls, data: pd.DataFrame) -> "BarFrame":
+        """Depuis un DataFrame au format de mt5_connector.get_data (index temporel naïf = UTC)."""
+        index = data.index
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        columns = {column: data[column].to_numpy() for column in COLUMN_NAMES[1:] if column in data.columns}
+        return cls(time=index.as_unit('s').asi8, **columns)
+
+    # --- Accès (sous-ensemble de l'API DataFrame utilisé par la stratégie) ---
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.time) == 0
+
+    @property
+    def columns(self):
+        return COLUMN_NAMES[1:]
+
+    def __getitem__(self, key):
+        """frame['high'] -> np.ndarray ; frame[a:b] -> BarFrame (vues)."""
+        if isinstance(key, str):
+            if key not in COLUMN_NAMES:
+                raise KeyError(key)
+            return getattr(self, key)
+        if isinstance(key, slice):
+            frame = BarFrame(**{column: getattr(self, column)[key] for column in COLUMN_NAMES})
+            if self._index is not None:
+                frame._index = self._index[key]
+            return frame
+        raise TypeError(f"BarFrame: clé non supportée ({type(key).__name__}).")
+
+    def tail(self, n: int = 5) -> "BarFrame":
+        return self[max(0, len(self) - n):]
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        """DatetimeIndex (naïf, UTC, unité seconde) sur la colonne 'time', créé au premier accès."""
+        if self._index is None:
+            self._index = pd.DatetimeIndex(np.asarray(self.time, dtype=np.int64).view('datetime64[s]'), name='time')
+        return self._index
+
+    # --- Conversions ---
+
+    def to_pandas(self) -> pd.DataFrame:
+        """DataFrame au format de mt5_connector.get_data (copie ; pour le reporting)."""
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(self.time), unit='s'), name='time')
+        return pd.DataFrame({column: np.array(getattr(self, column)) for column in COLUMN_NAMES[1:]}, index=index)
+
+    def to_rates(self) -> np.ndarray:
+        """Tableau structuré au format MT5 / BarStore (copie)."""
+        rates = np.empty(len(self), dtype=BAR_DTYPE)
+        for column in COLUMN_NAMES:
+            rates[column] = getattr(self, column)
+        return rates
+
+    def __repr__(self) -> str:
+        if self.empty:
+            return "BarFrame(0 bougies)"
+        first, last = self.index[0], self.index[-1]
+        return f"BarFrame({len(self)} bougies, {first} -> {last})"
@@ -0,0 +1,212 @@
+# Fichier: src/data_ingest/bar_store.py
+"""
+Stockage local de l'historique OHLC (format colonnaire, memory-mapped).
+
+Chaque couple (symbole, timeframe) possède un répertoire contenant un fichier
+binaire brut par colonne (time, open, high, low, close, ...). Les écritures se font
+uniquement en fin de fichier (append-only) et la colonne 'time', triée, sert d'index :
+une lecture de plage est une recherche binaire suivie d'une vue memory-mapped,
+sans copie ni appel au terminal MT5.
+
+Utilisable par mt5_connector (synchronisation), le Backtester et les scripts de recherche :
+
+    store = BarStore("data/bars")
+    df = store.read_dataframe("EURUSD", "M15", "2023-01-01", "2024-01-01")
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import os
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Colonnes stockées (mêmes noms/types que le tableau structuré renvoyé par MT5)
+BAR_COLUMNS = (
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+    ('real_volume', '<u8'),
+)
+BAR_DTYPE = np.dtype(list(BAR_COLUMNS))
+
+TimeLike = Union[int, float, str, datetime, pd.Timestamp, None]
+
+
+def to_epoch_seconds(value: TimeLike) -> Optional[int]:
+    """Convertit une date (str, datetime, Timestamp ou secondes) en secondes UTC. Naïf = UTC."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.timestamp())
+
+
+class BarStore:
+    """
+    Magasin de bougies sur disque, une colonne par fichier et par (symbole, timeframe).
+    """
+
+    def __init__(self, root_dir: str = "data/bars"):
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+
+    # --- Chemins / métadonnées ---
+
+    def _series_dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root_dir, symbol, timeframe.upper())
+
+    def _column_path(self, symbol: str, timeframe: str, column: str) -> str:
+        return os.path.join(self._series_dir(symbol, timeframe), f"{column}.bin")
+
+    def count(self, symbol: str, timeframe: str) -> int:
+        """
+        Nombre de bougies complètes stockées.
+        (Minimum sur toutes les colonnes : une écriture interrompue est ignorée.)
+        """
+        counts = []
+        for column, dtype in BAR_COLUMNS:
+            path = self._column_path(symbol, timeframe, column)
+            if not os.path.exists(path):
+                return 0
+            counts.append(os.path.getsize(path) // np.dtype(dtype).itemsize)
+        return min(counts)
+
+    def _column(self, symbol: str, timeframe: str, column: str, n: int) -> np.ndarray:
+        """Vue memory-mapped (lecture seule) des 'n' premières valeurs d'une colonne."""
+        dtype = dict(BAR_COLUMNS)[column]
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(symbol, timeframe, column), dtype=dtype, mode='r', shape=(n,))
+
+    def first_time(self, symbol: str, timeframe: str) -> Optional[int]:
+        """Timestamp (secondes UTC) de la première bougie stockée, ou None."""
+        n = self.count(symbol, timeframe)
+        return int(self._column(symbol, timeframe, 'time', n)[0]) if n else None
+
+    def last_time(self, symbol: str, timeframe: str) -> Optional[int]:
+        """Timestamp (secondes UTC) de la dernière bougie stockée, ou None."""
+        n = self.count(symbol, timeframe)
+        return int(self._column(symbol, timeframe, 'time', n)[-1]) if n else None
+
+    # --- Écriture ---
+
+    def append(self, symbol: str, timeframe: str, rates: np.ndarray) -> int:
+        """
+        Ajoute des bougies (tableau structuré MT5) en fin de série.
+
+        Seules les bougies strictement postérieures à la dernière bougie stockée
+        sont écrites. L'appelant ne doit fournir que des bougies clôturées.
+
+        Returns:
+            int: Le nombre de bougies effectivement ajoutées.
+        """
+        if rates is None or len(rates) == 0:
+            return 0
+
+        with self._lock:
+            series_dir = self._series_dir(symbol, timeframe)
+            os.makedirs(series_dir, exist_ok=True)
+
+            n = self.count(symbol, timeframe)
+            self._truncate(symbol, timeframe, n) # Élimine une éventuelle écriture partielle
+
+            times = np.asarray(rates['time'], dtype='<i8')
+            order = np.argsort(times, kind='stable')
+            if n:
+                last = int(self._column(symbol, timeframe, 'time', n)[-1])
+                order = order[times[order] > last]
+            if len(order) == 0:
+                return 0
+            # Dédoublonnage des timestamps (on garde la dernière occurrence)
+            sorted_times = times[order]
+            keep = np.append(sorted_times[1:] != sorted_times[:-1], True)
+            order = order[keep]
+
+            # 'time' est écrit en dernier : il définit le nombre de lignes complètes
+            for column, dtype in BAR_COLUMNS[1:] + BAR_COLUMNS[:1]:
+                if column in rates.dtype.names:
+                    values = np.asarray(rates[column])[order].astype(dtype)
+                else:
+                    values = np.zeros(len(order), dtype=dtype)
+                with open(self._column_path(symbol, timeframe, column), 'ab') as f:
+                    values.tofile(f)
+
+        logger.debug(f"BarStore: {len(order)} bougies ajoutées pour {symbol} {timeframe}.")
+        return len(order)
+
+    def write(self, symbol: str, timeframe: str, rates: np.ndarray) -> int:
+        """Remplace entièrement la série stockée (ex: extension de l'historique vers le passé)."""
+        with self._lock:
+            self._truncate(symbol, timeframe, 0)
+        return self.append(symbol, timeframe, rates)
+
+    def _truncate(self, symbol: str, timeframe: str, n: int):
+        for column, dtype in BAR_COLUMNS:
+            path = self._column_path(symbol, timeframe, column)
+            if os.path.exists(path):
+                size = n * np.dtype(dtype).itemsize
+                if os.path.getsize(path) != size:
+                    with open(path, 'r+b') as f:
+                        f.truncate(size)
+
+    # --- Lecture ---
+
+    def read_range(self, symbol: str, timeframe: str, start: TimeLike = None, end: TimeLike = None) -> Dict[str, np.ndarray]:
+        """
+        Lit les bougies dont 'time' est dans [start, end] (bornes incluses).
+
+        Returns:
+            dict: {colonne: np.ndarray} — vues memory-mapped en lecture seule (aucune copie).
+                  Colonnes vides si rien n'est stocké.
+        """
+        n = self.count(symbol, timeframe)
+        times = self._column(symbol, timeframe, 'time', n)
+
+        start_s = to_epoch_seconds(start)
+        end_s = to_epoch_seconds(end)
+        lo = 0 if start_s is None else int(np.searchsorted(times, start_s, side='left'))
+        hi = n if end_s is None else int(np.searchsorted(times, end_s, side='right'))
+        hi = max(lo, hi)
+
+        return {column: self._column(symbol, timeframe, column, n)[lo:hi] for column, _ in BAR_COLUMNS}
+
+    def read_rates(self, symbol: str, timeframe: str, start: TimeLike = None, end: TimeLike = None) -> np.ndarray:
+        """Comme read_range, mais renvoie un tableau structuré au format MT5 (copie)."""
+        columns = self.read_range(symbol, timeframe, start, end)
+        rates = np.empty(len(columns['time']), dtype=BAR_DTYPE)
+        for column, _ in BAR_COLUMNS:
+            rates[column] = columns[column]
+        return rates
+
+    def read_frame(self, symbol: str, timeframe: str, start: TimeLike = None, end: TimeLike = None):
+        """Comme read_range, sous forme de BarFrame (vues memory-mapped, aucune copie)."""
+        from src.data_ingest.bar_frame import BarFrame # Import local : bar_frame dépend de ce module
+        return BarFrame.from_columns(self.read_range(symbol, timeframe, start, end))
+
+    def read_dataframe(self, symbol: str, timeframe: str, start: TimeLike = None, end: TimeLike = None, utc: bool = True) -> pd.DataFrame:
+        """
+        Lit une plage sous forme de DataFrame indexé par 'time'
+        (même format que mt5_connector.get_data ; index UTC si utc=True).
+        """
+        columns = self.read_range(symbol, timeframe, start, end)
+        index = pd.to_datetime(np.asarray(columns['time']), unit='s', utc=utc)
+        data = pd.DataFrame({column: np.asarray(values) for column, values in columns.items() if column != 'time'},
+                            index=pd.DatetimeIndex(index, name='time'))
+        return data
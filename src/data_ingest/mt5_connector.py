@@ -5,17 +5,28 @@ Module pour la connexion et l'extraction de données depuis MetaTrader 5.
 Ce module gère la connexion, la déconnexion, et la récupération
 des données de marché (bougies) ainsi que la vérification des positions ouvertes.
 
-Version: 2.0
+Les bougies sont conservées dans un cache incrémental par (symbole, timeframe) :
+seules les bougies nouvelles (et la bougie en formation) sont redemandées au
+terminal à chaque cycle. Optionnellement, les timeframes supérieures sont
+rééchantillonnées localement depuis une seule timeframe de base (voir resampler).
+
+Version: 2.4
 """
 
-__version__ = "2.0"
+__version__ = "2.4"
 
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 import time
 import logging
-from typing import Dict, Optional, Any 
+import threading
+from typing import Dict, Optional, Any, Tuple
+
+from src.data_ingest.bar_store import BarStore, to_epoch_seconds
+from src.data_ingest.bar_frame import BarFrame
+from src.data_ingest.resampler import IncrementalResampler, WEEK_OFFSET_SECONDS
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -34,6 +45,132 @@ TIMEFRAME_MAP = {
     "MN1": mt5.TIMEFRAME_MN1
 }
 
+# Durée (en secondes) des timeframes à durée fixe
+TIMEFRAME_SECONDS = {
+    "M1": 60,
+    "M5": 300,
+    "M15": 900,
+    "M30": 1800,
+    "H1": 3600,
+    "H4": 14400,
+    "D1": 86400,
+    "W1": 604800
+}
+
+# --- Cache de bougies incrémental ---
+# Paramètres modifiables via configure_bar_cache() (section 'mt5.bar_cache' de config.yaml)
+_BAR_CACHE_ENABLED = True
+_BAR_CACHE_REFRESH_BARS = 3 # Nbr de bougies redemandées à chaque cycle (dont celle en formation)
+
+_bar_cache: Dict[Tuple[str, int], "_BarBuffer"] = {}
+_selected_symbols = set() # Symboles déjà vérifiés/activés dans le MarketWatch
+_cache_lock = threading.Lock()
+
+
+# --- Rééchantillonnage local ---
+# Paramètres modifiables via configure_resampling() (section 'mt5.resampling' de config.yaml)
+# Les timeframes multiples de la base sont construites localement depuis la base en cache.
+_RESAMPLE_ENABLED = False
+_RESAMPLE_BASE_TF_STR = "M5"
+_RESAMPLE_OFFSET_SECONDS = 0 # Décalage des frontières de session du courtier
+_RESAMPLE_REUSE_SECONDS = 1.0 # Âge maximal de la base réutilisée sans nouvel appel au terminal
+
+_resamplers: Dict[Tuple[str, int], IncrementalResampler] = {}
+_base_refreshed_at: Dict[str, float] = {}
+
+
+class _BarBuffer:
+    """
+    Tampon borné des dernières bougies MT5 pour un (symbole, timeframe).
+
+    Les bougies sont stockées telles que renvoyées par MT5 (tableau structuré numpy),
+    triées par 'time'. La capacité correspond au plus grand lookback demandé.
+    """
+    __slots__ = ("rates", "capacity")
+
+    def __init__(self, rates: np.ndarray, capacity: int):
+        self.rates = rates[-capacity:]
+        self.capacity = capacity
+
+    def merge(self, fresh: np.ndarray) -> bool:
+        """
+        Fusionne les bougies fraîchement récupérées (queue de l'historique).
+
+        Les bougies du cache dont le 'time' est >= à la première bougie fraîche
+        sont remplacées (la bougie en formation est donc toujours mise à jour).
+
+        Returns:
+            bool: False si les bougies fraîches ne recouvrent pas le cache
+                  (trou dans l'historique), auquel cas un rechargement complet est nécessaire.
+        """
+        if len(self.rates) == 0:
+            return False
+        cached_times = self.rates['time']
+        first_fresh = fresh['time'][0]
+        if first_fresh > cached_times[-1] or fresh['time'][-1] < cached_times[-1]:
+            return False
+
+        keep = np.searchsorted(cached_times, first_fresh, side='left')
+        merged = np.concatenate((self.rates[:keep], fresh))
+        self.rates = merged[-self.capacity:]
+        return True
+
+
+def configure_bar_cache(enabled: bool = True, refresh_bars: int = 3):
+    """
+    Configure le cache de bougies incrémental.
+
+    Args:
+        enabled (bool): Active/désactive le cache (désactivé = rechargement complet à chaque appel).
+        refresh_bars (int): Nombre de bougies redemandées à chaque appel pour
+                            rafraîchir la queue du cache (minimum 2).
+    """
+    global _BAR_CACHE_ENABLED, _BAR_CACHE_REFRESH_BARS
+    _BAR_CACHE_ENABLED = bool(enabled)
+    _BAR_CACHE_REFRESH_BARS = max(2, int(refresh_bars))
+    clear_bar_cache()
+    logger.info(f"Cache de bougies {'activé' if _BAR_CACHE_ENABLED else 'désactivé'} (rafraîchissement: {_BAR_CACHE_REFRESH_BARS} bougies).")
+
+def clear_bar_cache(symbol: Optional[str] = None):
+    """Vide le cache de bougies (entièrement, ou pour un seul symbole)."""
+    with _cache_lock:
+        if symbol is None:
+            _bar_cache.clear()
+            _selected_symbols.clear()
+            _resamplers.clear()
+            _base_refreshed_at.clear()
+        else:
+            for key in [k for k in _bar_cache if k[0] == symbol]:
+                del _bar_cache[key]
+            for key in [k for k in _resamplers if k[0] == symbol]:
+                del _resamplers[key]
+            _base_refreshed_at.pop(symbol, None)
+            _selected_symbols.discard(symbol)
+
+def configure_resampling(enabled: bool = False, base_timeframe: str = "M5", session_offset_minutes: int = 0, reuse_ms: int = 1000):
+    """
+    Configure le rééchantillonnage local des timeframes supérieures.
+
+    Args:
+        enabled (bool): Active la construction locale des timeframes multiples de la base.
+        base_timeframe (str): Timeframe de base téléchargée ("M1" ou "M5").
+        session_offset_minutes (int): Décalage des frontières de bougies du courtier (H4/D1).
+        reuse_ms (int): Une base rafraîchie depuis moins de 'reuse_ms' est réutilisée sans appel au terminal
+                        (toutes les timeframes d'un même cycle partagent ainsi un seul rafraîchissement).
+    """
+    global _RESAMPLE_ENABLED, _RESAMPLE_BASE_TF_STR, _RESAMPLE_OFFSET_SECONDS, _RESAMPLE_REUSE_SECONDS
+    base_timeframe = base_timeframe.upper()
+    if base_timeframe not in TIMEFRAME_SECONDS:
+        logger.error(f"Timeframe de base '{base_timeframe}' invalide pour le rééchantillonnage. Désactivé.")
+        enabled = False
+    _RESAMPLE_ENABLED = bool(enabled)
+    _RESAMPLE_BASE_TF_STR = base_timeframe
+    _RESAMPLE_OFFSET_SECONDS = int(session_offset_minutes) * 60
+    _RESAMPLE_REUSE_SECONDS = max(0, reuse_ms) / 1000.0
+    clear_bar_cache()
+    if _RESAMPLE_ENABLED:
+        logger.info(f"Rééchantillonnage local activé (base {_RESAMPLE_BASE_TF_STR}).")
+
 
 def connect(login, password, server):
     """
@@ -64,9 +201,101 @@ def connect(login, password, server):
 def disconnect():
     """Ferme la connexion à MetaTrader 5."""
     logger.info("Fermeture de la connexion MetaTrader 5.")
+    clear_bar_cache()
     mt5.shutdown()
 
-def get_data(symbol, timeframe, num_candles):
+def _ensure_symbol_selected(symbol) -> bool:
+    """S'assure que le symbole est disponible dans le MarketWatch (vérifié une seule fois)."""
+    if symbol in _selected_symbols:
+        return True
+
+    symbol_info = mt5.symbol_info(symbol)
+    if symbol_info is None:
+        logger.warning(f"Symbole {symbol} non trouvé. Tentative de l'ajouter...")
+        if not mt5.symbol_select(symbol, True):
+            logger.error(f"Échec de l'activation du symbole {symbol}. Erreur: {mt5.last_error()}")
+            return False
+        time.sleep(0.5) # Laisser MT5 charger le symbole
+        logger.info(f"Symbole {symbol} activé.")
+
+    _selected_symbols.add(symbol)
+    return True
+
+def _fetch_rates(symbol, timeframe, num_candles):
+    """
+    Récupère les bougies brutes (tableau structuré MT5), via le cache si activé.
+
+    Lors d'un appel ultérieur, seules les '_BAR_CACHE_REFRESH_BARS' dernières bougies
+    sont redemandées au terminal ; elles remplacent la queue du cache (dont la bougie
+    en formation). Un rechargement complet a lieu si le lookback demandé augmente
+    ou si un trou est détecté entre le cache et les bougies fraîches.
+    """
+    if not _BAR_CACHE_ENABLED:
+        return mt5.copy_rates_from_pos(symbol, timeframe, 0, num_candles)
+
+    key = (symbol, timeframe)
+    with _cache_lock:
+        buffer = _bar_cache.get(key)
+
+    if buffer is not None and num_candles <= buffer.capacity:
+        fresh = mt5.copy_rates_from_pos(symbol, timeframe, 0, min(_BAR_CACHE_REFRESH_BARS, num_candles))
+        if fresh is not None and len(fresh) > 0:
+            with _cache_lock:
+                merged = buffer.merge(fresh)
+            if merged:
+                return buffer.rates[-num_candles:]
+        logger.debug(f"Cache {symbol}/{timeframe}: pas de recouvrement, rechargement complet.")
+
+    capacity = max(num_candles, buffer.capacity if buffer is not None else 0)
+    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, capacity)
+    if rates is None or len(rates) == 0:
+        return rates
+
+    with _cache_lock:
+        _bar_cache[key] = _BarBuffer(rates, capacity)
+    return rates[-num_candles:]
+
+def _fetch_resampled(symbol, timeframe, num_candles):
+    """
+    Construit les bougies d'une timeframe supérieure depuis la base en cache.
+
+    Returns:
+        np.ndarray: Les bougies, ou None si la timeframe ne se déduit pas de la base
+                    (l'appelant interroge alors directement le terminal).
+    """
+    if not _RESAMPLE_ENABLED:
+        return None
+    base_seconds = TIMEFRAME_SECONDS[_RESAMPLE_BASE_TF_STR]
+    tf_str = next((name for name, value in TIMEFRAME_MAP.items() if value == timeframe), None)
+    target_seconds = TIMEFRAME_SECONDS.get(tf_str)
+    if target_seconds is None or target_seconds <= base_seconds or target_seconds % base_seconds:
+        return None
+
+    # Base : un rafraîchissement récent est partagé par toutes les timeframes du symbole
+    n_base = (num_candles + 1) * (target_seconds // base_seconds)
+    base_tf = TIMEFRAME_MAP[_RESAMPLE_BASE_TF_STR]
+    with _cache_lock:
+        buffer = _bar_cache.get((symbol, base_tf))
+        refreshed_at = _base_refreshed_at.get(symbol)
+    if (buffer is not None and refreshed_at is not None and n_base <= buffer.capacity
+            and time.monotonic() - refreshed_at < _RESAMPLE_REUSE_SECONDS):
+        base = buffer.rates[-n_base:]
+    else:
+        base = _fetch_rates(symbol, base_tf, n_base)
+        if base is None or len(base) == 0:
+            return base
+        with _cache_lock:
+            _base_refreshed_at[symbol] = time.monotonic()
+
+    key = (symbol, timeframe)
+    offset = WEEK_OFFSET_SECONDS + _RESAMPLE_OFFSET_SECONDS if tf_str == "W1" else _RESAMPLE_OFFSET_SECONDS
+    with _cache_lock:
+        resampler = _resamplers.get(key)
+        if resampler is None or resampler.capacity < num_candles:
+            resampler = _resamplers[key] = IncrementalResampler(target_seconds, offset, capacity=num_candles)
+    return resampler.update(base)[-num_candles:]
+
+def get_data(symbol, timeframe, num_candles, as_frame: bool = False):
     """
     Récupère les données de marché (bougies) pour un symbole et une timeframe donnés.
 
@@ -74,29 +303,32 @@ def get_data(symbol, timeframe, num_candles):
         symbol (str): Le symbole à trader (ex: "EURUSD").
         timeframe (int): La constante de timeframe MT5 (ex: mt5.TIMEFRAME_M15).
         num_candles (int): Le nombre de bougies à récupérer.
+        as_frame (bool): Renvoie une BarFrame (vues NumPy sur les bougies, sans copie ni pandas).
 
     Returns:
         pd.DataFrame: Un DataFrame pandas avec les données (time, open, high, low, close, tick_volume),
-                      ou None si la récupération échoue.
+                      (ou BarFrame si 'as_frame'), ou None si la récupération échoue.
     """
     logger.debug(f"Récupération de {num_candles} bougies pour {symbol} en {timeframe}...")
     try:
         # S'assurer que le symbole est disponible (ajout de robustesse)
-        symbol_info = mt5.symbol_info(symbol)
-        if symbol_info is None:
-            logger.warning(f"Symbole {symbol} non trouvé. Tentative de l'ajouter...")
-            if not mt5.symbol_select(symbol, True):
-                logger.error(f"Échec de l'activation du symbole {symbol}. Erreur: {mt5.last_error()}")
-                return None
-            time.sleep(0.5) # Laisser MT5 charger le symbole
-            logger.info(f"Symbole {symbol} activé.")
-
-        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, num_candles)
+        if not _ensure_symbol_selected(symbol):
+            return None
+
+        rates = _fetch_resampled(symbol, timeframe, num_candles)
+        if rates is None:
+            rates = _fetch_rates(symbol, timeframe, num_candles)
         
         if rates is None:
             logger.warning(f"Aucune donnée récupérée pour {symbol} en {timeframe}. Code d'erreur = {mt5.last_error()}")
             return None
             
+        if as_frame:
+            # Les tampons du cache ne sont jamais modifiés en place : les vues restent valides
+            if len(rates) == 0:
+                logger.warning(f"Données vides (0 bougies) pour {symbol} en {timeframe}.")
+            return BarFrame.from_rates(rates)
+
         if len(rates) == 0:
             logger.warning(f"Données vides (0 bougies) pour {symbol} en {timeframe}.")
             # Retourner un DataFrame vide est mieux que None
@@ -114,7 +346,23 @@ def get_data(symbol, timeframe, num_candles):
         logger.error(f"Exception lors de la récupération des données pour {symbol}: {e}")
         return None
 
-def get_mtf_data(symbol: str, timeframes_config: dict):
+def get_last_bar_time(symbol: str, timeframe: int) -> Optional[int]:
+    """
+    Heure d'ouverture (secondes, heure serveur) de la bougie la plus récente (en formation),
+    sans toucher au cache de bougies. Sert à détecter l'apparition d'une nouvelle bougie.
+    """
+    try:
+        if not _ensure_symbol_selected(symbol):
+            return None
+        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, 1)
+        if rates is None or len(rates) == 0:
+            return None
+        return int(rates['time'][-1])
+    except Exception as e:
+        logger.error(f"Exception lors de la lecture de la dernière bougie de {symbol}: {e}")
+        return None
+
+def get_mtf_data(symbol: str, timeframes_config: dict, as_frame: bool = False):
     """
     Récupère les données de marché pour plusieurs timeframes en un seul appel.
 
@@ -123,6 +371,7 @@ def get_mtf_data(symbol: str, timeframes_config: dict):
         timeframes_config (dict): Un dictionnaire mappant la timeframe (str) 
                                   au nombre de bougies ou à un dict de params.
                                   Ex: {'H4': 100} ou {'H4': {'count': 100}}
+        as_frame (bool): BarFrame au lieu de DataFrame (voir get_data).
 
     Returns:
         dict: Un dictionnaire où les clés sont les timeframes (str) et 
@@ -147,7 +396,7 @@ def get_mtf_data(symbol: str, timeframes_config: dict):
             continue
         
         timeframe_mt5 = TIMEFRAME_MAP[tf_str]
-        data = get_data(symbol, timeframe_mt5, num_candles)
+        data = get_data(symbol, timeframe_mt5, num_candles, as_frame=as_frame)
         
         if data is not None:
             mtf_data[tf_str] = data
@@ -159,6 +408,67 @@ def get_mtf_data(symbol: str, timeframes_config: dict):
 
     return mtf_data
 
+def sync_history(store: BarStore, symbol: str, timeframe_str: str, start, end=None) -> int:
+    """
+    Complète le stockage local (BarStore) avec l'historique MT5 manquant sur [start, end].
+
+    Seules les bougies absentes du stockage sont téléchargées : la queue après la dernière
+    bougie stockée, et (si 'start' est antérieur au début du stockage) la tête manquante.
+    La bougie en formation n'est jamais stockée.
+
+    Returns:
+        int: Le nombre de bougies ajoutées au stockage (-1 en cas d'erreur).
+    """
+    timeframe = get_mt5_timeframe(timeframe_str)
+    tf_seconds = TIMEFRAME_SECONDS.get(timeframe_str.upper())
+    if timeframe is None or tf_seconds is None:
+        logger.error(f"Timeframe '{timeframe_str}' non supportée par le stockage local.")
+        return -1
+
+    start_s = to_epoch_seconds(start)
+    end_s = to_epoch_seconds(end) if end is not None else int(time.time())
+    first_s = store.first_time(symbol, timeframe_str)
+    last_s = store.last_time(symbol, timeframe_str)
+
+    def _download(from_s, to_s):
+        rates = mt5.copy_rates_range(symbol, timeframe, datetime.fromtimestamp(from_s, tz=timezone.utc), datetime.fromtimestamp(to_s, tz=timezone.utc))
+        if rates is None:
+            logger.error(f"Échec copy_rates_range {symbol} {timeframe_str}. Code d'erreur = {mt5.last_error()}")
+        return rates
+
+    try:
+        added = 0
+        if first_s is not None and start_s < first_s:
+            # Tête manquante : le stockage étant append-only, la série est réécrite.
+            head = _download(start_s, first_s - 1)
+            if head is None:
+                return -1
+            if len(head) > 0:
+                existing = store.read_rates(symbol, timeframe_str)
+                store.write(symbol, timeframe_str, np.concatenate((head.astype(existing.dtype), existing)))
+                added += len(head)
+
+        # Queue manquante (aucune requête si la prochaine bougie commencerait après 'end')
+        from_s = start_s if last_s is None else last_s + 1
+        if last_s is None or last_s + tf_seconds <= end_s:
+            tail = _download(from_s, end_s)
+            if tail is None:
+                return -1
+            if len(tail) > 0:
+                # Exclure la bougie en formation (clôture postérieure au dernier tick serveur)
+                tick = mt5.symbol_info_tick(symbol)
+                server_now = tick.time if tick is not None else end_s
+                tail = tail[tail['time'] + tf_seconds <= server_now]
+                added += store.append(symbol, timeframe_str, tail)
+
+        if added:
+            logger.info(f"Historique local {symbol} {timeframe_str}: {added} bougies ajoutées.")
+        return added
+
+    except Exception as e:
+        logger.error(f"Exception lors de la synchronisation de l'historique {symbol} {timeframe_str}: {e}")
+        return -1
+
 def check_open_positions(symbol):
     """
     Vérifie s'il y a des positions ouvertes pour un symbole spécifique.
@@ -0,0 +1,616 @@
+# Fichier: src/data_ingest/mt5_simulator.py
+"""
+Simulateur in-process du module MetaTrader5.
+
+Remplace le package 'MetaTrader5' (disponible uniquement sous Windows) par une
+implémentation Python pure exposant la même API (constantes, copy_rates_*,
+copy_ticks_*, symbol_info_tick, order_send, positions_get, ...).
+Permet de faire tourner la boucle Kasperbot complète hors-ligne (Linux, CI,
+tests de charge avec des centaines de symboles).
+
+Sources de prix :
+- 'synthetic' : marche aléatoire déterministe par symbole (graine dérivée du nom).
+- 'bar_store' : bougies enregistrées dans le BarStore local (rejouées à partir de 'start_time').
+  Les symboles absents du stockage retombent sur le mode synthétique.
+
+Le simulateur s'installe à la place du vrai module via install(settings), AVANT
+tout import de MetaTrader5 (voir main.py, option 'mt5.backend: simulator').
+
+Version: 1.2
+"""
+
+__version__ = "1.2"
+
+import sys
+import time
+import zlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes (valeurs identiques au package officiel) ---
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+TIMEFRAME_W1 = 32769
+TIMEFRAME_MN1 = 49153
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+TRADE_ACTION_SLTP = 6
+
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_NO_MONEY = 10019
+
+COPY_TICKS_ALL = -1
+COPY_TICKS_INFO = 1
+COPY_TICKS_TRADE = 2
+
+RES_S_OK = 1
+RES_E_FAIL = -1
+RES_E_INVALID_PARAMS = -2
+RES_E_NOT_FOUND = -4
+
+# Durée en secondes des timeframes à durée fixe (MN1 est traité à part)
+_TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400, TIMEFRAME_W1: 604800,
+}
+_BASE_TIMEFRAMES = {"M1": TIMEFRAME_M1, "M5": TIMEFRAME_M5}
+
+# --- Structures renvoyées (mêmes noms de champs que MetaTrader5) ---
+TerminalInfo = namedtuple('TerminalInfo', ['connected', 'trade_allowed', 'name', 'company', 'path'])
+AccountInfo = namedtuple('AccountInfo', ['login', 'name', 'server', 'currency', 'leverage',
+                                         'balance', 'equity', 'profit', 'margin', 'margin_free'])
+SymbolInfo = namedtuple('SymbolInfo', ['name', 'visible', 'point', 'digits', 'spread', 'trade_stops_level',
+                                       'trade_contract_size', 'volume_min', 'volume_max', 'volume_step',
+                                       'currency_base', 'currency_profit', 'currency_margin', 'bid', 'ask'])
+Tick = namedtuple('Tick', ['time', 'bid', 'ask', 'last', 'volume', 'time_msc', 'flags', 'volume_real'])
+TradePosition = namedtuple('TradePosition', ['ticket', 'time', 'type', 'magic', 'identifier', 'volume',
+                                             'price_open', 'sl', 'tp', 'price_current', 'profit',
+                                             'symbol', 'comment'])
+TradeOrder = namedtuple('TradeOrder', ['ticket', 'time_setup', 'type', 'magic', 'volume_initial',
+                                       'price_open', 'price_current', 'sl', 'tp', 'symbol', 'comment'])
+TradeDeal = namedtuple('TradeDeal', ['ticket', 'order', 'time', 'type', 'position_id', 'volume',
+                                     'price', 'profit', 'symbol', 'comment'])
+OrderSendResult = namedtuple('OrderSendResult', ['retcode', 'deal', 'order', 'volume', 'price',
+                                                 'bid', 'ask', 'comment', 'request_id', 'request'])
+
+RATES_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+                        ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')])
+TICKS_DTYPE = np.dtype([('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'), ('volume', '<u8'),
+                        ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')])
+
+# --- Paramètres par défaut (surchargés par la section 'mt5.simulator' de config.yaml) ---
+DEFAULT_SETTINGS = {
+    'feed': 'synthetic',           # 'synthetic' ou 'bar_store'
+    'bar_store_dir': 'data/bars',  # Pour feed = 'bar_store'
+    'base_timeframe': 'M5',        # Timeframe de base (M1 ou M5) ; les autres en sont agrégées
+    'history_days': 45,            # Historique synthétique disponible avant le départ
+    'start_time': None,            # Date de départ de l'horloge simulée (None = maintenant)
+    'speed': 1.0,                  # Vitesse de l'horloge simulée (1.0 = temps réel)
+    'tick_interval_ms': 1000,      # Espacement des ticks synthétiques
+    'latency_ms': 0.0,             # Latence simulée de chaque appel au "terminal"
+    'order_latency_ms': 0.0,       # Latence supplémentaire de order_send
+    'spread_points': 10,           # Spread fixe (en points)
+    'volatility': 0.0005,          # Volatilité relative par bougie M5 (mode synthétique)
+    'initial_prices': {},          # Prix de départ par symbole (mode synthétique)
+    'balance': 10000.0,
+    'currency': 'USD',
+    'leverage': 100,
+}
+
+_settings: Dict[str, Any] = dict(DEFAULT_SETTINGS)
+_lock = threading.RLock()
+_state = {
+    'initialized': False,
+    'last_error': (RES_S_OK, 'Success'),
+    'clock_origin': None,   # (temps simulé de départ, time.monotonic() de départ)
+    'next_ticket': 1000,
+    'balance': DEFAULT_SETTINGS['balance'],
+}
+_markets: Dict[str, "_Market"] = {}
+_positions: Dict[int, dict] = {}
+_history_orders: Dict[int, TradeOrder] = {}
+_history_deals = []
+
+
+# --- Installation / configuration ---
+
+def install(settings: Optional[dict] = None):
+    """
+    Installe ce module à la place du package 'MetaTrader5' (sys.modules)
+    et applique la configuration du simulateur.
+    """
+    configure(settings or {})
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+    logger.info("Backend MetaTrader5 simulé installé.")
+
+def configure(settings: dict):
+    """Applique la configuration et réinitialise l'état (marchés, positions, horloge)."""
+    with _lock:
+        _settings.clear()
+        _settings.update(DEFAULT_SETTINGS)
+        _settings.update({k: v for k, v in settings.items() if v is not None})
+        if _settings['base_timeframe'] not in _BASE_TIMEFRAMES:
+            logger.warning(f"Timeframe de base '{_settings['base_timeframe']}' non supportée. Utilisation de M5.")
+            _settings['base_timeframe'] = 'M5'
+        _markets.clear()
+        _positions.clear()
+        _history_orders.clear()
+        _history_deals.clear()
+        _state['clock_origin'] = None
+        _state['balance'] = float(_settings['balance'])
+
+def _latency(extra_ms: float = 0.0):
+    delay = (_settings['latency_ms'] + extra_ms) / 1000.0
+    if delay > 0:
+        time.sleep(delay)
+
+def _set_error(code: int, message: str):
+    _state['last_error'] = (code, message)
+
+def _now() -> float:
+    """Heure simulée courante (secondes UTC)."""
+    origin = _state['clock_origin']
+    if origin is None:
+        with _lock: # Un seul point de départ même si plusieurs threads démarrent l'horloge
+            origin = _state['clock_origin']
+            if origin is None:
+                start = _settings['start_time']
+                start_s = float(pd.Timestamp(start, tz='UTC').timestamp()) if start else time.time()
+                origin = _state['clock_origin'] = (start_s, time.monotonic())
+    start_s, wall0 = origin
+    return start_s + (time.monotonic() - wall0) * float(_settings['speed'])
+
+def _to_seconds(value) -> float:
+    """Convertit une date (datetime, Timestamp, str ou secondes) en secondes UTC. Naïf = UTC."""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return ts.timestamp()
+
+
+# --- Marché simulé (un par symbole) ---
+
+class _Market:
+    """
+    Série de bougies de base (M1/M5) pour un symbole, synthétique ou enregistrée.
+    Les bougies postérieures à l'heure simulée ne sont jamais visibles ; la bougie
+    de base en cours est révélée progressivement (interpolation open -> close).
+    Thread-safe : la série (prolongée à la demande) n'est lue et étendue que sous self.lock.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.lock = threading.Lock()
+        self.base_seconds = _TIMEFRAME_SECONDS[_BASE_TIMEFRAMES[_settings['base_timeframe']]]
+        self.seed = zlib.crc32(symbol.encode())
+        self.rates = None
+        self.rng = None
+
+        if _settings['feed'] == 'bar_store':
+            self.rates = self._load_recorded()
+        if self.rates is None:
+            self._init_synthetic()
+
+        price = float(self.rates['close'][0])
+        self.digits = 5 if price < 10 else (3 if price < 1000 else 2)
+        self.point = 10.0 ** -self.digits
+        if symbol.startswith(('XAU', 'XAG')):
+            self.contract_size = 100.0
+        else:
+            self.contract_size = 1.0 if price >= 1000 else 100000.0
+
+    def _load_recorded(self):
+        from src.data_ingest.bar_store import BarStore
+        rates = BarStore(_settings['bar_store_dir']).read_rates(self.symbol, _settings['base_timeframe'])
+        if len(rates) == 0:
+            logger.warning(f"Simulateur: aucune bougie enregistrée pour {self.symbol}. Mode synthétique.")
+            return None
+        return rates.astype(RATES_DTYPE)
+
+    def _init_synthetic(self):
+        self.rng = np.random.default_rng(self.seed)
+        initial = _settings['initial_prices'].get(self.symbol, 1.0 + (self.seed % 1000) / 1000.0)
+        history = int(_settings['history_days'] * 86400 // self.base_seconds)
+        t0 = (int(_now()) // self.base_seconds) * self.base_seconds - history * self.base_seconds
+        self.rates = np.empty(0, dtype=RATES_DTYPE)
+        self._extend(t0, float(initial), history + 1)
+
+    def _extend(self, t_start: int, open_price: float, n: int):
+        """Génère 'n' bougies synthétiques supplémentaires (marche aléatoire log-normale)."""
+        vol = _settings['volatility'] * np.sqrt(self.base_seconds / 300.0)
+        returns = self.rng.normal(0.0, vol, n)
+        closes = open_price * np.exp(np.cumsum(returns))
+        opens = np.concatenate(([open_price], closes[:-1]))
+        wick = np.abs(self.rng.normal(0.0, vol * 0.5, (2, n))) * closes
+        bars = np.zeros(n, dtype=RATES_DTYPE)
+        bars['time'] = t_start + np.arange(n, dtype=np.int64) * self.base_seconds
+        bars['open'] = opens
+        bars['close'] = closes
+        bars['high'] = np.maximum(opens, closes) + wick[0]
+        bars['low'] = np.minimum(opens, closes) - wick[1]
+        bars['tick_volume'] = self.rng.integers(50, 500, n)
+        bars['spread'] = _settings['spread_points']
+        self.rates = np.concatenate((self.rates, bars))
+
+    def _index_at(self, now: float) -> int:
+        """
+        Nombre de bougies de base ouvertes à l'heure 'now' (prolonge la série synthétique si besoin).
+        À appeler sous self.lock.
+        """
+        if self.rng is not None and self.rates['time'][-1] <= now:
+            missing = int((now - self.rates['time'][-1]) // self.base_seconds) + 1
+            self._extend(int(self.rates['time'][-1]) + self.base_seconds, float(self.rates['close'][-1]), missing)
+        return int(np.searchsorted(self.rates['time'], now, side='right'))
+
+    def visible(self, now: float, tail: Optional[int] = None) -> np.ndarray:
+        """Bougies de base visibles à l'heure 'now' (la dernière est en formation), limitées à 'tail'."""
+        with self.lock:
+            k = self._index_at(now)
+            bars = self.rates[0 if tail is None else max(0, k - tail):k].copy()
+        if k == 0:
+            return bars
+        last = bars[-1]
+        if now < last['time'] + self.base_seconds:
+            # Bougie en formation : révélée au prorata du temps écoulé
+            fraction = (now - last['time']) / self.base_seconds
+            price = last['open'] + (last['close'] - last['open']) * fraction
+            bars['close'][-1] = price
+            bars['high'][-1] = max(last['open'], price)
+            bars['low'][-1] = min(last['open'], price)
+            bars['tick_volume'][-1] = int(last['tick_volume'] * fraction)
+        return bars
+
+    def prices_at(self, times: np.ndarray) -> np.ndarray:
+        """Prix 'bid' aux instants 'times' (interpolation linéaire open -> close dans la bougie de base)."""
+        with self.lock:
+            self._index_at(float(np.max(times)) if len(times) else 0.0)
+            rates = self.rates
+        idx = np.clip(np.searchsorted(rates['time'], times, side='right') - 1, 0, None)
+        fraction = np.clip((times - rates['time'][idx]) / self.base_seconds, 0.0, 1.0)
+        return rates['open'][idx] + (rates['close'][idx] - rates['open'][idx]) * fraction
+
+    def price_at(self, t: float) -> float:
+        return float(self.prices_at(np.array([t]))[0])
+
+
+def _market(symbol: str) -> _Market:
+    with _lock:
+        market = _markets.get(symbol)
+        if market is None:
+            market = _markets[symbol] = _Market(symbol)
+        return market
+
+def _aggregate(base: np.ndarray, timeframe: int, base_seconds: int) -> Optional[np.ndarray]:
+    """
+    Agrège des bougies de base vers 'timeframe' (alignement UTC ; W1 commence le dimanche).
+    Renvoie None si la timeframe n'est pas un multiple de la base.
+    """
+    if _TIMEFRAME_SECONDS.get(timeframe) == base_seconds or len(base) == 0:
+        return base
+
+    if timeframe == TIMEFRAME_MN1:
+        keys = base['time'].astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    else:
+        tf_seconds = _TIMEFRAME_SECONDS.get(timeframe)
+        if tf_seconds is None or tf_seconds % base_seconds:
+            return None
+        offset = 3 * 86400 if timeframe == TIMEFRAME_W1 else 0
+        keys = (base['time'] - offset) // tf_seconds
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.append(starts[1:], len(base)) - 1
+    out = np.zeros(len(starts), dtype=RATES_DTYPE)
+    if timeframe == TIMEFRAME_MN1:
+        out['time'] = keys[starts].astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    else:
+        out['time'] = keys[starts] * tf_seconds + offset
+    out['open'] = base['open'][starts]
+    out['close'] = base['close'][ends]
+    out['high'] = np.maximum.reduceat(base['high'], starts)
+    out['low'] = np.minimum.reduceat(base['low'], starts)
+    out['tick_volume'] = np.add.reduceat(base['tick_volume'], starts)
+    out['spread'] = base['spread'][ends]
+    return out
+
+def _rates(symbol: str, timeframe: int, count_hint: Optional[int] = None) -> Optional[np.ndarray]:
+    """Bougies visibles pour (symbole, timeframe), limitées à la queue utile si 'count_hint'."""
+    market = _market(symbol)
+    if count_hint is not None and timeframe in _TIMEFRAME_SECONDS:
+        ratio = max(1, _TIMEFRAME_SECONDS[timeframe] // market.base_seconds)
+        rates = _aggregate(market.visible(_now(), tail=(count_hint + 1) * ratio), timeframe, market.base_seconds)
+        # La première bougie agrégée peut être tronquée par le découpage
+        return rates[1:] if rates is not None and len(rates) > count_hint else rates
+    return _aggregate(market.visible(_now()), timeframe, market.base_seconds)
+
+
+# --- API MetaTrader5 ---
+
+def initialize(path=None, login=None, password=None, server=None, timeout=None, portable=False) -> bool:
+    _latency()
+    with _lock:
+        _state['initialized'] = True
+        _state['login'] = login or 0
+        _state['server'] = server or 'Simulator'
+        _now() # Démarre l'horloge simulée
+    _set_error(RES_S_OK, 'Success')
+    return True
+
+def shutdown():
+    _state['initialized'] = False
+    return True
+
+def last_error():
+    return _state['last_error']
+
+def version():
+    return (500, 0, 'simulator')
+
+def terminal_info():
+    if not _state['initialized']:
+        _set_error(RES_E_FAIL, 'Terminal non initialisé')
+        return None
+    return TerminalInfo(True, True, 'Kasperbot MT5 Simulator', 'Simulator', '')
+
+def account_info():
+    _latency()
+    if not _state['initialized']:
+        _set_error(RES_E_FAIL, 'Terminal non initialisé')
+        return None
+    with _lock:
+        _update_positions()
+        profit = sum(_position_profit(p) for p in _positions.values())
+        margin = sum(p['volume'] * _contract_size(p['symbol']) * p['price_open'] / _settings['leverage'] for p in _positions.values())
+        balance = _state['balance']
+    equity = balance + profit
+    return AccountInfo(_state.get('login', 0), 'Simulated Account', _state.get('server', 'Simulator'), _settings['currency'],
+                       _settings['leverage'], balance, equity, profit, margin, equity - margin)
+
+def _contract_size(symbol: str) -> float:
+    return _market(symbol).contract_size
+
+def symbol_info(symbol):
+    _latency()
+    tick = _tick(symbol)
+    market = _market(symbol)
+    currency_profit = symbol[3:6] if len(symbol) >= 6 else _settings['currency']
+    return SymbolInfo(symbol, True, market.point, market.digits, _settings['spread_points'], 10,
+                      _contract_size(symbol), 0.01, 100.0, 0.01, symbol[:3], currency_profit, symbol[:3],
+                      tick.bid, tick.ask)
+
+def symbol_select(symbol, enable=True) -> bool:
+    _latency()
+    _market(symbol)
+    return True
+
+def symbols_get(group=None):
+    return tuple(symbol_info(s) for s in list(_markets))
+
+def _tick(symbol: str, at: Optional[float] = None) -> Tick:
+    market = _market(symbol)
+    t = _now() if at is None else at
+    bid = market.price_at(t)
+    ask = bid + _settings['spread_points'] * market.point
+    return Tick(int(t), bid, ask, 0.0, 0, int(t * 1000), 6, 0.0)
+
+def symbol_info_tick(symbol):
+    _latency()
+    with _lock:
+        _update_positions()
+    return _tick(symbol)
+
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    _latency()
+    rates = _rates(symbol, timeframe, start_pos + count)
+    if rates is None:
+        _set_error(RES_E_INVALID_PARAMS, f'Timeframe {timeframe} non disponible dans le simulateur')
+        return None
+    end = len(rates) - start_pos
+    return rates[max(0, end - count):max(0, end)].copy()
+
+def copy_rates_from(symbol, timeframe, date_from, count):
+    _latency()
+    rates = _rates(symbol, timeframe)
+    if rates is None:
+        _set_error(RES_E_INVALID_PARAMS, f'Timeframe {timeframe} non disponible dans le simulateur')
+        return None
+    end = int(np.searchsorted(rates['time'], _to_seconds(date_from), side='right'))
+    return rates[max(0, end - count):end].copy()
+
+def copy_rates_range(symbol, timeframe, date_from, date_to):
+    _latency()
+    rates = _rates(symbol, timeframe)
+    if rates is None:
+        _set_error(RES_E_INVALID_PARAMS, f'Timeframe {timeframe} non disponible dans le simulateur')
+        return None
+    lo = int(np.searchsorted(rates['time'], _to_seconds(date_from), side='left'))
+    hi = int(np.searchsorted(rates['time'], _to_seconds(date_to), side='right'))
+    return rates[lo:hi].copy()
+
+def _ticks_between(symbol: str, start_s: float, end_s: float, count: Optional[int] = None) -> np.ndarray:
+    """Ticks synthétiques réguliers (tick_interval_ms) entre start_s et end_s (bornés à l'heure simulée)."""
+    market = _market(symbol)
+    step = _settings['tick_interval_ms'] / 1000.0
+    end_s = min(end_s, _now())
+    first = np.ceil(start_s / step) * step
+    n = max(0, int((end_s - first) // step) + 1)
+    if count is not None:
+        n = min(n, int(count))
+    times = first + np.arange(n) * step
+
+    ticks = np.zeros(n, dtype=TICKS_DTYPE)
+    ticks['time'] = times.astype(np.int64)
+    ticks['time_msc'] = np.round(times * 1000).astype(np.int64)
+    ticks['bid'] = market.prices_at(times)
+    ticks['ask'] = ticks['bid'] + _settings['spread_points'] * market.point
+    ticks['flags'] = 6
+    return ticks
+
+def copy_ticks_from(symbol, date_from, count, flags=COPY_TICKS_ALL):
+    _latency()
+    return _ticks_between(symbol, _to_seconds(date_from), _now(), count)
+
+def copy_ticks_range(symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+    _latency()
+    return _ticks_between(symbol, _to_seconds(date_from), _to_seconds(date_to))
+
+
+# --- Trading simulé ---
+
+def _position_profit(position: dict, price: Optional[float] = None) -> float:
+    if price is None:
+        tick = _tick(position['symbol'])
+        price = tick.bid if position['type'] == POSITION_TYPE_BUY else tick.ask
+    direction = 1.0 if position['type'] == POSITION_TYPE_BUY else -1.0
+    return (price - position['price_open']) * direction * position['volume'] * _contract_size(position['symbol'])
+
+def _close_position(ticket: int, price: float, comment: str):
+    position = _positions.pop(ticket)
+    profit = _position_profit(position, price)
+    _state['balance'] += profit
+    _history_deals.append(TradeDeal(_next_ticket(), ticket, int(_now()), 1 - position['type'], ticket,
+                                    position['volume'], price, profit, position['symbol'], comment))
+
+def _update_positions():
+    """Déclenche les SL/TP des positions ouvertes au prix courant."""
+    for ticket, position in list(_positions.items()):
+        tick = _tick(position['symbol'])
+        if position['type'] == POSITION_TYPE_BUY:
+            price = tick.bid
+            if position['sl'] and price <= position['sl']:
+                _close_position(ticket, position['sl'], 'sl')
+            elif position['tp'] and price >= position['tp']:
+                _close_position(ticket, position['tp'], 'tp')
+        else:
+            price = tick.ask
+            if position['sl'] and price >= position['sl']:
+                _close_position(ticket, position['sl'], 'sl')
+            elif position['tp'] and price <= position['tp']:
+                _close_position(ticket, position['tp'], 'tp')
+
+def _next_ticket() -> int:
+    _state['next_ticket'] += 1
+    return _state['next_ticket']
+
+def _result(retcode: int, request: dict, comment: str, order: int = 0, price: float = 0.0, tick: Optional[Tick] = None):
+    """Résultat d'order_send ; un rejet est aussi reporté par last_error()."""
+    if retcode == TRADE_RETCODE_DONE:
+        _set_error(RES_S_OK, 'Success')
+    else:
+        _set_error(RES_E_FAIL, f"{comment} (retcode={retcode})")
+    return OrderSendResult(retcode, order, order, request.get('volume', 0.0), price,
+                           tick.bid if tick else 0.0, tick.ask if tick else 0.0, comment, 0, request)
+
+def order_send(request: dict):
+    _latency(_settings['order_latency_ms'])
+    symbol = request.get('symbol')
+    action = request.get('action')
+    with _lock:
+        _update_positions()
+        tick = _tick(symbol) if symbol else None
+
+        if action == TRADE_ACTION_SLTP:
+            position = _positions.get(request.get('position'))
+            if position is None:
+                return _result(TRADE_RETCODE_INVALID, request, 'Position inconnue')
+            position['sl'] = request.get('sl', position['sl'])
+            position['tp'] = request.get('tp', position['tp'])
+            return _result(TRADE_RETCODE_DONE, request, 'Request executed', position['ticket'], tick=tick)
+
+        if action != TRADE_ACTION_DEAL or request.get('type') not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL):
+            return _result(TRADE_RETCODE_INVALID, request, 'Action non supportée par le simulateur')
+        if tick is None:
+            return _result(TRADE_RETCODE_INVALID, request, 'Symbole manquant')
+
+        volume = float(request.get('volume', 0.0))
+        if volume <= 0:
+            return _result(TRADE_RETCODE_INVALID_VOLUME, request, 'Volume invalide')
+        price = tick.ask if request['type'] == ORDER_TYPE_BUY else tick.bid
+
+        # Fermeture d'une position existante (ordre opposé avec 'position')
+        if request.get('position') in _positions:
+            _close_position(request['position'], price, request.get('comment', ''))
+            return _result(TRADE_RETCODE_DONE, request, 'Request executed', request['position'], price, tick)
+
+        sl, tp = float(request.get('sl') or 0.0), float(request.get('tp') or 0.0)
+        is_buy = request['type'] == ORDER_TYPE_BUY
+        if (sl and (sl >= price if is_buy else sl <= price)) or (tp and (tp <= price if is_buy else tp >= price)):
+            return _result(TRADE_RETCODE_INVALID_STOPS, request, 'Invalid stops')
+
+        ticket = _next_ticket()
+        now = int(_now())
+        _positions[ticket] = {
+            'ticket': ticket, 'time': now, 'type': POSITION_TYPE_BUY if is_buy else POSITION_TYPE_SELL,
+            'magic': request.get('magic', 0), 'volume': volume, 'price_open': price,
+            'sl': sl, 'tp': tp, 'symbol': symbol, 'comment': request.get('comment', ''),
+        }
+        _history_orders[ticket] = TradeOrder(ticket, now, request['type'], request.get('magic', 0), volume,
+                                             price, price, sl, tp, symbol, request.get('comment', ''))
+        _history_deals.append(TradeDeal(_next_ticket(), ticket, now, request['type'], ticket, volume,
+                                        price, 0.0, symbol, request.get('comment', '')))
+        return _result(TRADE_RETCODE_DONE, request, 'Request executed', ticket, price, tick)
+
+def positions_get(symbol=None, group=None, ticket=None):
+    _latency()
+    with _lock:
+        _update_positions()
+        positions = [p for p in _positions.values()
+                     if (symbol is None or p['symbol'] == symbol) and (ticket is None or p['ticket'] == ticket)]
+        result = []
+        for p in positions:
+            tick = _tick(p['symbol'])
+            current = tick.bid if p['type'] == POSITION_TYPE_BUY else tick.ask
+            result.append(TradePosition(p['ticket'], p['time'], p['type'], p['magic'], p['ticket'], p['volume'],
+                                        p['price_open'], p['sl'], p['tp'], current, _position_profit(p, current),
+                                        p['symbol'], p['comment']))
+    return tuple(result)
+
+def positions_total():
+    return len(positions_get())
+
+def orders_get(symbol=None, group=None, ticket=None):
+    return ()
+
+def history_orders_get(date_from=None, date_to=None, group=None, ticket=None, position=None):
+    _latency()
+    with _lock:
+        if ticket is not None or position is not None:
+            order = _history_orders.get(ticket if ticket is not None else position)
+            return (order,) if order else ()
+        return tuple(_history_orders.values())
+
+def history_deals_get(date_from=None, date_to=None, group=None, ticket=None, position=None):
+    _latency()
+    with _lock:
+        return tuple(d for d in _history_deals if position is None or d.position_id == position)
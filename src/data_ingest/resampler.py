@@ -0,0 +1,113 @@
+# Fichier: src/data_ingest/resampler.py
+"""
+Rééchantillonnage local des bougies (M5 -> M15, H4, D1...).
+
+Les timeframes supérieures sont construites à partir d'une seule timeframe de base
+mise en cache (M1 ou M5), par réductions vectorisées sur des groupes de bougies
+(np.*.reduceat). Les groupes sont alignés sur les frontières de l'heure serveur
+(comme les bougies MT5), avec un décalage optionnel pour les courtiers dont les
+sessions ne commencent pas à minuit.
+
+IncrementalResampler ne recalcule, à chaque mise à jour, que la bougie en formation
+(et les éventuelles nouvelles bougies) : les bougies clôturées sont conservées.
+
+Version: 1.0
+"""
+
+__version__ = "1.0"
+
+import numpy as np
+from typing import Optional
+
+from src.data_ingest.bar_store import BAR_DTYPE
+
+# Le 1er janvier 1970 était un jeudi : les semaines MT5 commencent le dimanche
+WEEK_OFFSET_SECONDS = 3 * 86400
+
+
+def bucket_start(times: np.ndarray, target_seconds: int, offset_seconds: int = 0) -> np.ndarray:
+    """Heure d'ouverture de la bougie cible contenant chaque timestamp."""
+    times = np.asarray(times, dtype=np.int64)
+    return (times - offset_seconds) // target_seconds * target_seconds + offset_seconds
+
+
+def resample_rates(base: np.ndarray, target_seconds: int, offset_seconds: int = 0, drop_partial_head: bool = True) -> np.ndarray:
+    """
+    Agrège des bougies de base (tableau structuré MT5, trié) en bougies de 'target_seconds'.
+
+    - open : premier open du groupe, close : dernier close
+    - high / low : max / min
+    - tick_volume / real_volume : sommes, spread : minimum
+
+    Args:
+        drop_partial_head (bool): Ignore le premier groupe s'il commence avant la première
+                                  bougie de base (bougie cible incomplète).
+
+    Returns:
+        np.ndarray: Tableau structuré (dtype des bougies MT5 / BarStore).
+    """
+    n = len(base)
+    if n == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+
+    times = np.asarray(base['time'], dtype=np.int64)
+    buckets = bucket_start(times, target_seconds, offset_seconds)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], n) - 1
+
+    out = np.empty(len(starts), dtype=BAR_DTYPE)
+    out['time'] = buckets[starts]
+    out['open'] = base['open'][starts]
+    out['close'] = base['close'][ends]
+    out['high'] = np.maximum.reduceat(np.asarray(base['high'], dtype=np.float64), starts)
+    out['low'] = np.minimum.reduceat(np.asarray(base['low'], dtype=np.float64), starts)
+    names = base.dtype.names
+    out['tick_volume'] = np.add.reduceat(np.asarray(base['tick_volume'], dtype=np.uint64), starts) if 'tick_volume' in names else 0
+    out['real_volume'] = np.add.reduceat(np.asarray(base['real_volume'], dtype=np.uint64), starts) if 'real_volume' in names else 0
+    out['spread'] = np.minimum.reduceat(np.asarray(base['spread'], dtype=np.int32), starts) if 'spread' in names else 0
+
+    if drop_partial_head and times[0] != buckets[0]:
+        out = out[1:]
+    return out
+
+
+class IncrementalResampler:
+    """
+    Bougies d'une timeframe cible maintenues à partir du flux de la timeframe de base.
+    """
+
+    __slots__ = ('target_seconds', 'offset_seconds', 'capacity', 'rates')
+
+    def __init__(self, target_seconds: int, offset_seconds: int = 0, capacity: int = 5000):
+        self.target_seconds = target_seconds
+        self.offset_seconds = offset_seconds
+        self.capacity = capacity
+        self.rates: Optional[np.ndarray] = None
+
+    def update(self, base: np.ndarray) -> np.ndarray:
+        """
+        Intègre les bougies de base (fenêtre courante du cache, bougie en formation incluse).
+
+        Seules les bougies de base postérieures ou égales à l'ouverture de la dernière
+        bougie cible connue sont réagrégées.
+
+        Returns:
+            np.ndarray: Les bougies cibles (les 'capacity' plus récentes).
+        """
+        if len(base) == 0:
+            return self.rates if self.rates is not None else np.empty(0, dtype=BAR_DTYPE)
+
+        if self.rates is None or len(self.rates) == 0 or base['time'][0] > self.rates['time'][-1]:
+            # Premier calcul (ou trou dans l'historique) : agrégation complète
+            self.rates = resample_rates(base, self.target_seconds, self.offset_seconds)
+        else:
+            last_open = self.rates['time'][-1]
+            first = int(np.searchsorted(base['time'], last_open, side='left'))
+            tail = resample_rates(base[first:], self.target_seconds, self.offset_seconds, drop_partial_head=False)
+            if len(tail):
+                keep = int(np.searchsorted(self.rates['time'], tail['time'][0], side='left'))
+                self.rates = np.concatenate((self.rates[:keep], tail))
+
+        if len(self.rates) > self.capacity:
+            self.rates = self.rates[-self.capacity:]
+        return self.rates
@@ -0,0 +1,257 @@
+# Fichier: src/data_ingest/shared_bars.py
+"""
+Tampons de bougies en mémoire partagée (multiprocessing.shared_memory).
+
+Un seul écrivain publie, par (symbole, timeframe), les bougies au format colonnaire
+de BarStore dans un segment de mémoire partagée ; les lecteurs (workers, runs de
+backtest parallèles...) y accèdent par des vues NumPy, sans sérialisation ni copie.
+
+Disposition d'un segment :
+    en-tête int64 [seq, count, capacity, 0] puis une colonne par champ de BAR_COLUMNS
+    ('capacity' valeurs chacune, bougies les plus anciennes d'abord).
+
+Cohérence (seqlock) : l'écrivain rend 'seq' impair pendant l'écriture puis pair.
+Un lecteur relève 'seq' avant lecture et vérifie qu'il n'a pas changé ensuite
+(SharedBarBuffer.read / is_current).
+
+    # Processus écrivain
+    registry = SharedBarRegistry("kasper", create=True)
+    registry.publish("EURUSD", "M15", rates)
+    # Processus lecteur
+    reader = SharedBarRegistry("kasper")
+    df = reader.read_dataframe("EURUSD", "M15")
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import re
+import time
+import logging
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+from src.data_ingest.bar_store import BAR_COLUMNS, BAR_DTYPE
+from src.data_ingest.bar_frame import BarFrame
+
+logger = logging.getLogger(__name__)
+
+_HEADER_FIELDS = 4 # seq, count, capacity, réservé
+_HEADER_BYTES = _HEADER_FIELDS * 8
+
+
+def _segment_size(capacity: int) -> int:
+    return _HEADER_BYTES + sum(np.dtype(dtype).itemsize * capacity for _, dtype in BAR_COLUMNS)
+
+
+class SharedBarBuffer:
+    """
+    Un segment de mémoire partagée contenant les bougies d'un (symbole, timeframe).
+    """
+
+    def __init__(self, name: str, capacity: Optional[int] = None, create: bool = False):
+        """
+        Args:
+            name (str): Nom du segment.
+            capacity (int): Nombre maximal de bougies (obligatoire à la création).
+            create (bool): True pour l'écrivain (création du segment), False pour un lecteur.
+        """
+        self.name = name
+        self.owner = create
+        if create:
+            if not capacity or capacity < 1:
+                raise ValueError("SharedBarBuffer: 'capacity' est obligatoire à la création.")
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=_segment_size(capacity))
+        else:
+            # Un lecteur ne doit pas détruire le segment à sa sortie : le suivi est réservé à l'écrivain
+            # (Python >= 3.13). Avant 3.13, les lecteurs lancés par l'écrivain partagent son
+            # resource_tracker, qui ne détruit le segment qu'une fois.
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self._shm = shared_memory.SharedMemory(name=name)
+
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self._shm.buf)
+        if create:
+            self._header[:] = (0, 0, capacity, 0)
+        self.capacity = int(self._header[2])
+
+        self._columns: Dict[str, np.ndarray] = {}
+        offset = _HEADER_BYTES
+        for column, dtype in BAR_COLUMNS:
+            self._columns[column] = np.ndarray((self.capacity,), dtype=dtype, buffer=self._shm.buf, offset=offset)
+            offset += np.dtype(dtype).itemsize * self.capacity
+
+    @property
+    def seq(self) -> int:
+        """Compteur de séquence (pair = stable, impair = écriture en cours)."""
+        return int(self._header[0])
+
+    def __len__(self) -> int:
+        return int(self._header[1])
+
+    # --- Écriture (processus propriétaire uniquement) ---
+
+    def write(self, rates: np.ndarray) -> int:
+        """
+        Remplace le contenu par 'rates' (tableau structuré MT5 ; seules les 'capacity'
+        dernières bougies sont conservées).
+
+        Returns:
+            int: Le nouveau numéro de séquence.
+        """
+        if not self.owner:
+            raise PermissionError(f"SharedBarBuffer '{self.name}' ouvert en lecture seule.")
+        rates = rates[-self.capacity:] if len(rates) > self.capacity else rates
+        n = len(rates)
+
+        self._header[0] += 1 # Impair : écriture en cours
+        for column, _ in BAR_COLUMNS:
+            if column in rates.dtype.names:
+                self._columns[column][:n] = rates[column]
+            else:
+                self._columns[column][:n] = 0
+        self._header[1] = n
+        self._header[0] += 1 # Pair : données stables
+        return self.seq
+
+    # --- Lecture ---
+
+    def is_current(self, seq: int) -> bool:
+        """True si aucune écriture n'a eu lieu depuis la lecture associée à 'seq'."""
+        return self.seq == seq
+
+    def read(self, copy: bool = False, timeout: float = 1.0) -> Tuple[int, Dict[str, np.ndarray]]:
+        """
+        Lit les colonnes.
+
+        Args:
+            copy (bool): False = vues NumPy sur la mémoire partagée (zéro copie ; vérifier ensuite
+                         is_current(seq) si l'écrivain peut publier pendant l'analyse).
+                         True = copie cohérente garantie.
+
+        Returns:
+            tuple: (seq, {colonne: np.ndarray})
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.seq
+            if seq % 2 == 0:
+                n = len(self)
+                columns = {column: values[:n] for column, values in self._columns.items()}
+                if copy:
+                    columns = {column: values.copy() for column, values in columns.items()}
+                if self.seq == seq:
+                    return seq, columns
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"SharedBarBuffer '{self.name}': lecture cohérente impossible.")
+            time.sleep(0) # Laisser l'écrivain terminer
+
+    def read_rates(self) -> Tuple[int, np.ndarray]:
+        """Copie cohérente au format tableau structuré MT5."""
+        seq, columns = self.read(copy=False)
+        rates = np.empty(len(columns['time']), dtype=BAR_DTYPE)
+        for column, _ in BAR_COLUMNS:
+            rates[column] = columns[column]
+        if not self.is_current(seq): # Écriture concurrente : on recommence avec une copie
+            return self.read_rates()
+        return seq, rates
+
+    def close(self, unlink: Optional[bool] = None):
+        """Détache le segment (et le détruit si on en est propriétaire, sauf unlink=False)."""
+        self._header = None
+        self._columns = {}
+        self._shm.close()
+        if self.owner if unlink is None else unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class SharedBarRegistry:
+    """
+    Ensemble de tampons nommés '<prefix>_<symbole>_<timeframe>'.
+    L'écrivain (create=True) crée les segments à la publication ; les lecteurs s'y attachent à la demande.
+    """
+
+    def __init__(self, prefix: str = "kasper", create: bool = False, default_capacity: int = 5000):
+        self.prefix = prefix
+        self.create = create
+        self.default_capacity = default_capacity
+        self._buffers: Dict[Tuple[str, str], SharedBarBuffer] = {}
+
+    def segment_name(self, symbol: str, timeframe: str) -> str:
+        safe_symbol = re.sub(r'[^A-Za-z0-9]', '_', symbol)
+        return f"{self.prefix}_{safe_symbol}_{timeframe.upper()}"
+
+    def buffer(self, symbol: str, timeframe: str) -> Optional[SharedBarBuffer]:
+        """Le tampon d'un (symbole, timeframe), ou None s'il n'a pas été publié."""
+        key = (symbol, timeframe.upper())
+        buffer = self._buffers.get(key)
+        if buffer is None and not self.create:
+            try:
+                buffer = self._buffers[key] = SharedBarBuffer(self.segment_name(symbol, timeframe))
+            except FileNotFoundError:
+                return None
+        return buffer
+
+    def publish(self, symbol: str, timeframe: str, rates: np.ndarray, capacity: Optional[int] = None) -> int:
+        """
+        (Écrivain) Publie les bougies d'un (symbole, timeframe).
+
+        Returns:
+            int: Le numéro de séquence publié.
+        """
+        if not self.create:
+            raise PermissionError("SharedBarRegistry ouvert en lecture seule.")
+        key = (symbol, timeframe.upper())
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            capacity = capacity or max(self.default_capacity, len(rates))
+            name = self.segment_name(symbol, timeframe)
+            try:
+                buffer = SharedBarBuffer(name, capacity, create=True)
+            except FileExistsError: # Segment orphelin d'une exécution précédente
+                logger.warning(f"Segment partagé '{name}' existant : remplacement.")
+                SharedBarBuffer(name).close(unlink=True)
+                buffer = SharedBarBuffer(name, capacity, create=True)
+            self._buffers[key] = buffer
+        return buffer.write(rates)
+
+    def read(self, symbol: str, timeframe: str, copy: bool = False):
+        """(seq, {colonne: vue}) ou None si non publié."""
+        buffer = self.buffer(symbol, timeframe)
+        return buffer.read(copy=copy) if buffer is not None else None
+
+    def read_dataframe(self, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """
+        DataFrame au format de mt5_connector.get_data (index 'time' naïf), ou None si non publié.
+        Les colonnes sont copiées (un DataFrame est souvent conservé après l'analyse).
+        """
+        buffer = self.buffer(symbol, timeframe)
+        if buffer is None:
+            return None
+        _, columns = buffer.read(copy=True)
+        index = pd.DatetimeIndex(pd.to_datetime(columns.pop('time'), unit='s'), name='time')
+        return pd.DataFrame(columns, index=index)
+
+    def read_frame(self, symbol: str, timeframe: str, copy: bool = False) -> Optional[BarFrame]:
+        """
+        BarFrame sur les colonnes partagées, ou None si non publié.
+        copy=False : vues sans copie (voir SharedBarBuffer.read pour la cohérence).
+        """
+        buffer = self.buffer(symbol, timeframe)
+        if buffer is None:
+            return None
+        _, columns = buffer.read(copy=copy)
+        return BarFrame.from_columns(columns)
+
+    def close(self):
+        """Détache tous les tampons (et détruit les segments si écrivain)."""
+        for buffer in self._buffers.values():
+            buffer.close()
+        self._buffers.clear()
@@ -0,0 +1,331 @@
+# Fichier: src/data_ingest/tick_stream.py
+"""
+Flux de ticks MT5 : tampons NumPy, bougies agrégées en continu et cache bid/ask.
+
+- TickBuffer : derniers ticks d'un symbole (time_msc, bid, ask) dans des colonnes NumPy
+  préallouées, toujours contiguës (compactage amorti).
+- TickBarAggregator : bougie en formation d'une timeframe, tenue à jour depuis les ticks
+  (prix bid, comme les bougies MT5) par réductions vectorisées sur chaque lot de ticks.
+  Signale quand un lot prolonge le plus haut / plus bas de la bougie en formation :
+  déclencheur d'une nouvelle analyse M1/M2 dont le test de sweep (Modèle 2) reprend
+  les extrêmes de cette bougie (forming_bar).
+- TickFeed : un symbole ; interroge mt5.copy_ticks_from depuis le dernier tick reçu.
+- get_tick() : dernier bid/ask connu (mis à jour par le flux ou par symbol_info_tick),
+  réutilisé tant qu'il a moins de 'cache_max_age_ms' (risk_manager, mt5_executor).
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import MetaTrader5 as mt5
+import time
+import logging
+import threading
+import numpy as np
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.data_ingest.bar_store import BAR_DTYPE
+from src.data_ingest.resampler import bucket_start
+
+logger = logging.getLogger(__name__)
+
+# Prix courant d'un symbole (mêmes attributs que le Tick MT5 utilisés par le bot)
+LiveTick = namedtuple('LiveTick', ['time', 'bid', 'ask', 'time_msc'])
+
+
+class TickBuffer:
+    """
+    Les 'capacity' derniers ticks d'un symbole, en colonnes NumPy.
+    """
+
+    __slots__ = ('capacity', '_time_msc', '_bid', '_ask', '_start', '_end')
+
+    def __init__(self, capacity: int = 20000):
+        self.capacity = capacity
+        # Double capacité : les ajouts se font en fin de tableau, le compactage est amorti
+        self._time_msc = np.empty(2 * capacity, dtype=np.int64)
+        self._bid = np.empty(2 * capacity, dtype=np.float64)
+        self._ask = np.empty(2 * capacity, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def append(self, time_msc: np.ndarray, bid: np.ndarray, ask: np.ndarray):
+        """Ajoute un lot de ticks (triés, postérieurs aux ticks déjà présents)."""
+        n = len(time_msc)
+        if n >= self.capacity:
+            time_msc, bid, ask = time_msc[-self.capacity:], bid[-self.capacity:], ask[-self.capacity:]
+            self._start = self._end = 0
+            n = self.capacity
+        elif self._end + n > len(self._time_msc):
+            keep = min(len(self), self.capacity - n)
+            for column in (self._time_msc, self._bid, self._ask):
+                column[:keep] = column[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+
+        end = self._end + n
+        self._time_msc[self._end:end] = time_msc
+        self._bid[self._end:end] = bid
+        self._ask[self._end:end] = ask
+        self._end = end
+        self._start = max(self._start, end - self.capacity)
+
+    @property
+    def time_msc(self) -> np.ndarray:
+        return self._time_msc[self._start:self._end]
+
+    @property
+    def bid(self) -> np.ndarray:
+        return self._bid[self._start:self._end]
+
+    @property
+    def ask(self) -> np.ndarray:
+        return self._ask[self._start:self._end]
+
+
+class TickBarAggregator:
+    """
+    Bougie en formation d'une timeframe, tenue à jour à partir des ticks.
+
+    'current' est la bougie en formation (tableau structuré de longueur 1, dtype des
+    bougies MT5 ; spread et real_volume ne sont pas renseignés).
+    """
+
+    __slots__ = ('timeframe_seconds', 'offset_seconds', 'current', 'extended_low', 'extended_high')
+
+    def __init__(self, timeframe_seconds: int, offset_seconds: int = 0):
+        self.timeframe_seconds = timeframe_seconds
+        self.offset_seconds = offset_seconds
+        self.current: Optional[np.ndarray] = None
+        self.extended_low = False # Le dernier lot a prolongé le plus bas de la bougie en formation
+        self.extended_high = False
+
+    def update(self, time_msc: np.ndarray, bid: np.ndarray):
+        """Intègre un lot de ticks (triés, postérieurs au dernier lot)."""
+        self.extended_low = self.extended_high = False
+        n = len(time_msc)
+        if n == 0:
+            return
+
+        buckets = bucket_start(time_msc // 1000, self.timeframe_seconds, self.offset_seconds)
+        # Seule la dernière bougie du lot reste en formation
+        start = int(np.searchsorted(buckets, buckets[-1], side='left'))
+        bid = bid[start:]
+        high, low = bid.max(), bid.min()
+
+        current = self.current
+        if current is not None and current['time'][0] == buckets[-1]:
+            # Le lot prolonge la bougie en formation
+            self.extended_low = bool(low < current['low'][0])
+            self.extended_high = bool(high > current['high'][0])
+            current['high'] = max(current['high'][0], high)
+            current['low'] = min(current['low'][0], low)
+            current['close'] = bid[-1]
+            current['tick_volume'] += len(bid)
+            return
+
+        current = np.zeros(1, dtype=BAR_DTYPE)
+        current['time'] = buckets[-1]
+        current['open'] = bid[0]
+        current['high'] = high
+        current['low'] = low
+        current['close'] = bid[-1]
+        current['tick_volume'] = len(bid)
+        self.current = current
+
+
+class TickFeed:
+    """
+    Flux de ticks d'un symbole : tampon, bougies en formation par timeframe, dernier bid/ask.
+    """
+
+    def __init__(self, symbol: str, timeframes: Dict[str, int], buffer_size: int = 20000,
+                 max_ticks_per_poll: int = 5000):
+        """
+        Args:
+            timeframes (dict): {timeframe_str: durée en secondes} des bougies à agréger.
+        """
+        self.symbol = symbol
+        self.max_ticks_per_poll = max_ticks_per_poll
+        self.buffer = TickBuffer(buffer_size)
+        self.aggregators = {tf: TickBarAggregator(seconds) for tf, seconds in timeframes.items()}
+        self._last_msc: Optional[int] = None
+        self._seen_at_last = 0 # Ticks déjà reçus à la milliseconde '_last_msc'
+
+    def poll(self) -> int:
+        """
+        Récupère les ticks postérieurs au dernier tick reçu (au premier appel : depuis
+        l'ouverture de la bougie en formation de la plus grande timeframe).
+
+        Returns:
+            int: Le nombre de nouveaux ticks.
+        """
+        if self._last_msc is None:
+            tick = mt5.symbol_info_tick(self.symbol)
+            if tick is None:
+                return 0
+            longest = max((agg.timeframe_seconds for agg in self.aggregators.values()), default=60)
+            since = int(bucket_start(np.array([tick.time]), longest)[0])
+        else:
+            since = self._last_msc // 1000
+
+        ticks = mt5.copy_ticks_from(self.symbol, since, self.max_ticks_per_poll, mt5.COPY_TICKS_ALL)
+        if ticks is None or len(ticks) == 0:
+            return 0
+        return self.ingest(ticks)
+
+    def ingest(self, ticks: np.ndarray) -> int:
+        """
+        Intègre des ticks (tableau structuré MT5, triés) en ignorant ceux déjà reçus.
+
+        Returns:
+            int: Le nombre de nouveaux ticks.
+        """
+        time_msc = np.asarray(ticks['time_msc'], dtype=np.int64)
+        skip = 0
+        if self._last_msc is not None:
+            # copy_ticks_from travaille à la seconde : on saute les ticks déjà reçus
+            first_equal = int(np.searchsorted(time_msc, self._last_msc, side='left'))
+            after_equal = int(np.searchsorted(time_msc, self._last_msc, side='right'))
+            skip = min(first_equal + self._seen_at_last, after_equal) if after_equal > first_equal else after_equal
+
+        if skip >= len(time_msc):
+            return 0
+        time_msc = time_msc[skip:]
+        bid = np.asarray(ticks['bid'][skip:], dtype=np.float64)
+        ask = np.asarray(ticks['ask'][skip:], dtype=np.float64)
+
+        last = int(time_msc[-1])
+        seen = int(np.count_nonzero(time_msc == last))
+        self._seen_at_last = seen + (self._seen_at_last if last == self._last_msc else 0)
+        self._last_msc = last
+
+        self.buffer.append(time_msc, bid, ask)
+        for aggregator in self.aggregators.values():
+            aggregator.update(time_msc, bid)
+        update_tick(self.symbol, LiveTick(last // 1000, float(bid[-1]), float(ask[-1]), last))
+        return len(time_msc)
+
+
+# --- Paramètres et registres (modifiables via configure_tick_stream, section 'ticks' de config.yaml) ---
+_TICK_STREAM_ENABLED = False
+_TIMEFRAMES: Dict[str, int] = {}
+_BUFFER_SIZE = 20000
+_MAX_TICKS_PER_POLL = 5000
+_CACHE_MAX_AGE = 0.25 # Secondes
+
+_feeds: Dict[str, TickFeed] = {}
+_latest: Dict[str, Tuple[object, float]] = {} # symbole -> (tick, heure monotone de réception)
+_lock = threading.Lock()
+
+
+def configure_tick_stream(enabled: bool = False, timeframes: Optional[Dict[str, int]] = None, buffer_size: int = 20000,
+                          max_ticks_per_poll: int = 5000, cache_max_age_ms: int = 250):
+    """
+    Configure le flux de ticks et le cache bid/ask.
+
+    Args:
+        enabled (bool): Active l'interrogation des ticks (poll()).
+        timeframes (dict): {timeframe_str: secondes} des bougies agrégées depuis les ticks.
+        cache_max_age_ms (int): Âge maximal d'un bid/ask réutilisé par get_tick() (0 = jamais).
+    """
+    global _TICK_STREAM_ENABLED, _TIMEFRAMES, _BUFFER_SIZE, _MAX_TICKS_PER_POLL, _CACHE_MAX_AGE
+    _TICK_STREAM_ENABLED = bool(enabled)
+    _TIMEFRAMES = dict(timeframes or {})
+    _BUFFER_SIZE = int(buffer_size)
+    _MAX_TICKS_PER_POLL = int(max_ticks_per_poll)
+    _CACHE_MAX_AGE = max(0, cache_max_age_ms) / 1000.0
+    clear()
+    if _TICK_STREAM_ENABLED:
+        logger.info(f"Flux de ticks activé (bougies agrégées : {sorted(_TIMEFRAMES)}).")
+
+def is_enabled() -> bool:
+    return _TICK_STREAM_ENABLED
+
+def get_feed(symbol: str) -> Optional[TickFeed]:
+    """Le flux d'un symbole (créé au premier appel), ou None si le symbole est inconnu du terminal."""
+    feed = _feeds.get(symbol)
+    if feed is None:
+        if mt5.symbol_info(symbol) is None:
+            logger.error(f"Flux de ticks : symbole {symbol} introuvable.")
+            return None
+        with _lock:
+            feed = _feeds.setdefault(symbol, TickFeed(symbol, _TIMEFRAMES, _BUFFER_SIZE, _MAX_TICKS_PER_POLL))
+    return feed
+
+def poll(symbols: Iterable[str]) -> Dict[str, int]:
+    """
+    Interroge les ticks de chaque symbole.
+
+    Returns:
+        dict: {symbole: nombre de nouveaux ticks} (symboles ayant reçu des ticks uniquement).
+    """
+    received = {}
+    if not _TICK_STREAM_ENABLED:
+        return received
+    for symbol in symbols:
+        feed = get_feed(symbol)
+        if feed is None:
+            continue
+        try:
+            count = feed.poll()
+        except Exception as e:
+            logger.error(f"Flux de ticks {symbol} : {e}")
+            continue
+        if count:
+            received[symbol] = count
+    return received
+
+def extended_symbols(symbols: Iterable[str], timeframe: str) -> List[str]:
+    """Symboles dont le dernier lot de ticks a prolongé la mèche de la bougie 'timeframe' en formation."""
+    result = []
+    for symbol in symbols:
+        feed = _feeds.get(symbol)
+        aggregator = feed.aggregators.get(timeframe) if feed is not None else None
+        if aggregator is not None and (aggregator.extended_low or aggregator.extended_high):
+            result.append(symbol)
+    return result
+
+def forming_bar(symbol: str, timeframe: str) -> Optional[Tuple[int, float, float]]:
+    """(heure d'ouverture, plus bas, plus haut) de la bougie 'timeframe' en formation d'après les ticks, ou None."""
+    feed = _feeds.get(symbol)
+    aggregator = feed.aggregators.get(timeframe) if feed is not None else None
+    if aggregator is None or aggregator.current is None:
+        return None
+    current = aggregator.current
+    return int(current['time'][0]), float(current['low'][0]), float(current['high'][0])
+
+def update_tick(symbol: str, tick):
+    """Mémorise le dernier prix connu d'un symbole."""
+    _latest[symbol] = (tick, time.monotonic())
+
+def get_tick(symbol: str, max_age_ms: Optional[int] = None):
+    """
+    Dernier bid/ask d'un symbole : le prix mémorisé s'il a moins de 'max_age_ms'
+    (par défaut 'cache_max_age_ms'), sinon mt5.symbol_info_tick (mémorisé à son tour).
+
+    Returns:
+        Tick MT5 / LiveTick (attributs time, bid, ask, time_msc), ou None si indisponible.
+    """
+    max_age = _CACHE_MAX_AGE if max_age_ms is None else max_age_ms / 1000.0
+    cached = _latest.get(symbol)
+    if cached is not None and time.monotonic() - cached[1] <= max_age:
+        return cached[0]
+    tick = mt5.symbol_info_tick(symbol)
+    if tick:
+        update_tick(symbol, tick)
+    return tick
+
+def clear(symbol: Optional[str] = None):
+    """Oublie les flux et les prix mémorisés (tous, ou pour un symbole)."""
+    with _lock:
+        if symbol is None:
+            _feeds.clear()
+            _latest.clear()
+        else:
+            _feeds.pop(symbol, None)
+            _latest.pop(symbol, None)
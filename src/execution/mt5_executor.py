@@ -1,6 +1,6 @@
 """
 Fichier: src/execution/mt5_executor.py
-Version: 2.0.1
+Version: 2.0.2
 
 Module pour l'exécution des ordres MT5.
 
@@ -13,6 +13,8 @@ import MetaTrader5 as mt5
 import logging
 import time
 
+from src.data_ingest import tick_stream
+
 logger = logging.getLogger(__name__)
 
 # Variable globale pour stocker la connexion MT5
@@ -40,13 +42,19 @@ def place_order(symbol, order_type, volume, sl_price, tp_price, comment="Kasperb
         logger.error("Impossible de passer l'ordre : Executor non initialisé.")
         return None
 
+    # Prix courant (cache bid/ask de tick_stream : au plus 'cache_max_age_ms' d'ancienneté)
+    tick = tick_stream.get_tick(symbol)
+    if tick is None:
+        logger.error(f"Impossible de passer l'ordre : prix indisponible pour {symbol}.")
+        return None
+
     # Mapping du type d'ordre
     if order_type.upper() == "BUY":
         mt5_order_type = mt5.ORDER_TYPE_BUY
-        price = _mt5_connector.mt5.symbol_info_tick(symbol).ask
+        price = tick.ask
     elif order_type.upper() == "SELL":
         mt5_order_type = mt5.ORDER_TYPE_SELL
-        price = _mt5_connector.mt5.symbol_info_tick(symbol).bid
+        price = tick.bid
     else:
         logger.error(f"Type d'ordre non reconnu : {order_type}")
         return None
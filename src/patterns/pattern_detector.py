@@ -2,214 +2,415 @@
 """
 Module pour la détection des patterns SMC (Fair Value Gaps, Order Blocks)
 et des zones de liquidité (EQH/EQL, Session Ranges).
+Les bougies peuvent être fournies en DataFrame pandas ou en BarFrame (colonnes NumPy).
 
-Version: 2.0
+Version: 2.8
 """
 
-__version__ = "2.0"
+__version__ = "2.8"
 
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Optional
-from datetime import time, datetime
-import pytz
 import logging 
 
+from src.analysis.array_utils import first_touch
+from src.patterns import session_calendar
+
 # Ajout d'un logger pour ce module
 logger = logging.getLogger(__name__)
 
+# --- CONVERSIONS POSITIONS <-> TIMESTAMPS ---
+
+def _locate(index: pd.DatetimeIndex, timestamps: list) -> np.ndarray:
+    """
+    Positions de 'timestamps' dans un index trié (-1 si absent).
+    Équivalent de index.get_indexer(timestamps) par recherche binaire NumPy.
+    """
+    if not timestamps:
+        return np.empty(0, dtype=np.int64)
+    values = index.values
+    keys = np.array([t.asm8 for t in timestamps])
+    positions = np.searchsorted(values, keys)
+    clipped = np.minimum(positions, len(values) - 1)
+    found = (positions < len(values)) & (values[clipped] == keys)
+    return np.where(found, positions, -1)
+
+def _timestamps(index: pd.Index, positions) -> list:
+    """Timestamps de 'index' aux 'positions' (None pour -1), convertis en un seul appel."""
+    positions = np.asarray(positions, dtype=np.intp)
+    if len(positions) == 0:
+        return []
+    values = index[np.maximum(positions, 0)].tolist()
+    return [value if position >= 0 else None for value, position in zip(values, positions.tolist())]
+
+
 # --- FONCTIONS DE LIQUIDITÉ ---
 
-def find_equal_highs_lows(data: pd.DataFrame, lookback: int = 20, tolerance_pips: float = 5.0, pip_size: float = 0.0001) -> Dict[str, List[Dict[str, Any]]]:
+# Pool de liquidité : niveau, nombre de touches, positions de la première/dernière touche,
+# position de la première bougie qui l'a pris (-1 si intact)
+POOL_DTYPE = np.dtype([('level', 'f8'), ('touches', 'i4'), ('first', 'i8'), ('last', 'i8'), ('taken_index', 'i8')])
+
+
+def _cluster_sorted(sorted_prices: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Balayage linéaire de prix triés : un cluster s'étend tant que l'écart au premier
+    prix du cluster (l'ancre) reste <= tolerance. Renvoie les positions de début des clusters.
+    """
+    starts = [0]
+    anchor = sorted_prices[0]
+    for i, price in enumerate(sorted_prices.tolist()):
+        if price - anchor > tolerance:
+            starts.append(i)
+            anchor = price
+    return np.array(starts, dtype=np.int64)
+
+
+def find_liquidity_pool_array(prices: np.ndarray, positions: np.ndarray, tolerance: float, is_high: bool,
+                              high: np.ndarray = None, low: np.ndarray = None, min_touches: int = 2):
+    """
+    Regroupe des swings de même nature en pools de liquidité (EQH / EQL) : un tri puis un balayage linéaire.
+
+    Args:
+        prices (np.ndarray): Prix des swings.
+        positions (np.ndarray): Positions des bougies des swings.
+        tolerance (float): Écart de prix maximal au sein d'un pool.
+        is_high (bool): True pour des swing highs (niveau = max du pool), False pour des lows (niveau = min).
+        high, low (np.ndarray): Si fournis, calcule la prise de chaque pool ('taken_index') :
+                                première bougie après la dernière touche qui dépasse le niveau.
+        min_touches (int): Nombre minimal de swings pour former un pool.
+
+    Returns:
+        tuple: (pools, members) — pools est un tableau POOL_DTYPE trié par niveau,
+               members la liste des positions (triées) des swings de chaque pool.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.int64)
+    if len(prices) == 0:
+        return np.empty(0, dtype=POOL_DTYPE), []
+
+    order = np.argsort(prices, kind='stable')
+    sorted_prices = prices[order]
+    sorted_positions = positions[order]
+    starts = _cluster_sorted(sorted_prices, tolerance)
+    touches = np.diff(np.append(starts, len(sorted_prices)))
+    keep = touches >= min_touches
+
+    pools = np.empty(int(keep.sum()), dtype=POOL_DTYPE)
+    reduce_level = np.maximum if is_high else np.minimum
+    pools['level'] = reduce_level.reduceat(sorted_prices, starts)[keep]
+    pools['touches'] = touches[keep]
+    pools['first'] = np.minimum.reduceat(sorted_positions, starts)[keep]
+    pools['last'] = np.maximum.reduceat(sorted_positions, starts)[keep]
+    pools['taken_index'] = -1
+
+    if high is not None and low is not None and len(pools):
+        # Prise stricte : mèche au-delà du niveau (une touche égale ne prend pas la liquidité)
+        if is_high:
+            _, taken = first_touch(low, high, pools['last'] + 1, above_levels=np.nextafter(pools['level'], np.inf))
+        else:
+            taken, _ = first_touch(low, high, pools['last'] + 1, below_levels=np.nextafter(pools['level'], -np.inf))
+        pools['taken_index'] = taken
+
+    members = [np.sort(group).tolist() for group, kept in zip(np.split(sorted_positions, starts[1:]), keep) if kept]
+    return pools, members
+
+
+def find_liquidity_pools(data: pd.DataFrame, swing_highs: list, swing_lows: list,
+                         tolerance_pips: float = 5.0, pip_size: float = 0.0001, min_touches: int = 2,
+                         lookback: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Carte complète de la liquidité : tous les pools EQH (swing highs) et EQL (swing lows)
+    dont les swings sont à moins de 'tolerance_pips' les uns des autres.
+    Avec 'lookback', seuls les pools touchés pour la dernière fois dans les 'lookback'
+    dernières bougies sont conservés.
+
+    Returns:
+        dict: {"equal_highs": [...], "equal_lows": [...]} — chaque pool contient level, touches,
+              timestamps, start_time, end_time, taken (liquidité déjà prise) et taken_at.
+    """
+    tolerance = tolerance_pips * pip_size
+    high = np.asarray(data['high'])
+    low = np.asarray(data['low'])
+    result = {}
+    for key, swings, is_high in (("equal_highs", swing_highs, True), ("equal_lows", swing_lows, False)):
+        positions = _locate(data.index, [t for t, _ in swings])
+        prices = np.array([p for _, p in swings], dtype=np.float64)
+        found = positions >= 0
+        pools, members = find_liquidity_pool_array(prices[found], positions[found], tolerance, is_high,
+                                                    high=high, low=low, min_touches=min_touches)
+        if lookback is not None:
+            recent = pools['last'] >= len(data) - lookback
+            pools, members = pools[recent], [member for member, kept in zip(members, recent.tolist()) if kept]
+        # Tous les timestamps des pools sont convertis en un seul appel
+        n_pools = len(pools)
+        member_positions = np.array([i for member in members for i in member], dtype=np.int64)
+        flat = _timestamps(data.index, np.concatenate((pools['first'], pools['last'], pools['taken_index'], member_positions)))
+        firsts, lasts, takens = flat[:n_pools], flat[n_pools:2 * n_pools], flat[2 * n_pools:3 * n_pools]
+        member_times = iter(flat[3 * n_pools:])
+        result[key] = [{
+            "level": level,
+            "touches": touches,
+            "timestamps": [next(member_times) for _ in member],
+            "start_time": start_time,
+            "end_time": end_time,
+            "taken": taken_index >= 0,
+            "taken_at": taken_at,
+            "taken_index": taken_index
+        } for (level, touches, _first, _last, taken_index), member, start_time, end_time, taken_at
+            in zip(pools.tolist(), members, firsts, lasts, takens)]
+    return result
+
+
+def find_equal_highs_lows(data: pd.DataFrame, lookback: int = 20, tolerance_pips: float = 5.0,
+                          pip_size: float = 0.0001) -> Dict[str, List[Dict[str, Any]]]:
     """
     Identifie les zones de liquidité "Equal Highs" (EQH) et "Equal Lows" (EQL)
-    sur une période de lookback récente.
+    sur une période de lookback récente : le plus haut (plus bas) des 'lookback' dernières
+    bougies et les mèches à moins de 'tolerance_pips' de ce niveau.
+    Les mèches candidates sont regroupées par find_liquidity_pools (mêmes clés par pool).
     """
     if len(data) < lookback:
         return {"equal_highs": [], "equal_lows": []}
 
-    recent_data = data.iloc[-lookback:]
     tolerance = tolerance_pips * pip_size
-
-    # Equal Highs (EQH)
-    max_high = recent_data['high'].max()
-    eqh_candles = recent_data[abs(recent_data['high'] - max_high) <= tolerance]
-    
-    equal_highs = []
-    if len(eqh_candles) > 1: # Plus d'une mèche touche ce niveau
-        equal_highs.append({
-            "level": max_high,
-            "timestamps": eqh_candles.index.tolist()
-        })
-
-    # Equal Lows (EQL)
-    min_low = recent_data['low'].min()
-    eql_candles = recent_data[abs(recent_data['low'] - min_low) <= tolerance]
-    
-    equal_lows = []
-    if len(eql_candles) > 1: # Plus d'une mèche touche ce niveau
-        equal_lows.append({
-            "level": min_low,
-            "timestamps": eql_candles.index.tolist()
-        })
-
-    return {"equal_highs": equal_highs, "equal_lows": equal_lows}
+    index = data.index[-lookback:]
+    candidates = {}
+    for key, column, extreme in (("highs", 'high', np.max), ("lows", 'low', np.min)):
+        prices = np.asarray(data[column])[-lookback:]
+        near = np.flatnonzero(np.abs(prices - extreme(prices)) <= tolerance)
+        candidates[key] = list(zip(index[near].tolist(), prices[near].tolist()))
+    return find_liquidity_pools(data, candidates["highs"], candidates["lows"], tolerance_pips=tolerance_pips,
+                                pip_size=pip_size, min_touches=2)
 
 
 def find_session_range(data: pd.DataFrame, 
                        session_start_hour: int, 
                        session_end_hour: int, 
-                       timezone: str = 'Etc/UTC') -> Optional[Dict[str, Any]]:
+                       timezone: str = 'Etc/UTC',
+                       cache_key=None) -> Optional[Dict[str, Any]]:
     """
     Identifie le plus haut et le plus bas d'une session de trading spécifique
     (ex: Asia Range) pour la journée la plus récente dans les données.
+
+    Les sessions qui chevauchent minuit (ex: 22:00 - 06:00) sont gérées : on prend
+    la dernière session commencée qui touche le jour le plus récent.
+    Si 'cache_key' est fourni (ex: (symbole, timeframe)), le range d'une session
+    terminée est mémorisé et n'est plus recalculé jusqu'à la session suivante.
+    'data' n'est pas modifié.
     """
     if data.empty:
         return None
 
-    try:
-        tz = pytz.timezone(timezone)
-    except pytz.UnknownTimeZoneError:
-        logger.warning(f"Fuseau horaire '{timezone}' inconnu. Utilisation de 'Etc/UTC'.")
-        tz = pytz.timezone('Etc/UTC')
-
-    # S'assurer que l'index est localisé dans le bon fuseau horaire
-    if data.index.tzinfo is None:
-        try:
-            # Assumons que les données MT5 sont en UTC si non spécifié
-            data.index = data.index.tz_localize('Etc/UTC').tz_convert(tz)
-        except Exception as e:
-            data.index = data.index.tz_convert(tz)
-    else:
-        data.index = data.index.tz_convert(tz)
-
-    start_time = time(session_start_hour, 0)
-    end_time = time(session_end_hour, 0)
-    
-    latest_date = data.index.max().date()
-
-    if start_time < end_time:
-        session_data = data.between_time(start_time, end_time)
-        session_data = session_data[session_data.index.date == latest_date]
-    else:
-         # Gère les sessions qui chevauchent minuit (ex: 22:00 - 06:00)
-         logger.warning("Les ranges de session chevauchant minuit ne sont pas gérés (TODO).")
-         session_data = pd.DataFrame() # Retourner vide pour l'instant
-
-    if session_data.empty:
+    calendar = session_calendar.get_session_calendar(session_start_hour, session_end_hour, timezone)
+    times = session_calendar.index_to_utc_seconds(data.index)
+    last_time = int(times[-1])
+
+    bounds = calendar.latest_session(last_time)
+    if bounds is None:
         return None
+    if cache_key is not None:
+        cached = session_calendar.get_completed_range(cache_key, calendar, bounds)
+        if cached is not None:
+            return cached
 
-    session_high = session_data['high'].max()
-    session_low = session_data['low'].min()
-    
-    return {
-        "high": session_high,
-        "low": session_low,
-        "start_time": session_data.index.min(),
-        "end_time": session_data.index.max()
+    first = int(np.searchsorted(times, bounds[0], side='left'))
+    last = int(np.searchsorted(times, bounds[1], side='right'))
+    if first >= last:
+        return None
+
+    index = data.index if data.index.tz is not None else data.index.tz_localize('Etc/UTC')
+    session_range = {
+        "high": np.asarray(data['high'])[first:last].max(),
+        "low": np.asarray(data['low'])[first:last].min(),
+        "start_time": index[first].tz_convert(calendar.tz),
+        "end_time": index[last - 1].tz_convert(calendar.tz)
     }
+    # Session terminée (une bougie postérieure existe) : le range ne changera plus
+    if cache_key is not None and last_time > bounds[1]:
+        session_calendar.store_completed_range(cache_key, calendar, bounds, session_range)
+    return session_range
 
 
 # --- DÉTECTION FVG / OB ---
 
-def find_fvgs(data: pd.DataFrame):
+# Codes de direction des zones (FVG / OB)
+ZONE_BULLISH = 1
+ZONE_BEARISH = -1
+ZONE_TYPE_NAMES = {ZONE_BULLISH: "BULLISH", ZONE_BEARISH: "BEARISH"}
+
+# FVG : direction, bornes, positions de la première et de la troisième bougie,
+# position de la bougie qui l'a comblé (-1 si non mitigé)
+FVG_DTYPE = np.dtype([('type', 'i1'), ('top', 'f8'), ('bottom', 'f8'), ('start', 'i8'), ('end', 'i8'),
+                      ('mitigated', '?'), ('mitigated_index', 'i8')])
+
+
+def zone_mitigation(high: np.ndarray, low: np.ndarray, types: np.ndarray, tops: np.ndarray, bottoms: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Position de la première bougie (à partir de 'starts', incluse) qui traverse entièrement
+    chaque zone : low <= bottom pour une zone haussière, high >= top pour une zone baissière.
+
+    Returns:
+        np.ndarray: Positions int64, -1 si la zone n'est pas mitigée.
+    """
+    types = np.asarray(types)
+    bullish = types == ZONE_BULLISH
+    below_levels = np.where(bullish, bottoms, np.nan)
+    above_levels = np.where(bullish, np.nan, tops)
+    first_below, first_above = first_touch(low, high, starts, below_levels, above_levels)
+    return np.where(bullish, first_below, first_above)
+
+
+def find_fvg_array(high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """
+    Identifie les Fair Value Gaps (FVG) par comparaison de tableaux décalés.
+
+    Un FVG haussier existe en i si low[i+1] > high[i-1], baissier si high[i+1] < low[i-1].
+    Il est mitigé dès qu'une bougie postérieure le traverse entièrement (voir zone_mitigation).
+
+    Args:
+        high (np.ndarray): Plus hauts des bougies.
+        low (np.ndarray): Plus bas des bougies.
+
+    Returns:
+        np.ndarray: Tableau FVG_DTYPE trié par position ('start' = i-1, 'end' = i+1).
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    if len(high) < 3:
+        return np.empty(0, dtype=FVG_DTYPE)
+
+    prev_high, prev_low = high[:-2], low[:-2]
+    next_high, next_low = high[2:], low[2:]
+    bullish = next_low > prev_high
+    bearish = next_high < prev_low
+    start = np.flatnonzero(bullish | bearish)
+
+    gaps = np.empty(len(start), dtype=FVG_DTYPE)
+    is_bullish = bullish[start]
+    gaps['type'] = np.where(is_bullish, ZONE_BULLISH, ZONE_BEARISH)
+    gaps['top'] = np.where(is_bullish, next_low[start], prev_low[start])
+    gaps['bottom'] = np.where(is_bullish, prev_high[start], next_high[start])
+    gaps['start'] = start
+    gaps['end'] = start + 2
+    gaps['mitigated_index'] = zone_mitigation(high, low, gaps['type'], gaps['top'], gaps['bottom'], gaps['end'] + 1)
+    gaps['mitigated'] = gaps['mitigated_index'] >= 0
+    return gaps
+
+
+def fvgs_to_dicts(gaps: np.ndarray, index: pd.Index) -> list:
+    """Convertit un tableau FVG_DTYPE en dictionnaires (type, top, bottom, timestamps, mitigated, mitigated_at)."""
+    return [{
+        "type": ZONE_TYPE_NAMES[gap_type],
+        "top": top,
+        "bottom": bottom,
+        "timestamp_start": timestamp_start,
+        "timestamp_end": timestamp_end,
+        "mitigated": mitigated_index >= 0,
+        "mitigated_at": mitigated_at
+    } for gap_type, top, bottom, timestamp_start, timestamp_end, mitigated_index, mitigated_at in zip(
+        gaps['type'].tolist(), gaps['top'].tolist(), gaps['bottom'].tolist(),
+        _timestamps(index, gaps['start']), _timestamps(index, gaps['end']),
+        gaps['mitigated_index'].tolist(), _timestamps(index, gaps['mitigated_index']))]
+
+
+def find_fvgs(data: pd.DataFrame, as_array: bool = False):
     """
     Identifie les Fair Value Gaps (FVG) / Imbalances dans les données.
-    (Version itérative robuste)
-    """
-    fvgs = [] 
-    
-    for i in range(1, len(data) - 1):
-        prev_candle = data.iloc[i-1]
-        # current_candle = data.iloc[i] # Non utilisé
-        next_candle = data.iloc[i+1]
-        
-        # Bullish FVG (Imbalance haussière)
-        if next_candle['low'] > prev_candle['high']:
-            fvgs.append({
-                "type": "BULLISH",
-                "top": next_candle['low'],
-                "bottom": prev_candle['high'],
-                "timestamp_start": data.index[i-1],
-                "timestamp_end": data.index[i+1],
-                "mitigated": False
-            })
-            
-        # Bearish FVG (Imbalance baissière)
-        if next_candle['high'] < prev_candle['low']:
-            fvgs.append({
-                "type": "BEARISH",
-                "top": prev_candle['low'],
-                "bottom": next_candle['high'],
-                "timestamp_start": data.index[i-1],
-                "timestamp_end": data.index[i+1],
-                "mitigated": False
-            })
-
-    return fvgs
-
-def find_order_blocks(data: pd.DataFrame, swing_highs: list, swing_lows: list):
+    (Enveloppe de find_fvg_array.)
+
+    Args:
+        data (pd.DataFrame): Bougies OHLC.
+        as_array (bool): Si True, renvoie directement le tableau FVG_DTYPE (positions de bougies)
+                         au lieu de la liste de dictionnaires.
+    """
+    gaps = find_fvg_array(np.asarray(data['high']), np.asarray(data['low']))
+    if as_array:
+        return gaps
+    return fvgs_to_dicts(gaps, data.index)
+
+# OB : direction, bornes, position de la bougie OB, position du swing d'origine,
+# position de la bougie qui l'a mitigé (-1 si non mitigé)
+OB_DTYPE = np.dtype([('type', 'i1'), ('top', 'f8'), ('bottom', 'f8'), ('position', 'i8'), ('swing', 'i8'),
+                     ('mitigated', '?'), ('mitigated_index', 'i8')])
+
+
+def find_order_block_array(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                           high_idx: np.ndarray, low_idx: np.ndarray) -> np.ndarray:
+    """
+    Identifie les Order Blocks (OB) à partir des positions des swings.
+
+    - OB baissier (swing high) : la bougie du swing si elle est haussière, sinon la précédente si elle l'est.
+    - OB haussier (swing low)  : la bougie du swing si elle est baissière, sinon la précédente si elle l'est.
+
+    Un OB est mitigé dès qu'une bougie postérieure au swing le traverse entièrement.
+
+    Returns:
+        np.ndarray: Tableau OB_DTYPE (OBs baissiers puis haussiers, dans l'ordre des swings).
+    """
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+
+    body = np.sign(close - open_) # +1 haussière, -1 baissière
+    prev_body = np.concatenate(([0.0], body[:-1])) # Pas de bougie précédente pour la première
+
+    parts = []
+    for zone_type, swing_idx, direction in ((ZONE_BEARISH, high_idx, 1.0), (ZONE_BULLISH, low_idx, -1.0)):
+        swing_idx = np.asarray(swing_idx, dtype=np.int64)
+        on_swing = body[swing_idx] == direction
+        on_prev = ~on_swing & (prev_body[swing_idx] == direction)
+        keep = on_swing | on_prev
+        swing_idx = swing_idx[keep]
+        position = swing_idx - on_prev[keep]
+
+        blocks = np.empty(len(swing_idx), dtype=OB_DTYPE)
+        blocks['type'] = zone_type
+        blocks['top'] = high[position]
+        blocks['bottom'] = low[position]
+        blocks['position'] = position
+        blocks['swing'] = swing_idx
+        parts.append(blocks)
+
+    blocks = np.concatenate(parts)
+    blocks['mitigated_index'] = zone_mitigation(high, low, blocks['type'], blocks['top'], blocks['bottom'], blocks['swing'] + 1)
+    blocks['mitigated'] = blocks['mitigated_index'] >= 0
+    return blocks
+
+
+def order_blocks_to_dicts(blocks: np.ndarray, index: pd.Index) -> list:
+    """Convertit un tableau OB_DTYPE en dictionnaires (type, top, bottom, timestamp, mitigated, mitigated_at)."""
+    return [{
+        "type": ZONE_TYPE_NAMES[block_type],
+        "top": top,
+        "bottom": bottom,
+        "timestamp": timestamp,
+        "mitigated": mitigated_index >= 0,
+        "mitigated_at": mitigated_at
+    } for block_type, top, bottom, timestamp, mitigated_index, mitigated_at in zip(
+        blocks['type'].tolist(), blocks['top'].tolist(), blocks['bottom'].tolist(),
+        _timestamps(index, blocks['position']), blocks['mitigated_index'].tolist(),
+        _timestamps(index, blocks['mitigated_index']))]
+
+
+def find_order_blocks(data: pd.DataFrame, swing_highs: list, swing_lows: list, as_array: bool = False):
     """
     Identifie les Order Blocks (OB) basés sur les points de swing.
+    (Enveloppe de find_order_block_array : les swings absents de 'data' sont ignorés.)
+
+    Args:
+        data (pd.DataFrame): Bougies OHLC.
+        swing_highs (list): Liste de tuples (index, prix) des swing highs.
+        swing_lows (list): Liste de tuples (index, prix) des swing lows.
+        as_array (bool): Si True, renvoie directement le tableau OB_DTYPE.
     """
-    order_blocks = []
-    
-    # Détection Bearish OB (basée sur les Swing Highs)
-    for sh_time, sh_price in swing_highs:
-        try:
-            sh_index = data.index.get_loc(sh_time)
-            
-            candle = data.iloc[sh_index]
-            target_candle = None # Initialisation
-            
-            if candle['close'] > candle['open']: # Bougie haussière
-                target_candle = candle
-            else:
-                if sh_index > 0:
-                    prev_candle = data.iloc[sh_index - 1]
-                    if prev_candle['close'] > prev_candle['open']:
-                        target_candle = prev_candle
-                else:
-                    continue
-                
-            if target_candle is not None:
-                order_blocks.append({
-                    "type": "BEARISH",
-                    "top": target_candle['high'],
-                    "bottom": target_candle['low'],
-                    "timestamp": target_candle.name,
-                    "mitigated": False
-                })
-        except (KeyError, IndexError):
-            continue
-
-    # Détection Bullish OB (basée sur les Swing Lows)
-    for sl_time, sl_price in swing_lows:
-        try:
-            sl_index = data.index.get_loc(sl_time)
-            
-            candle = data.iloc[sl_index]
-            target_candle = None # Initialisation
-            
-            if candle['close'] < candle['open']: # Bougie baissière
-                target_candle = candle
-            else:
-                if sl_index > 0:
-                    prev_candle = data.iloc[sl_index - 1]
-                    if prev_candle['close'] < prev_candle['open']:
-                        target_candle = prev_candle
-                else:
-                    continue
-
-            if target_candle is not None:
-                order_blocks.append({
-                    "type": "BULLISH",
-                    "top": target_candle['high'],
-                    "bottom": target_candle['low'],
-                    "timestamp": target_candle.name,
-                    "mitigated": False
-                })
-        except (KeyError, IndexError):
-            continue
-
-    return order_blocks
\ No newline at end of file
+    high_idx = _locate(data.index, [t for t, _ in swing_highs])
+    low_idx = _locate(data.index, [t for t, _ in swing_lows])
+    blocks = find_order_block_array(
+        np.asarray(data['open']), np.asarray(data['high']), np.asarray(data['low']), np.asarray(data['close']),
+        high_idx[high_idx >= 0], low_idx[low_idx >= 0]
+    )
+    if as_array:
+        return blocks
+    return order_blocks_to_dicts(blocks, data.index)
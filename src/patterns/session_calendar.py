@@ -0,0 +1,114 @@
+# Fichier: src/patterns/session_calendar.py
+"""
+Calendrier des sessions de trading (Asia, London, NY...).
+
+Une session est définie par une heure de début et de fin dans un fuseau horaire.
+Ses bornes UTC (secondes) sont calculées une seule fois par jour et par fuseau
+(changements d'heure compris), puis les bougies de la session se trouvent par
+recherche binaire sur les timestamps : le range devient une simple réduction
+d'une tranche de tableau.
+
+Les sessions qui chevauchent minuit (ex: 22:00 - 06:00) sont rattachées au jour
+où elles se terminent.
+
+Version: 1.0
+"""
+
+__version__ = "1.0"
+
+import logging
+import threading
+import pandas as pd
+import pytz
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def index_to_utc_seconds(index: pd.DatetimeIndex):
+    """Timestamps d'un DatetimeIndex en secondes UTC (int64). Index naïf = UTC."""
+    return index.as_unit('s').asi8
+
+
+class SessionCalendar:
+    """
+    Bornes UTC d'une session quotidienne [start_hour, end_hour] (bornes incluses) dans un fuseau donné.
+    """
+
+    def __init__(self, start_hour: int, end_hour: int, timezone: str = 'Etc/UTC'):
+        try:
+            self.tz = pytz.timezone(timezone)
+        except pytz.UnknownTimeZoneError:
+            logger.warning(f"Fuseau horaire '{timezone}' inconnu. Utilisation de 'Etc/UTC'.")
+            self.tz = pytz.timezone('Etc/UTC')
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.crosses_midnight = start_hour >= end_hour
+        self._bounds: Dict[date, Tuple[int, int]] = {}
+
+    def _local_to_utc_seconds(self, day: date, hour: int) -> int:
+        local = pd.Timestamp(datetime.combine(day, time(hour, 0)))
+        return int(local.tz_localize(self.tz, ambiguous=True, nonexistent='shift_forward').timestamp())
+
+    def bounds(self, session_date: date) -> Tuple[int, int]:
+        """Bornes UTC (secondes) de la session qui se termine le jour local 'session_date'."""
+        cached = self._bounds.get(session_date)
+        if cached is None:
+            start_day = session_date - timedelta(days=1) if self.crosses_midnight else session_date
+            cached = (self._local_to_utc_seconds(start_day, self.start_hour),
+                      self._local_to_utc_seconds(session_date, self.end_hour))
+            self._bounds[session_date] = cached
+        return cached
+
+    def local_date(self, utc_seconds: int) -> date:
+        """Jour local correspondant à un timestamp UTC."""
+        return datetime.fromtimestamp(utc_seconds, tz=pytz.utc).astimezone(self.tz).date()
+
+    def latest_session(self, last_time: int) -> Optional[Tuple[int, int]]:
+        """
+        Bornes UTC de la dernière session commencée qui touche le jour local de 'last_time'.
+        None si la session du jour n'a pas encore commencé.
+        """
+        day = self.local_date(last_time)
+        if self.crosses_midnight:
+            # Session commencée ce soir (se termine demain) ?
+            upcoming = self.bounds(day + timedelta(days=1))
+            if upcoming[0] <= last_time:
+                return upcoming
+        current = self.bounds(day)
+        return current if current[0] <= last_time else None
+
+
+# --- Registres (calendriers par définition de session, ranges terminés par clé) ---
+_calendars: Dict[Tuple[int, int, str], SessionCalendar] = {}
+_completed_ranges: Dict[tuple, Tuple[Tuple[int, int], dict]] = {}
+_lock = threading.Lock()
+
+
+def get_session_calendar(start_hour: int, end_hour: int, timezone: str = 'Etc/UTC') -> SessionCalendar:
+    """Renvoie le calendrier partagé d'une session (créé au premier appel)."""
+    key = (start_hour, end_hour, timezone)
+    calendar = _calendars.get(key)
+    if calendar is None:
+        with _lock:
+            calendar = _calendars.setdefault(key, SessionCalendar(start_hour, end_hour, timezone))
+    return calendar
+
+
+def get_completed_range(cache_key, calendar: SessionCalendar, bounds: Tuple[int, int]) -> Optional[dict]:
+    """Range déjà calculé pour une session terminée (ou None)."""
+    cached = _completed_ranges.get((cache_key, calendar.start_hour, calendar.end_hour, calendar.tz.zone))
+    if cached is not None and cached[0] == bounds:
+        return cached[1]
+    return None
+
+
+def store_completed_range(cache_key, calendar: SessionCalendar, bounds: Tuple[int, int], session_range: dict):
+    """Mémorise le range d'une session terminée (une entrée par clé et par session)."""
+    _completed_ranges[(cache_key, calendar.start_hour, calendar.end_hour, calendar.tz.zone)] = (bounds, session_range)
+
+
+def clear_session_cache():
+    """Oublie les ranges de session mémorisés."""
+    _completed_ranges.clear()
@@ -0,0 +1,134 @@
+# Fichier: src/patterns/zone_index.py
+"""
+Index d'intervalles de prix pour les zones (POI : OB, FVG, ranges...).
+
+Les zones sont conservées triées par bas (bottom) et par haut (top). Les requêtes
+« quelles zones contiennent le prix p » et « zone la plus proche au-dessus / en dessous »
+se font par recherche binaire ; le maximum cumulé des tops (dans l'ordre des bottoms)
+borne le parcours aux seules zones candidates. Les zones s'ajoutent et se retirent
+(ex: une fois mitigées) sans reconstruire l'index.
+
+    index = ZoneIndex.from_zones(valid_pois)
+    active = index.containing(current_price)
+
+Version: 1.0
+"""
+
+__version__ = "1.0"
+
+import bisect
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ZoneIndex:
+    """
+    Ensemble de zones [bottom, top] avec recherche logarithmique par prix.
+
+    Chaque zone reçoit un identifiant croissant : les résultats multiples sont
+    renvoyés dans l'ordre d'insertion.
+    """
+
+    def __init__(self):
+        self._zones: Dict[int, Tuple[float, float, Any]] = {} # id -> (bottom, top, payload)
+        self._by_bottom: List[Tuple[float, int]] = []
+        self._by_top: List[Tuple[float, int]] = []
+        self._next_id = 0
+        # Cache paresseux : tops dans l'ordre des bottoms et leur maximum cumulé
+        self._tops: Optional[np.ndarray] = None
+        self._prefix_max_top: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_zones(cls, zones: list) -> 'ZoneIndex':
+        """Construit un index à partir de dictionnaires de zones (clés 'bottom' et 'top')."""
+        index = cls()
+        for zone in zones:
+            index.add(zone['bottom'], zone['top'], zone)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._zones)
+
+    def __contains__(self, zone_id: int) -> bool:
+        return zone_id in self._zones
+
+    def get(self, zone_id: int) -> Any:
+        """Renvoie le payload d'une zone."""
+        return self._zones[zone_id][2]
+
+    # --- Mise à jour ---
+
+    def add(self, bottom: float, top: float, payload: Any = None) -> int:
+        """
+        Ajoute une zone. Les bornes sont réordonnées si nécessaire.
+
+        Returns:
+            int: L'identifiant de la zone (à utiliser pour remove).
+        """
+        bottom, top = (float(bottom), float(top)) if bottom <= top else (float(top), float(bottom))
+        zone_id = self._next_id
+        self._next_id += 1
+        self._zones[zone_id] = (bottom, top, payload)
+        bisect.insort(self._by_bottom, (bottom, zone_id))
+        bisect.insort(self._by_top, (top, zone_id))
+        self._tops = None
+        return zone_id
+
+    def remove(self, zone_id: int) -> bool:
+        """Retire une zone (ex: mitigée). Renvoie False si l'identifiant est inconnu."""
+        zone = self._zones.pop(zone_id, None)
+        if zone is None:
+            return False
+        bottom, top, _ = zone
+        del self._by_bottom[bisect.bisect_left(self._by_bottom, (bottom, zone_id))]
+        del self._by_top[bisect.bisect_left(self._by_top, (top, zone_id))]
+        self._tops = None
+        return True
+
+    def clear(self):
+        """Retire toutes les zones."""
+        self._zones.clear()
+        self._by_bottom.clear()
+        self._by_top.clear()
+        self._tops = None
+
+    # --- Requêtes ---
+
+    def _ensure_arrays(self):
+        if self._tops is None:
+            zones = self._zones
+            self._tops = np.array([zones[zone_id][1] for _, zone_id in self._by_bottom], dtype=np.float64)
+            self._prefix_max_top = np.maximum.accumulate(self._tops) if len(self._tops) else self._tops
+
+    def containing_ids(self, price: float) -> List[int]:
+        """Identifiants des zones telles que bottom <= price <= top, dans l'ordre d'insertion."""
+        # Zones dont le bottom est <= price : préfixe [0, end) de l'ordre par bottom
+        end = bisect.bisect_right(self._by_bottom, (price, float('inf')))
+        if end == 0:
+            return []
+        self._ensure_arrays()
+        # Avant 'begin', le max cumulé des tops est < price : aucune zone ne peut contenir le prix
+        begin = int(np.searchsorted(self._prefix_max_top[:end], price, side='left'))
+        if begin >= end:
+            return []
+        hits = begin + np.flatnonzero(self._tops[begin:end] >= price)
+        return sorted(self._by_bottom[i][1] for i in hits.tolist())
+
+    def containing(self, price: float) -> list:
+        """Payloads des zones contenant le prix, dans l'ordre d'insertion."""
+        return [self._zones[zone_id][2] for zone_id in self.containing_ids(price)]
+
+    def first_containing(self, price: float) -> Any:
+        """Première zone (ordre d'insertion) contenant le prix, ou None."""
+        ids = self.containing_ids(price)
+        return self._zones[ids[0]][2] if ids else None
+
+    def nearest_above(self, price: float) -> Any:
+        """Zone entièrement au-dessus du prix dont le bottom est le plus proche, ou None."""
+        i = bisect.bisect_right(self._by_bottom, (price, float('inf')))
+        return self._zones[self._by_bottom[i][1]][2] if i < len(self._by_bottom) else None
+
+    def nearest_below(self, price: float) -> Any:
+        """Zone entièrement en dessous du prix dont le top est le plus proche, ou None."""
+        i = bisect.bisect_left(self._by_top, (price, -1))
+        return self._zones[self._by_top[i - 1][1]][2] if i > 0 else None
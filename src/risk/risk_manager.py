@@ -1,17 +1,22 @@
 """
 Fichier: src/risk/risk_manager.py
-Version: 2.0
+Version: 2.1
 
 Module pour la gestion des risques.
 
 Ce module fournit des fonctions pour :
 - Initialiser le module avec une connexion MT5.
 - Calculer la taille de lot basée sur le risque en pourcentage et le prix du Stop Loss.
+
+Les prix (bid/ask) proviennent du cache de tick_stream (flux de ticks ou dernier
+symbol_info_tick récent) plutôt que d'un appel au terminal à chaque calcul.
 """
 
 import MetaTrader5 as mt5
 import logging
 
+from src.data_ingest import tick_stream
+
 logger = logging.getLogger(__name__)
 
 # Variable globale pour stocker la connexion MT5
@@ -52,7 +57,7 @@ def get_symbol_tick(symbol):
         logger.error("Risk Manager non initialisé.")
         return None
     try:
-        tick = _mt5_connector.mt5.symbol_info_tick(symbol)
+        tick = tick_stream.get_tick(symbol)
         if tick:
             return tick
         else:
@@ -119,14 +124,14 @@ def calculate_lot_size(risk_percent, sl_price, symbol=None):
     if account_currency != symbol_currency_profit:
         # Tenter de trouver le taux de conversion
         pair_name = f"{symbol_currency_profit}{account_currency}"
-        pair_tick = _mt5_connector.mt5.symbol_info_tick(pair_name)
+        pair_tick = tick_stream.get_tick(pair_name)
         
         if pair_tick:
             conversion_rate = pair_tick.bid # Combien de devise de compte pour 1 de devise de profit
         else:
             # Tenter l'inverse
             pair_name_inv = f"{account_currency}{symbol_currency_profit}"
-            pair_tick_inv = _mt5_connector.mt5.symbol_info_tick(pair_name_inv)
+            pair_tick_inv = tick_stream.get_tick(pair_name_inv)
             if pair_tick_inv and pair_tick_inv.ask > 0:
                 conversion_rate = 1.0 / pair_tick_inv.ask
             else:
@@ -1,6 +1,6 @@
 """
 Fichier: src/shared_state.py
-Version: 2.0
+Version: 2.1
 
 État partagé global pour le bot, accessible par tous les threads
 (API Flask, Boucle principale du bot).
@@ -15,6 +15,7 @@ _STATUS = {"status": "INITIALIZING", "message": "Bot starting..."}
 _LOGS = []
 _POSITIONS = []
 _SYMBOL_DATA = {}
+_LOG_SINK = None # Relais optionnel des logs (ex: processus worker -> coordinateur)
 _lock = threading.Lock()
 
 def is_bot_running():
@@ -53,6 +54,15 @@ def add_log(log_message):
         _LOGS.append(log_message)
         if len(_LOGS) > 100: # Limiter à 100 logs
             _LOGS.pop(0)
+        sink = _LOG_SINK
+    if sink is not None:
+        sink(log_message)
+
+def set_log_sink(sink):
+    """Définit une fonction appelée pour chaque log ajouté (None pour désactiver)."""
+    global _LOG_SINK
+    with _lock:
+        _LOG_SINK = sink
 
 def update_positions(positions_list):
     """Met à jour la liste des positions ouvertes pour l'API."""
@@ -0,0 +1,87 @@
+# Fichier: src/strategy/analysis_context.py
+"""
+Contexte d'analyse mémoïsé (par symbole / timeframe).
+
+Les résultats coûteux d'un cycle (swings, structure, POIs, zones de Fibonacci...)
+sont mémorisés sous une clé (symbole, timeframe, nom, état des bougies, paramètres).
+L'état des bougies se résume à la dernière bougie clôturée, au plus haut / plus bas
+de la bougie en formation et à la fenêtre chargée : tant qu'aucun de ces éléments
+ne change (ex: une bougie H4 entre deux cycles de 60s), l'analyse est une simple
+lecture de dictionnaire. Les entrées les moins récemment utilisées sont évincées (LRU).
+
+Version: 1.1
+"""
+
+__version__ = "1.1"
+
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from src.data_ingest.bar_frame import BarFrame
+
+logger = logging.getLogger(__name__)
+
+
+def bar_state_key(data) -> tuple:
+    """
+    Résumé de l'état d'une fenêtre de bougies (DataFrame ou BarFrame) : taille, première
+    bougie, dernière bougie clôturée, et plus haut / plus bas de la bougie en formation.
+    """
+    # BarFrame : horodatages en secondes, sans passer par un DatetimeIndex
+    index = data.time if isinstance(data, BarFrame) else data.index
+    if len(index) == 0:
+        return (0,)
+    last_closed = index[-2] if len(index) > 1 else None
+    return (len(index), index[0], last_closed, float(np.asarray(data['high'])[-1]), float(np.asarray(data['low'])[-1]))
+
+
+class AnalysisContext:
+    """
+    Cache LRU des analyses, partagé entre les cycles (et les threads).
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, symbol: str, timeframe: str, data, name: str, params: Hashable,
+            compute: Callable[[], Any]) -> Any:
+        """
+        Renvoie le résultat mémorisé de 'name' pour cet état de bougies et ces paramètres,
+        ou le calcule (compute()) et le mémorise.
+        Les résultats sont partagés : l'appelant ne doit pas les modifier.
+        """
+        key = (symbol, timeframe, name, bar_state_key(data), params)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute() # Hors verrou : les calculs de symboles différents restent parallèles
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self, symbol: Optional[str] = None):
+        """Vide le cache (entièrement, ou pour un seul symbole)."""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == symbol]:
+                    del self._entries[key]
@@ -3,11 +3,12 @@
 Module de Stratégie SMC (Smart Money Concepts).
 
 Contient la logique de détection pour les Modèles M1, M2 et M3.
+Les bougies peuvent être fournies en DataFrame pandas ou en BarFrame (colonnes NumPy).
 
-Version: 2.0
+Version: 3.0
 """
 
-__version__ = "2.0"
+__version__ = "3.0"
 
 import logging
 import pandas as pd
@@ -17,9 +18,34 @@ from typing import Dict, Any, Tuple, Optional, List
 # Importation de nos modules personnalisés
 from src.analysis import market_structure as structure
 from src.patterns import pattern_detector as patterns
+from src.patterns.zone_index import ZoneIndex
+from src.strategy.analysis_context import AnalysisContext
 
 logger = logging.getLogger(__name__)
 
+# Contexte d'analyse mémoïsé entre les cycles (None = désactivé)
+_analysis_context: Optional[AnalysisContext] = AnalysisContext()
+
+def configure_analysis_cache(enabled: bool = True, max_entries: int = 1024):
+    """Active/désactive la mémoïsation des analyses (swings, structure, POIs) entre les cycles."""
+    global _analysis_context
+    _analysis_context = AnalysisContext(max_entries) if enabled else None
+
+def reset_symbol_state(symbol: str):
+    """
+    Oublie tout l'état conservé entre les cycles pour 'symbol' : structure incrémentale
+    (strategy.streaming_structure) et analyses mémoïsées.
+    """
+    structure.drop_structure_states(symbol)
+    if _analysis_context is not None:
+        _analysis_context.clear(symbol)
+
+def _memoize(symbol: Optional[str], timeframe: str, data: pd.DataFrame, name: str, params, compute):
+    """Résultat mémorisé (si le cache est actif et le symbole connu), sinon calcul direct."""
+    if _analysis_context is None or not symbol:
+        return compute()
+    return _analysis_context.get(symbol, timeframe, data, name, params, compute)
+
 # --- Logique de base SMC (Fibonacci) ---
 def _get_fibonacci_zones(start_price: float, end_price: float) -> Optional[Dict[str, float]]:
     """
@@ -136,7 +162,8 @@ def _check_model_1_confirmation(
     ltf_swings_high: list,
     ltf_swings_low: list,
     current_price: float,
-    config: dict
+    config: dict,
+    symbol: Optional[str] = None
 ) -> Tuple[Optional[str], Optional[str], Optional[float], Optional[float]]:
     """
     Vérifie le "Modèle 1: Confirmation HTF POI + LTF CHOCH".
@@ -144,19 +171,23 @@ def _check_model_1_confirmation(
     strategy_params = config['strategy']
     
     # --- Étape 3 (M1): Identifier les POI HTF valides (Filtrés P/D) ---
-    valid_htf_pois = _find_valid_htf_pois(htf_data, htf_swings_high, htf_swings_low, htf_trend)
+    # (mémoïsés avec leur index tant que les bougies HTF ne changent pas)
+    def _compute_pois():
+        pois = _find_valid_htf_pois(htf_data, htf_swings_high, htf_swings_low, htf_trend)
+        return pois, ZoneIndex.from_zones(pois)
+
+    valid_htf_pois, poi_index = _memoize(
+        symbol, strategy_params['htf_timeframe'], htf_data, 'htf_pois',
+        (htf_trend, strategy_params.get('htf_swing_order', 10), strategy_params.get('streaming_structure', False)),
+        _compute_pois
+    )
     if not valid_htf_pois:
         logger.debug("[M1] Aucun POI HTF valide trouvé. En attente...")
         return None, None, None, None
 
     # --- Étape 4 (M1): Vérifier si le prix est dans une zone HTF POI ---
-    is_in_htf_poi = False
-    active_htf_poi = None
-    for poi in valid_htf_pois:
-        if (current_price <= poi['top']) and (current_price >= poi['bottom']):
-            is_in_htf_poi = True
-            active_htf_poi = poi
-            break
+    active_htf_poi = poi_index.first_containing(current_price)
+    is_in_htf_poi = active_htf_poi is not None
     
     if not is_in_htf_poi:
         logger.debug(f"[M1] Le prix n'est pas dans une zone POI HTF. En attente...")
@@ -203,10 +234,12 @@ def _check_model_2_inducement(
     current_low: float,
     current_high: float,
     config: dict,
-    pip_size: float # Argument requis
+    pip_size: float, # Argument requis
+    session_cache_key=None
 ) -> Tuple[Optional[str], Optional[str], Optional[float], Optional[float]]:
     """
     Vérifie le "Modèle 2: Inducement (Sweep) + Confirmation CHOCH".
+    'session_cache_key' (ex: (symbole, timeframe)) permet de réutiliser le range de session terminé.
     """
     strategy_params = config['strategy']
     
@@ -219,7 +252,8 @@ def _check_model_2_inducement(
             ltf_data, 
             session_start_hour=strategy_params.get('asia_start_hour', 0),
             session_end_hour=strategy_params.get('asia_end_hour', 8),
-            timezone=strategy_params.get('session_timezone', 'Etc/UTC')
+            timezone=strategy_params.get('session_timezone', 'Etc/UTC'),
+            cache_key=session_cache_key
         )
         if asia_range:
             ltf_liquidity_zones.append({"type": "ASIA_LOW", "level": asia_range['low']})
@@ -227,17 +261,23 @@ def _check_model_2_inducement(
     except Exception as e:
         logger.warning(f"[M2] Erreur lors de la détection du range de session: {e}")
 
-    # 1b. Equal Highs/Lows (EQL)
-    eql_zones = patterns.find_equal_highs_lows(
-        ltf_data, 
-        lookback=strategy_params.get('liquidity_lookback', 50),
+    # 1b. Equal Highs/Lows (EQH/EQL) : pools de swings LTF récents
+    # (avec 'liquidity_skip_taken', les pools déjà pris avant la bougie courante sont ignorés)
+    liquidity_pools = patterns.find_liquidity_pools(
+        ltf_data, ltf_swings_high, ltf_swings_low,
         tolerance_pips=strategy_params.get('liquidity_tolerance_pips', 5),
-        pip_size=pip_size # Utilise l'argument
+        pip_size=pip_size, # Utilise l'argument
+        min_touches=strategy_params.get('liquidity_min_touches', 2),
+        lookback=strategy_params.get('liquidity_lookback', 50)
     )
-    for eql in eql_zones['equal_lows']:
-        ltf_liquidity_zones.append({"type": "EQL", "level": eql['level']})
-    for eqh in eql_zones['equal_highs']:
-        ltf_liquidity_zones.append({"type": "EQH", "level": eqh['level']})
+    skip_taken = strategy_params.get('liquidity_skip_taken', False)
+    current_index = len(ltf_data) - 1
+    for eql in liquidity_pools['equal_lows']:
+        if not skip_taken or eql['taken_index'] in (-1, current_index):
+            ltf_liquidity_zones.append({"type": "EQL", "level": eql['level'], "touches": eql['touches']})
+    for eqh in liquidity_pools['equal_highs']:
+        if not skip_taken or eqh['taken_index'] in (-1, current_index):
+            ltf_liquidity_zones.append({"type": "EQH", "level": eqh['level'], "touches": eqh['touches']})
 
     if not ltf_liquidity_zones:
         logger.debug("[M2] Aucune zone de liquidité LTF trouvée.")
@@ -295,11 +335,49 @@ def _check_model_2_inducement(
     return None, None, None, None
 
 
+# --- ANALYSE DE STRUCTURE (lot ou incrémentale) ---
+def _analyse_structure(data: pd.DataFrame, order: int, symbol: Optional[str], timeframe: str, streaming: bool,
+                       closed_only: bool = True):
+    """
+    Calcule swings + structure pour une timeframe.
+
+    En mode 'streaming' (et si le symbole est connu), utilise l'état persistant du
+    (symbole, timeframe) : seules les bougies clôturées nouvelles sont analysées
+    ('closed_only' : la dernière ligne est une bougie en formation, ignorée).
+
+    Le résultat est mémoïsé tant que l'état des bougies ne change pas (voir AnalysisContext).
+
+    Returns:
+        tuple: (swings_high, swings_low, events, trend)
+    """
+    def _compute():
+        if streaming and symbol:
+            state = structure.get_structure_state(symbol, timeframe, order)
+            state.update(data, closed_only=closed_only)
+            # Copies : l'état continue d'évoluer alors que le résultat peut être mémoïsé
+            return list(state.swing_highs), list(state.swing_lows), list(state.events), state.trend
+
+        points = structure.find_swing_points(np.asarray(data['high']), np.asarray(data['low']), order=order)
+        swings_high, swings_low = structure.swing_points_to_tuples(data.index, points)
+        event_array, trend = structure.identify_structure_arrays(points)
+        return swings_high, swings_low, structure.structure_events_to_dicts(event_array, data.index), trend
+
+    return _memoize(symbol, timeframe, data, 'structure', (order, streaming, closed_only), _compute)
+
+
 # --- ORCHESTRATEUR DE SIGNAUX (M1 & M2) ---
-def check_all_smc_signals(mtf_data: dict, config: dict, pip_size: float): 
+def check_all_smc_signals(mtf_data: dict, config: dict, pip_size: float, symbol: Optional[str] = None,
+                          sweep_range: Optional[Tuple[float, float]] = None, closed_only: bool = True):
     """
     Orchestre la vérification de tous les modèles de signaux SMC (M1, M2).
     Elle appelle chaque modèle en séquence jusqu'à ce qu'un signal soit trouvé.
+
+    'symbol' permet de conserver un état de structure persistant par symbole
+    (option 'strategy.streaming_structure') et de mémoïser les analyses entre les cycles.
+    'sweep_range' (plus bas, plus haut) remplace les extrêmes de la dernière bougie LTF
+    pour le test de sweep du Modèle 2 (ex: bougie tout juste clôturée, mèche vue dans les ticks).
+    'closed_only=False' : toutes les bougies reçues sont clôturées (backtest) ; la structure
+    incrémentale les consomme toutes, comme l'analyse par lot.
     """
     
     try:
@@ -315,15 +393,18 @@ def check_all_smc_signals(mtf_data: dict, config: dict, pip_size: float):
             logger.warning(f"Données manquantes pour {htf_tf} or {ltf_tf}. Signal ignoré.")
             return None, None, None, None
 
-        current_low = ltf_data['low'].iloc[-1]
-        current_high = ltf_data['high'].iloc[-1]
-        current_price = ltf_data['close'].iloc[-1]
+        current_low = np.asarray(ltf_data['low'])[-1]
+        current_high = np.asarray(ltf_data['high'])[-1]
+        if sweep_range is not None:
+            current_low, current_high = sweep_range
+        current_price = np.asarray(ltf_data['close'])[-1]
         
+        streaming = strategy_params.get('streaming_structure', False)
+
         # --- Étape 2: Analyse HTF (Commune à tous les modèles) ---
-        htf_swings_high, htf_swings_low = structure.find_swing_highs_lows(
-            htf_data, order=strategy_params.get('htf_swing_order', 10) 
+        htf_swings_high, htf_swings_low, _htf_events, htf_trend = _analyse_structure(
+            htf_data, strategy_params.get('htf_swing_order', 10), symbol, htf_tf, streaming, closed_only
         )
-        _htf_events, htf_trend = structure.identify_structure(htf_swings_high, htf_swings_low)
         
         if htf_trend not in ["BULLISH", "BEARISH"]:
             logger.info(f"Tendance HTF ({htf_tf}) non claire ({htf_trend}). Pas de signal.")
@@ -332,10 +413,9 @@ def check_all_smc_signals(mtf_data: dict, config: dict, pip_size: float):
         logger.info(f"Tendance HTF ({htf_tf}) confirmée : {htf_trend}")
 
         # --- Étape 3: Analyse LTF (Commune à tous les modèles) ---
-        ltf_swings_high, ltf_swings_low = structure.find_swing_highs_lows(
-            ltf_data, order=strategy_params.get('ltf_swing_order', 5) 
+        ltf_swings_high, ltf_swings_low, ltf_events, ltf_trend = _analyse_structure(
+            ltf_data, strategy_params.get('ltf_swing_order', 5), symbol, ltf_tf, streaming, closed_only
         )
-        ltf_events, ltf_trend = structure.identify_structure(ltf_swings_high, ltf_swings_low)
 
         if not ltf_swings_high or not ltf_swings_low:
              logger.info("Pas assez de points de structure LTF. En attente...")
@@ -346,7 +426,8 @@ def check_all_smc_signals(mtf_data: dict, config: dict, pip_size: float):
         # 4a. Vérifier Modèle 1 (Confirmation POI)
         signal_m1 = _check_model_1_confirmation(
             htf_trend, htf_data, ltf_data, htf_swings_high, htf_swings_low,
-            ltf_events, ltf_swings_high, ltf_swings_low, current_price, config
+            ltf_events, ltf_swings_high, ltf_swings_low, current_price, config,
+            symbol=symbol
         )
         if signal_m1[0]:
             return signal_m1 # Signal trouvé !
@@ -355,7 +436,8 @@ def check_all_smc_signals(mtf_data: dict, config: dict, pip_size: float):
         signal_m2 = _check_model_2_inducement(
             htf_trend, ltf_data, ltf_events, ltf_swings_high, ltf_swings_low,
             current_low, current_high, config,
-            pip_size # Passage de l'argument
+            pip_size, # Passage de l'argument
+            session_cache_key=(symbol, ltf_tf) if symbol else None
         )
         if signal_m2[0]:
             return signal_m2 # Signal trouvé !
@@ -395,9 +477,9 @@ def check_model_3_opening_range(
              logger.debug("[M3] Pas assez de bougies de range pour analyse.")
              return None, None, None, None
              
-        range_candle = opening_range_data.iloc[-2] # L'avant-dernière, la dernière est en cours
-        range_high = range_candle['high']
-        range_low = range_candle['low']
+        # L'avant-dernière bougie, la dernière est en cours
+        range_high = np.asarray(opening_range_data['high'])[-2]
+        range_low = np.asarray(opening_range_data['low'])[-2]
         logger.info(f"[M3] Range {opening_range_tf_str} défini: H={range_high}, L={range_low}")
         
         # 2. Vérifier le Breakout sur la dernière bougie d'entrée
@@ -405,30 +487,30 @@ def check_model_3_opening_range(
             logger.debug("[M3] Pas assez de bougies d'entrée pour analyse.")
             return None, None, None, None
         
-        breakout_candle = entry_tf_data.iloc[-2] # L'avant-dernière, pour être sûr qu'elle est clôturée
+        breakout_close = np.asarray(entry_tf_data['close'])[-2] # L'avant-dernière, pour être sûr qu'elle est clôturée
         
-        is_bullish_breakout = breakout_candle['close'] > range_high
-        is_bearish_breakout = breakout_candle['close'] < range_low
+        is_bullish_breakout = breakout_close > range_high
+        is_bearish_breakout = breakout_close < range_low
         
         if not is_bullish_breakout and not is_bearish_breakout:
             logger.debug("[M3] Pas de clôture de breakout M5/M1 pour le moment.")
             return None, None, None, None
 
         # 3. Confirmer avec Imbalance (FVG)
-        recent_entry_data = entry_tf_data.iloc[-5:]
-        all_fvgs = patterns.find_fvgs(recent_entry_data)
+        recent_entry_data = entry_tf_data.tail(5)
+        all_fvgs = patterns.find_fvgs(recent_entry_data, as_array=True)
         
-        if not all_fvgs:
+        if not len(all_fvgs):
             logger.info("[M3] Breakout détecté, mais PAS d'Imbalance (FVG) de confirmation.")
             return None, None, None, None
 
-        last_fvg = all_fvgs[-1]
+        last_fvg_type = all_fvgs['type'][-1]
         
         # 4. Générer le Signal
-        if is_bullish_breakout and last_fvg['type'] == 'BULLISH':
+        if is_bullish_breakout and last_fvg_type == patterns.ZONE_BULLISH:
             logger.info("[M3] Breakout Haussier CONFIRMÉ avec FVG Haussier.")
             
-            entry_price = breakout_candle['close']
+            entry_price = breakout_close
             sl_price = range_low # SL de l'autre côté du range
             
             risk_pips = (entry_price - sl_price) / pip_size
@@ -440,10 +522,10 @@ def check_model_3_opening_range(
             logger.warning(f"SIGNAL TROUVÉ: {reason}")
             return "BUY", reason, sl_price, tp_price
 
-        elif is_bearish_breakout and last_fvg['type'] == 'BEARISH':
+        elif is_bearish_breakout and last_fvg_type == patterns.ZONE_BEARISH:
             logger.info("[M3] Breakout Baissier CONFIRMÉ avec FVG Baissier.")
 
-            entry_price = breakout_candle['close']
+            entry_price = breakout_close
             sl_price = range_high # SL de l'autre côté du range
 
             risk_pips = (sl_price - entry_price) / pip_size
@@ -0,0 +1,72 @@
+# Fichier: tests/test_backtester.py
+"""
+Backtester hors ligne (simulateur MT5, historique synthétique dans un BarStore) :
+deux runs successifs dans le même processus doivent produire le même rapport.
+"""
+
+import copy
+from pathlib import Path
+
+import numpy as np
+import pytest
+import yaml
+
+from src.data_ingest import mt5_simulator
+
+# Avant tout import de MetaTrader5 par les modules du bot
+mt5_simulator.install({})
+
+from src.backtest.backtester import Backtester
+from src.data_ingest.bar_store import BarStore, BAR_DTYPE
+from src.data_ingest.resampler import resample_rates
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / 'config.yaml'
+
+
+def _synthetic_rates(start: str, days: int, seed: int) -> np.ndarray:
+    """Bougies M15 (jours ouvrés) d'une marche aléatoire à queues épaisses."""
+    rng = np.random.default_rng(seed)
+    t0 = int(np.datetime64(start, 's').astype(np.int64))
+    times = t0 + np.arange(days * 96, dtype=np.int64) * 900
+    times = times[((times // 86400) + 4) % 7 < 5]
+    n = len(times)
+    close = 1.10 * np.exp(np.cumsum(rng.standard_t(4, n) * 0.0006 + 0.00015 * np.sin(np.arange(n) / 800)))
+    open_ = np.r_[1.10, close[:-1]]
+    rates = np.zeros(n, dtype=BAR_DTYPE)
+    rates['time'] = times
+    rates['open'] = open_
+    rates['close'] = close
+    rates['high'] = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0003, n)))
+    rates['low'] = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0003, n)))
+    rates['tick_volume'] = 100
+    return rates
+
+
+@pytest.fixture(scope='module')
+def bar_store_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('bars')
+    rates = _synthetic_rates('2024-01-01', 150, seed=7)
+    store = BarStore(str(path))
+    store.write('EURUSD', 'M15', rates)
+    store.write('EURUSD', 'H4', resample_rates(rates, 14400))
+    return str(path)
+
+
+@pytest.fixture
+def config(bar_store_dir, monkeypatch):
+    # Pas de terminal : l'historique vient uniquement du BarStore
+    monkeypatch.setattr(mt5_simulator, 'initialize', lambda *args, **kwargs: False)
+    with open(CONFIG_PATH, 'r') as f:
+        config = yaml.safe_load(f)
+    config['backtest_settings']['bar_store_dir'] = bar_store_dir
+    return config
+
+
+@pytest.mark.parametrize('streaming_structure', [False, True])
+def test_sequential_runs_return_identical_reports(config, streaming_structure):
+    config = copy.deepcopy(config)
+    config['strategy']['streaming_structure'] = streaming_structure
+    reports = [Backtester(config, 'EURUSD', '2024-02-01', '2024-04-30', 10000).run() for _ in range(2)]
+
+    assert reports[0]['trades'], "Aucun trade : la comparaison ne prouverait rien"
+    assert reports[1] == reports[0]
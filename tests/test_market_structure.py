@@ -0,0 +1,49 @@
+# Fichier: tests/test_market_structure.py
+"""
+Structure incrémentale (StructureState) contre l'analyse par lot
+(find_swing_highs_lows + identify_structure) sur des fenêtres glissantes.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analysis import market_structure as structure
+
+
+def _random_bars(n: int, seed: int) -> pd.DataFrame:
+    """Marche aléatoire M15 (prix arrondis : égalités de swings fréquentes)."""
+    rng = np.random.default_rng(seed)
+    close = np.round(1.1 + np.cumsum(rng.normal(0, 0.0008, n)), 4)
+    spread = np.round(np.abs(rng.normal(0, 0.0005, (2, n))), 4)
+    index = pd.date_range('2024-01-01', periods=n, freq='15min', name='time')
+    return pd.DataFrame({'high': close + spread[0], 'low': close - spread[1], 'close': close}, index=index)
+
+
+def _batch(window: pd.DataFrame, order: int):
+    swing_highs, swing_lows = structure.find_swing_highs_lows(window, order=order)
+    events, trend = structure.identify_structure(swing_highs, swing_lows)
+    return swing_highs, swing_lows, events, trend
+
+
+@pytest.mark.parametrize('closed_only', [False, True])
+@pytest.mark.parametrize('order, window, step', [(5, 300, 1), (10, 200, 7), (3, 40, 3)])
+def test_streaming_matches_batch_on_sliding_windows(order, window, step, closed_only):
+    data = _random_bars(1500, seed=order)
+    state = structure.StructureState(order)
+    for end in range(window, len(data) + 1, step):
+        received = data.iloc[end - window:end]
+        state.update(received, closed_only=closed_only)
+        expected = _batch(received.iloc[:-1] if closed_only else received, order)
+        assert (state.swing_highs, state.swing_lows, state.events, state.trend) == expected, end
+
+
+def test_fresh_state_matches_state_with_history():
+    data = _random_bars(800, seed=1)
+    warm = structure.StructureState(5)
+    for end in range(300, 600):
+        warm.update(data.iloc[end - 300:end], closed_only=False)
+    fresh = structure.StructureState(5)
+    fresh.update(data.iloc[299:599], closed_only=False)
+    assert (warm.swing_highs, warm.swing_lows, warm.events, warm.trend) == \
+           (fresh.swing_highs, fresh.swing_lows, fresh.events, fresh.trend)